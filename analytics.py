@@ -0,0 +1,215 @@
+import threading
+from datetime import date
+
+import numpy as np
+
+from booking_store import STATUS_CODES
+from scheduling import parse_day
+
+
+GRANULARITIES = ('day', 'week', 'month')
+DIMENSIONS = ('photographer', 'specialization', 'location')
+
+# cancelled and rejected bookings are counted but earn nothing
+UNBILLED_STATUSES = ('Cancelled', 'Rejected')
+_UNBILLED_CODES = np.array([STATUS_CODES[status] for status in UNBILLED_STATUSES], dtype=np.int8)
+
+# date ordinal of 1970-01-01, where numpy's datetime64 days start
+_UNIX_DAY = date(1970, 1, 1).toordinal()
+
+_DELETED = -1
+
+
+class _Labels:
+    # interning table for a text dimension: label -> small int code
+
+    def __init__(self):
+        self.codes = {}
+        self.labels = []
+
+    def code(self, label):
+        code = self.codes.get(label)
+        if code is None:
+            code = self.codes[label] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+
+class BookingAnalytics:
+    # booking facts kept as parallel NumPy columns (booking id, date
+    # ordinal, dense photographer index, booked rate, status code) sorted by
+    # date, so a time window is two binary searches and every group-by is a
+    # bincount or reduceat over the window's slices. New facts land in a
+    # small unsorted tail that is merged in on the next query (or once it
+    # reaches flush_size); status changes and deletions are applied during
+    # the same merge. Specialization and location hang off the photographer
+    # index, so an edited photographer regroups without touching the facts
+
+    def __init__(self, flush_size=65536):
+        self.flush_size = flush_size
+        self._lock = threading.Lock()
+        self._ids = np.empty(0, np.int64)
+        self._days = np.empty(0, np.int32)
+        self._photographers = np.empty(0, np.int32)
+        self._rates = np.empty(0, np.int64)
+        self._statuses = np.empty(0, np.int8)
+        self._tail = []
+        self._changes = {}
+        self._photographer_index = {}
+        self._photographer_ids = []
+        self._specialization = []
+        self._location = []
+        self.specializations = _Labels()
+        self.locations = _Labels()
+
+    @classmethod
+    def build(cls, bookings, photographers):
+        # bookings: (id, booking) pairs, e.g. a BookingRepository.scan()
+        analytics = cls()
+        for photographer_id, photographer in photographers.items():
+            analytics.set_photographer(photographer_id, photographer)
+        for booking_id, booking in bookings:
+            analytics.record(booking_id, booking, photographers.get(booking['photographer_id']))
+        return analytics
+
+    # -- writes --------------------------------------------------------------
+
+    def _index_for(self, photographer_id, photographer=None):
+        # caller holds the lock
+        index = self._photographer_index.get(photographer_id)
+        if index is None:
+            index = self._photographer_index[photographer_id] = len(self._photographer_ids)
+            self._photographer_ids.append(photographer_id)
+            self._specialization.append(0)
+            self._location.append(0)
+            self._describe(index, photographer or {})
+        return index
+
+    def _describe(self, index, photographer):
+        self._specialization[index] = self.specializations.code(photographer.get('specialization', ''))
+        self._location[index] = self.locations.code(photographer.get('location', ''))
+
+    def set_photographer(self, photographer_id, photographer):
+        with self._lock:
+            self._describe(self._index_for(photographer_id), photographer)
+
+    def record(self, booking_id, booking, photographer=None):
+        # the photographer's rate at booking time is the booking's revenue
+        day = parse_day(booking['date']).toordinal()
+        rate = photographer.get('rate', 0) if photographer else 0
+        with self._lock:
+            index = self._index_for(booking['photographer_id'], photographer)
+            self._tail.append((booking_id, day, index, rate, STATUS_CODES[booking['status']]))
+            if len(self._tail) >= self.flush_size:
+                self._merge()
+
+    def set_status(self, booking_id, status):
+        with self._lock:
+            self._changes[booking_id] = STATUS_CODES[status]
+
+    def discard(self, booking_id):
+        with self._lock:
+            self._changes[booking_id] = _DELETED
+
+    def _merge(self):
+        # caller holds the lock
+        columns = [self._ids, self._days, self._photographers, self._rates, self._statuses]
+        if self._tail:
+            tail = np.array(self._tail, dtype=np.int64)
+            tail = tail[np.argsort(tail[:, 1], kind='stable')]
+            positions = np.searchsorted(self._days, tail[:, 1], side='right')
+            columns = [np.insert(column, positions, tail[:, i].astype(column.dtype))
+                       for i, column in enumerate(columns)]
+            self._tail = []
+        if self._changes:
+            changed = np.fromiter(self._changes, dtype=np.int64, count=len(self._changes))
+            codes = np.fromiter(self._changes.values(), dtype=np.int8, count=len(self._changes))
+            order = np.argsort(changed)
+            changed, codes = changed[order], codes[order]
+            rows = np.flatnonzero(np.isin(columns[0], changed))
+            new_codes = codes[np.searchsorted(changed, columns[0][rows])]
+            # reports may still be reading the old array
+            columns[4] = columns[4].copy()
+            columns[4][rows] = new_codes
+            deleted = rows[new_codes == _DELETED]
+            if len(deleted):
+                columns = [np.delete(column, deleted) for column in columns]
+            self._changes = {}
+        self._ids, self._days, self._photographers, self._rates, self._statuses = columns
+
+    def compact(self):
+        # merges pending facts and changes now rather than on the next report
+        with self._lock:
+            if self._tail or self._changes:
+                self._merge()
+
+    # -- queries -------------------------------------------------------------
+
+    def _window(self, start, end):
+        # -> the date-sorted columns between start and end (inclusive
+        # datetime.date bounds, None for open), as views, not copies
+        with self._lock:
+            if self._tail or self._changes:
+                self._merge()
+            days, photographers, rates, statuses = self._days, self._photographers, self._rates, self._statuses
+            specialization = np.array(self._specialization, dtype=np.int32)
+            location = np.array(self._location, dtype=np.int32)
+        lo = np.searchsorted(days, start.toordinal(), side='left') if start is not None else 0
+        hi = np.searchsorted(days, end.toordinal(), side='right') if end is not None else len(days)
+        billed = np.where(np.isin(statuses[lo:hi], _UNBILLED_CODES), 0, rates[lo:hi])
+        return days[lo:hi], photographers[lo:hi], billed, specialization, location
+
+    def _periods(self, days, billed, granularity):
+        if granularity == 'day':
+            keys = days
+        elif granularity == 'week':
+            # ordinal 1 (0001-01-01) was a Monday
+            keys = days - (days - 1) % 7
+        elif granularity == 'month':
+            keys = (days - _UNIX_DAY).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        else:
+            raise ValueError(f'unknown granularity {granularity!r}')
+        if not len(keys):
+            return []
+        # days are sorted, so each period is one contiguous run
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+        counts = np.diff(np.append(starts, len(keys)))
+        revenue = np.add.reduceat(billed, starts)
+        return [{'period': _period_label(int(key), granularity), 'bookings': int(count), 'revenue': int(total)}
+                for key, count, total in zip(keys[starts], counts, revenue)]
+
+    def _groups(self, photographers, billed, specialization, location, by, limit):
+        if by == 'photographer':
+            keys, labels = photographers, self._photographer_ids
+        elif by == 'specialization':
+            keys, labels = specialization[photographers], self.specializations.labels
+        elif by == 'location':
+            keys, labels = location[photographers], self.locations.labels
+        else:
+            raise ValueError(f'unknown dimension {by!r}')
+        counts = np.bincount(keys, minlength=len(labels))
+        revenue = np.bincount(keys, weights=billed, minlength=len(labels))
+        present = np.flatnonzero(counts)
+        present = present[np.lexsort((-counts[present], -revenue[present]))][:limit]
+        return [{'key': labels[i], 'bookings': int(counts[i]), 'revenue': int(revenue[i])} for i in present]
+
+    def report(self, start=None, end=None, granularity='month', by='photographer', limit=None):
+        # totals, one row per period and the top limit groups by revenue
+        days, photographers, billed, specialization, location = self._window(start, end)
+        return {
+            'bookings': int(len(days)),
+            'revenue': int(billed.sum()),
+            'periods': self._periods(days, billed, granularity),
+            'groups': self._groups(photographers, billed, specialization, location, by, limit),
+        }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids) + len(self._tail)
+
+
+def _period_label(key, granularity):
+    if granularity == 'month':
+        return f'{1970 + key // 12:04d}-{key % 12 + 1:02d}'
+    return date.fromordinal(key).isoformat()
+
@@ -0,0 +1,123 @@
+import json
+import zlib
+
+from flask import jsonify, request
+
+from catalog import encode_cursor, decode_cursor
+from scheduling import parse_day, parse_time
+
+
+API_PREFIX = '/api/v1'
+
+PHOTOGRAPHER_FIELDS = (
+    'id', 'name', 'specialization', 'rate', 'contact', 'bio', 'image', 'image_thumb', 'image_card',
+    'experience', 'location', 'skills', 'availability', 'portfolio'
+)
+
+BOOKING_FIELDS = (
+    'id', 'booking_number', 'user_id', 'photographer_id', 'photographer_name', 'date', 'time',
+    'location', 'notes', 'created_at', 'status'
+)
+
+# below this a gzip header and trailer cost more than they save
+GZIP_MIN_BYTES = 1024
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def error_response(status, message):
+    return jsonify({'error': message}), status
+
+
+def requested_fields(allowed):
+    # ?fields=id,name,rate -> the tuple of fields to return, in the order
+    # asked for; no parameter means every field
+    raw = request.args.get('fields', '').strip()
+    if not raw:
+        return allowed
+    fields = tuple(dict.fromkeys(f.strip() for f in raw.split(',') if f.strip()))
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ApiError(400, f"unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def select_fields(record, fields):
+    return {field: record[field] for field in fields if field in record}
+
+
+def page_limit(default, maximum):
+    raw = request.args.get('limit')
+    if raw is None:
+        return default
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ApiError(400, 'limit must be an integer') from None
+    if limit < 1:
+        raise ApiError(400, 'limit must be at least 1')
+    return min(limit, maximum)
+
+
+def encode_booking_cursor(booking):
+    return encode_cursor([booking['date'], booking['time']], booking['id'])
+
+
+def decode_booking_cursor(cursor):
+    try:
+        (day, time), booking_id = decode_cursor(cursor)
+        parse_day(day), parse_time(time), int(booking_id)
+    except (AttributeError, TypeError, ValueError):
+        raise ApiError(400, 'invalid cursor') from None
+    return day, time, booking_id
+
+
+def ndjson_lines(records, chunk_bytes=64 * 1024):
+    # one JSON document per line; lines are grouped into ~64KB chunks so
+    # the WSGI server is not handed a write per row (chunk_bytes=0 sends
+    # every line as soon as it is produced)
+    buffer = []
+    size = 0
+    for record in records:
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield ''.join(buffer).encode()
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode()
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def gzip_response(response, level=6):
+    # compresses API responses for clients that accept gzip. Streamed
+    # bodies are compressed chunk by chunk as they are generated
+    response.vary.add('Accept-Encoding')
+    if (request.accept_encodings['gzip'] <= 0 or 'Content-Encoding' in response.headers
+            or response.direct_passthrough or response.status_code < 200 or response.status_code == 204):
+        return response
+    if response.is_streamed:
+        response.response = gzip_chunks(response.iter_encoded(), level)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < GZIP_MIN_BYTES:
+            return response
+        response.set_data(b''.join(gzip_chunks([body], level)))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
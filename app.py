@@ -1,13 +1,103 @@
-from flask import Flask, render_template, request, redirect, url_for, session
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, stream_with_context, abort, send_file
+from contextlib import nullcontext
 from datetime import datetime
-import hashlib
+import os
+
+from user_store import DuplicateUserError
+from repository import create_repositories, open_change_feed
+from catalog import CatalogIndex
+from analytics import BookingAnalytics, GRANULARITIES, DIMENSIONS
+from search import SearchIndex
+from assets import AssetManifest, IMMUTABLE_MAX_AGE
+from response_cache import ResponseCache, cached_view
+from stats import check_counters
+from passwords import PasswordHasher, HasherBusy, legacy_hash
+from notifications import NotificationDispatcher
+from aws_clients import AWSClientFactory
+from scheduling import SlotIndex, StoreSlotIndex, SlotConflict, MINUTES_PER_DAY, parse_time, parse_day, format_time
+from uploads import PhotoPipeline, LocalPhotoStorage, UploadError
+from metrics import Metrics, admin_or_token
+from sessions import create_session_interface
+from bulk import PhotographerImporter, read_rows, csv_chunks
+from api import (
+    API_PREFIX, PHOTOGRAPHER_FIELDS, BOOKING_FIELDS, ApiError, error_response, requested_fields,
+    select_fields, page_limit, encode_booking_cursor, decode_booking_cursor, ndjson_lines, gzip_response
+)
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-change-in-production'
-
-users_db = {}
-
-photographers_db = {
+app.config['BOOKING_SLOT_MINUTES'] = 120
+app.config['BOOKING_DAY_START'] = '08:00'
+app.config['BOOKING_DAY_END'] = '20:00'
+app.config['BOOKING_SLOT_LOOKUP_MAX_DAYS'] = 31
+# 'memory' keeps everything in this process; 'sqlite' shares state between
+# workers, and each worker keeps its in-memory indexes, page cache and
+# report columns in step with the others' writes through the change log
+app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'memory')
+app.config['SQLITE_PATH'] = os.environ.get('SQLITE_PATH', 'booking.db')
+# memory backend only: journal every write under this directory and rebuild
+# the stores from its latest snapshot plus the journal on start. One process
+# owns the directory: it is locked on open, so a second server or gunicorn
+# worker using the same JOURNAL_DIR refuses to start
+app.config['JOURNAL_DIR'] = os.environ.get('JOURNAL_DIR')
+app.config['JOURNAL_COMMIT_INTERVAL'] = 0.01
+app.config['JOURNAL_SNAPSHOT_INTERVAL'] = 300.0
+app.config['JOURNAL_SNAPSHOT_BYTES'] = 16 * 1024 * 1024
+app.config['CATALOG_PAGE_SIZE'] = 24
+app.config['CATALOG_MAX_PAGE_SIZE'] = 100
+# search results are ranked, so they page by offset; this caps how deep
+app.config['SEARCH_MAX_OFFSET'] = 1000
+app.config['SEARCH_SUGGESTIONS'] = 8
+app.config['API_PAGE_SIZE'] = 50
+app.config['API_MAX_PAGE_SIZE'] = 500
+app.config['API_GZIP_LEVEL'] = 6
+app.config['RESPONSE_CACHE_MAX_BYTES'] = 16 * 1024 * 1024
+# password KDF; raise the cost as hardware allows, existing hashes are
+# upgraded on the next successful login
+app.config['PASSWORD_SCHEME'] = os.environ.get('PASSWORD_SCHEME', 'pbkdf2_sha256')
+app.config['PASSWORD_PBKDF2_ITERATIONS'] = 260000
+app.config['PASSWORD_SCRYPT_N'] = 2 ** 14
+app.config['PASSWORD_HASH_WORKERS'] = None
+app.config['PASSWORD_HASH_MAX_PENDING'] = 64
+app.config['PASSWORD_HASH_TIMEOUT'] = 5.0
+# booking alerts for photographers; unset disables them
+app.config['SNS_TOPIC_ARN'] = os.environ.get('SNS_TOPIC_ARN')
+app.config['SNS_REGION'] = os.environ.get('SNS_REGION', 'us-east-1')
+app.config['NOTIFICATION_DEAD_LETTER_PATH'] = 'notifications.deadletter.jsonl'
+# photographer photo uploads; originals and resized variants are stored
+# under content hashes so re-uploading the same file costs nothing
+app.config['PHOTO_UPLOAD_ROOT'] = os.environ.get('PHOTO_UPLOAD_ROOT', os.path.join(app.root_path, 'static', 'uploads'))
+app.config['PHOTO_UPLOAD_URL_PREFIX'] = '/static/uploads'
+app.config['PHOTO_UPLOAD_TEMP_DIR'] = None
+app.config['PHOTO_MAX_BYTES'] = 10 * 1024 * 1024
+app.config['PHOTO_RESIZE_WORKERS'] = 2
+# bulk photographer import: rows are committed this many at a time and
+# plain-text passwords are hashed in a pool separate from the login hasher
+app.config['BULK_IMPORT_BATCH_SIZE'] = 500
+app.config['BULK_IMPORT_HASH_WORKERS'] = max(1, (os.cpu_count() or 2) // 2)
+# fingerprinted, precompressed copies of static/ built by `python assets.py`
+# and served from /assets with an immutable year-long Cache-Control. Until
+# there is a build, and always in debug mode, asset_url() links to /static
+app.config['ASSET_BUILD_DIR'] = os.environ.get('ASSET_BUILD_DIR', os.path.join(app.root_path, 'build', 'assets'))
+# rows in the report's per-photographer/specialization/location table
+app.config['REPORT_GROUP_LIMIT'] = 50
+# request, template and store timings served at /metrics. Off unless
+# METRICS_ENABLED=1, and off removes the hooks and the store wrappers
+# entirely. The page names every endpoint and store, so it is only served
+# to an admin session or a scraper sending "Authorization: Bearer
+# <METRICS_TOKEN>"
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '0') == '1'
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+# server-side sessions: the cookie only carries an opaque id. The sqlite
+# backend shares sessions between worker processes (SESSION_SQLITE_PATH
+# defaults to SQLITE_PATH); memory keeps them per process
+app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', app.config['STORAGE_BACKEND'])
+app.config['SESSION_SQLITE_PATH'] = os.environ.get('SESSION_SQLITE_PATH')
+app.config['SESSION_TTL'] = 24 * 3600
+app.config['SESSION_SWEEP_INTERVAL'] = 60.0
+app.config['SESSION_MAX_ENTRIES'] = 100000
+
+DEFAULT_PHOTOGRAPHERS = {
     1: {
         'name': 'John Smith',
         'specialization': 'Wedding Photography',
@@ -130,98 +220,247 @@ photographers_db = {
     }
 }
 
-bookings_db = {}
-
-next_user_id = 1
-next_booking_id = 1
+BUSY_MESSAGE = 'The server is busy right now, please try again in a moment'
 
 def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
-
-admin_users = {
+    return password_hasher.hash(password)
+
+def verify_password(password, password_hash):
+    return password_hasher.verify(password, password_hash)
+
+def rehash_if_needed(password, password_hash, save):
+    # transparently move legacy SHA-256 and outdated KDF hashes to the
+    # current scheme; if the pool is busy the upgrade waits for next login
+    if not password_hasher.needs_rehash(password_hash):
+        return
+    try:
+        save(hash_password(password))
+    except HasherBusy:
+        pass
+
+DEFAULT_ADMIN_USERS = {
     'admin': {
-        'password': hash_password('admin123'),
+        'password': legacy_hash('admin123'),
         'user_type': 'admin'
     }
 }
 
-photographer_users = {
+DEFAULT_PHOTOGRAPHER_USERS = {
     'john_smith': {
-        'password': hash_password('john123'),
+        'password': legacy_hash('john123'),
         'photographer_id': 1,
         'user_type': 'photographer'
     },
     'sarah_johnson': {
-        'password': hash_password('sarah123'),
+        'password': legacy_hash('sarah123'),
         'photographer_id': 2,
         'user_type': 'photographer'
     },
     'mike_davis': {
-        'password': hash_password('mike123'),
+        'password': legacy_hash('mike123'),
         'photographer_id': 3,
         'user_type': 'photographer'
     },
     'emily_rodriguez': {
-        'password': hash_password('emily123'),
+        'password': legacy_hash('emily123'),
         'photographer_id': 4,
         'user_type': 'photographer'
     },
     'david_chen': {
-        'password': hash_password('david123'),
+        'password': legacy_hash('david123'),
         'photographer_id': 5,
         'user_type': 'photographer'
     },
     'jessica_williams': {
-        'password': hash_password('jessica123'),
+        'password': legacy_hash('jessica123'),
         'photographer_id': 6,
         'user_type': 'photographer'
     },
     'robert_thompson': {
-        'password': hash_password('robert123'),
+        'password': legacy_hash('robert123'),
         'photographer_id': 7,
         'user_type': 'photographer'
     },
     'amanda_foster': {
-        'password': hash_password('amanda123'),
+        'password': legacy_hash('amanda123'),
         'photographer_id': 8,
         'user_type': 'photographer'
     },
     'chris_martinez': {
-        'password': hash_password('chris123'),
+        'password': legacy_hash('chris123'),
         'photographer_id': 9,
         'user_type': 'photographer'
     },
     'lauren_mitchell': {
-        'password': hash_password('lauren123'),
+        'password': legacy_hash('lauren123'),
         'photographer_id': 10,
         'user_type': 'photographer'
     }
 }
 
+def session_owner(data):
+    # key used to find every session of one account
+    user_type = data.get('user_type')
+    if user_type == 'photographer':
+        return f"photographer:{data.get('photographer_id')}"
+    if user_type and 'user_id' in data:
+        return f"{user_type}:{data['user_id']}"
+    return None
+
+# rendered-page cache; the views bind it when they are decorated, create_app
+# only sizes it
+response_cache = ResponseCache(app.config['RESPONSE_CACHE_MAX_BYTES'])
+
+def metrics_allowed():
+    return admin_or_token(app.config['METRICS_TOKEN'])
+
+def create_app(config=None):
+    # applies config on top of the settings above, builds the stores,
+    # indexes and services from them and returns the app. Importing this
+    # module builds nothing, so a server can pick its settings first (and a
+    # pre-forking one can build once in the master); runs once per process
+    global password_hasher, metrics, users_db, photographers_db, bookings_db, photographer_users, admin_users
+    global slot_index, booking_notifier, catalog_index, search_index, booking_analytics, photo_pipeline
+    global asset_manifest, change_feed
+    if 'users_db' in globals():
+        raise RuntimeError('create_app() has already built the app in this process')
+    if config:
+        app.config.update(config)
+
+    password_hasher = PasswordHasher.from_config(app.config)
+    app.session_interface = create_session_interface(app.config, owner_of=session_owner)
+
+    metrics = Metrics.from_config(app.config)
+    metrics.init_app(app, authorize=metrics_allowed)
+
+    stores = create_repositories(app.config, DEFAULT_PHOTOGRAPHERS, DEFAULT_PHOTOGRAPHER_USERS, DEFAULT_ADMIN_USERS)
+    change_feed = open_change_feed(app.config, stores)
+    users_db, photographers_db, bookings_db, photographer_users, admin_users = (
+        metrics.instrument(store, name) for store, name in zip(
+            stores, ('users', 'photographers', 'bookings', 'photographer_users', 'admin_users'))
+    )
+    if change_feed is not None:
+        # other workers book the same photographers; only the store sees them all
+        slot_index = StoreSlotIndex(bookings_db, app.config['BOOKING_SLOT_MINUTES'])
+    else:
+        slot_index = SlotIndex(app.config['BOOKING_SLOT_MINUTES'])
+        # bookings recovered from the journal keep their slots
+        for booking_id, booking in bookings_db.scan():
+            slot_index.reserve(booking['photographer_id'], booking['date'], parse_time(booking['time']), booking_id)
+
+    booking_notifier = None
+    if app.config['SNS_TOPIC_ARN']:
+        aws_clients = AWSClientFactory.from_env(app.config['SNS_REGION'])
+        booking_notifier = NotificationDispatcher(
+            lambda: aws_clients.client('sns'), app.config['SNS_TOPIC_ARN'],
+            dead_letter_path=app.config['NOTIFICATION_DEAD_LETTER_PATH']
+        )
+
+    with change_feed.pinned() if change_feed is not None else nullcontext():
+        build_indexes()
+    if change_feed is not None:
+        app.before_request(apply_other_workers_changes)
+    response_cache.max_bytes = app.config['RESPONSE_CACHE_MAX_BYTES']
+    photo_pipeline = PhotoPipeline(
+        LocalPhotoStorage(app.config['PHOTO_UPLOAD_ROOT'], app.config['PHOTO_UPLOAD_URL_PREFIX']),
+        temp_dir=app.config['PHOTO_UPLOAD_TEMP_DIR'],
+        max_bytes=app.config['PHOTO_MAX_BYTES'],
+        workers=app.config['PHOTO_RESIZE_WORKERS']
+    )
+    asset_manifest = AssetManifest.load(app.config['ASSET_BUILD_DIR'])
+    return app
+
+def build_indexes():
+    # the in-memory indexes and report columns derived from the stores
+    global catalog_index, search_index, booking_analytics
+    catalog_index = CatalogIndex.build(photographers_db)
+    search_index = SearchIndex.build(photographers_db)
+    booking_analytics = BookingAnalytics.build(bookings_db.scan(), photographers_db)
+
+def apply_other_workers_changes():
+    # with a shared backend every worker process builds its own indexes,
+    # report columns and page cache; before each request this one catches
+    # up with what the other workers wrote since the last request
+    with change_feed.poll() as changes:
+        if changes is None:
+            # too far behind for the change log: start over from the stores
+            with change_feed.pinned():
+                build_indexes()
+            response_cache.clear()
+            response_cache.bump('photographers', 'users')
+            return
+        stale = set()
+        for kind, key in changes:
+            if kind == 'photographer':
+                photographer = photographers_db.get(key)
+                if photographer is None:
+                    catalog_index.remove(key)
+                    search_index.remove(key)
+                else:
+                    catalog_index.update(key, photographer)
+                    search_index.update(key, photographer)
+                    booking_analytics.set_photographer(key, photographer)
+                stale.add('photographers')
+            elif kind == 'user':
+                stale.add('users')
+            elif kind == 'booking_added':
+                booking = bookings_db.get(key)
+                if booking is not None:
+                    booking_analytics.record(key, booking, photographers_db.get(booking['photographer_id']))
+            elif kind == 'booking_status':
+                booking = bookings_db.get(key)
+                if booking is not None:
+                    booking_analytics.set_status(key, booking['status'])
+            elif kind == 'booking_deleted':
+                booking_analytics.discard(key)
+        if stale:
+            response_cache.bump(*stale)
+
+def warm_up():
+    # does now what every worker would otherwise do lazily on its first
+    # requests: compile each template, build the URL matcher, turn the
+    # search postings into arrays and fold the analytics rows into their
+    # sorted columns. A pre-forking server calls this in the master after
+    # create_app() so the workers inherit the results copy-on-write
+    with app.app_context():
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+    app.url_map.update()
+    search_index.warm()
+    booking_analytics.compact()
+
+def notify_new_booking(booking_id, photographer_id, photographer, booking):
+    if booking_notifier is None:
+        return
+    booking_notifier.submit(
+        f"New booking #{booking_id} for {photographer['name']}",
+        f"{photographer['name']}, you have a new booking request for {booking['date']} at "
+        f"{booking['time']} in {booking['location']}. Status: {booking['status']}.",
+        attributes={'photographer_id': photographer_id, 'event': 'booking_created'}
+    )
+
 def get_next_user_id():
-    global next_user_id
-    user_id = next_user_id
-    next_user_id += 1
-    return user_id
+    return users_db.next_id()
 
 def get_next_booking_id():
-    global next_booking_id
-    booking_id = next_booking_id
-    next_booking_id += 1
-    return booking_id
+    return bookings_db.next_id()
+
+def get_next_photographer_id():
+    return photographers_db.next_id()
 
 def user_exists(username):
-    return any(user['username'] == username for user in users_db.values())
+    return users_db.username_exists(username)
 
 def email_exists(email):
-    return any(user['email'] == email for user in users_db.values())
+    return users_db.email_exists(email)
 
 def authenticate_user(username, password):
-    hashed_password = hash_password(password)
-    for user_id, user in users_db.items():
-        if user['username'] == username and user['password'] == hashed_password:
-            return user_id
-    return None
+    user_id, user = users_db.get_by_username(username)
+    if user is None or not verify_password(password, user['password']):
+        return None
+    rehash_if_needed(password, user['password'],
+                     lambda password_hash: users_db.update_password(user_id, password_hash))
+    return user_id
 
 def get_user_by_id(user_id):
     return users_db.get(user_id)
@@ -229,15 +468,106 @@ def get_user_by_id(user_id):
 def get_photographer_by_id(photographer_id):
     return photographers_db.get(photographer_id)
 
+def int_arg(name):
+    try:
+        return int(request.args.get(name, ''))
+    except ValueError:
+        return None
+
+def catalog_filters():
+    return {
+        'location': request.args.get('location', '').strip() or None,
+        'specialization': request.args.get('specialization', '').strip() or None,
+        'weekday': request.args.get('weekday', '').strip() or None,
+        'min_rate': int_arg('min_rate'),
+        'max_rate': int_arg('max_rate'),
+        'min_experience': int_arg('min_experience')
+    }
+
+def search_page(query, filters, limit):
+    # ranked full-text matches within the filters ->
+    # ([(id, score)], offset, next offset or None)
+    offset = min(max(int_arg('offset') or 0, 0), app.config['SEARCH_MAX_OFFSET'])
+    results = search_index.search(query, catalog_index.candidates(**filters), limit=limit + 1, offset=offset)
+    has_more = len(results) > limit and offset + limit <= app.config['SEARCH_MAX_OFFSET']
+    return results[:limit], offset, offset + limit if has_more else None
+
+def catalog_page():
+    filters = catalog_filters()
+    query = request.args.get('q', '').strip()
+    sort = request.args.get('sort', 'id')
+    cursor = request.args.get('cursor') or None
+    limit = min(max(int_arg('limit') or app.config['CATALOG_PAGE_SIZE'], 1), app.config['CATALOG_MAX_PAGE_SIZE'])
+
+    page_args = dict(filters, sort=sort)
+    if limit != app.config['CATALOG_PAGE_SIZE']:
+        page_args['limit'] = limit
+
+    if query:
+        # a search is ranked by relevance and pages by offset
+        results, offset, next_offset = search_page(query, filters, limit)
+        ids = [photographer_id for photographer_id, _ in results]
+        page_args['q'] = query
+        cursor = offset or None
+        next_page_url = url_for(request.endpoint, offset=next_offset, **page_args) if next_offset else None
+    else:
+        try:
+            ids, next_cursor = catalog_index.query(sort=sort, cursor=cursor, limit=limit, **filters)
+        except ValueError:
+            # stale or hand-edited cursor: start again from the first page
+            cursor = None
+            ids, next_cursor = catalog_index.query(sort=sort, limit=limit, **filters)
+        next_page_url = url_for(request.endpoint, cursor=next_cursor, **page_args) if next_cursor else None
+
+    photographers_list = []
+    for photo_id in ids:
+        photo_info = photographers_db.get(photo_id)
+        if photo_info is None:
+            continue
+        photographer = dict(photo_info)
+        photographer['id'] = photo_id
+        photographers_list.append(photographer)
+
+    return {
+        'photographers': photographers_list,
+        'filters': filters,
+        'query': query,
+        'sort': sort,
+        'cursor': cursor,
+        'first_page_url': url_for(request.endpoint, **page_args),
+        'next_page_url': next_page_url,
+        'facets': catalog_index.facets()
+    }
+
+def with_photographer_name(booking):
+    photographer = get_photographer_by_id(booking['photographer_id'])
+    return {'photographer_name': photographer['name'] if photographer else 'Unknown'}
+
 def get_user_bookings(user_id):
-    user_bookings = []
-    for booking_id, booking in bookings_db.items():
-        if booking['user_id'] == user_id:
-            photographer = get_photographer_by_id(booking['photographer_id'])
-            booking['id'] = booking_id
-            booking['photographer_name'] = photographer['name'] if photographer else 'Unknown'
-            user_bookings.append(booking)
-    return user_bookings
+    return bookings_db.for_user(user_id, extra=with_photographer_name)
+
+@app.template_global()
+def asset_url(filename):
+    # templates link static files through this so a deploy with new
+    # assets changes their URLs instead of waiting for caches to expire
+    path = None if app.debug else asset_manifest.path_for(filename)
+    if path is None:
+        return url_for('static', filename=filename)
+    return url_for('asset', filename=path)
+
+@app.route('/assets/<path:filename>')
+def asset(filename):
+    found = asset_manifest.negotiate(filename, request.accept_encodings)
+    if found is None:
+        abort(404)
+    path, mimetype, encoding, has_variants = found
+    response = send_file(path, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.immutable = True
+    if has_variants:
+        response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
 
 @app.route('/')
 def index():
@@ -266,14 +596,27 @@ def register():
         if len(password) < 6:
             return render_template('register.html', error='Password must be at least 6 characters')
 
+        try:
+            password_hash = hash_password(password)
+        except HasherBusy:
+            return render_template('register.html', error=BUSY_MESSAGE), 503
+
         user_id = get_next_user_id()
-        users_db[user_id] = {
-            'username': username,
-            'email': email,
-            'password': hash_password(password),
-            'user_type': 'customer',
-            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        try:
+            users_db.add(user_id, {
+                'username': username,
+                'email': email,
+                'password': password_hash,
+                'user_type': 'customer',
+                'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            })
+        except DuplicateUserError as e:
+            # lost a race with a concurrent registration
+            if e.field == 'username':
+                return render_template('register.html', error='Username already exists')
+            return render_template('register.html', error='Email already registered')
+
+        response_cache.bump('users')
 
         return redirect(url_for('login'))
 
@@ -292,7 +635,10 @@ def login_customer():
         if not username or not password:
             return render_template('login_customer.html', error='Username and password required')
 
-        user_id = authenticate_user(username, password)
+        try:
+            user_id = authenticate_user(username, password)
+        except HasherBusy:
+            return render_template('login_customer.html', error=BUSY_MESSAGE), 503
 
         if user_id is None:
             return render_template('login_customer.html', error='Invalid username or password')
@@ -318,11 +664,18 @@ def login_photographer():
         if not username or not password:
             return render_template('login_photographer.html', error='Username and password required')
 
-        hashed_password = hash_password(password)
-        if username not in photographer_users or photographer_users[username]['password'] != hashed_password:
+        photographer_info = photographer_users.get(username)
+        try:
+            valid = photographer_info is not None and verify_password(password, photographer_info['password'])
+        except HasherBusy:
+            return render_template('login_photographer.html', error=BUSY_MESSAGE), 503
+        if not valid:
             return render_template('login_photographer.html', error='Invalid username or password')
 
-        photographer_info = photographer_users[username]
+        def save_photographer_hash(password_hash):
+            photographer_users[username] = dict(photographer_info, password=password_hash)
+
+        rehash_if_needed(password, photographer_info['password'], save_photographer_hash)
         photographer_id = photographer_info['photographer_id']
         photographer = get_photographer_by_id(photographer_id)
 
@@ -345,10 +698,19 @@ def login_admin():
         if not username or not password:
             return render_template('login_admin.html', error='Username and password required')
 
-        hashed_password = hash_password(password)
-        if username not in admin_users or admin_users[username]['password'] != hashed_password:
+        admin_info = admin_users.get(username)
+        try:
+            valid = admin_info is not None and verify_password(password, admin_info['password'])
+        except HasherBusy:
+            return render_template('login_admin.html', error=BUSY_MESSAGE), 503
+        if not valid:
             return render_template('login_admin.html', error='Invalid username or password')
 
+        def save_admin_hash(password_hash):
+            admin_users[username] = dict(admin_info, password=password_hash)
+
+        rehash_if_needed(password, admin_info['password'], save_admin_hash)
+
         session['user_id'] = username
         session['username'] = username
         session['user_type'] = 'admin'
@@ -363,17 +725,12 @@ def logout():
     return redirect(url_for('index'))
 
 @app.route('/photographers')
+@cached_view(response_cache, 'photographers')
 def photographers():
     if 'user_id' not in session or session.get('user_type') != 'customer':
         return redirect(url_for('login'))
 
-    photographers_list = []
-    for photo_id, photo_info in photographers_db.items():
-        photographer = photo_info.copy()
-        photographer['id'] = photo_id
-        photographers_list.append(photographer)
-
-    return render_template('photographers.html', photographers=photographers_list)
+    return render_template('photographers.html', **catalog_page())
 
 @app.route('/book/<int:photographer_id>', methods=['GET', 'POST'])
 def book(photographer_id):
@@ -395,7 +752,15 @@ def book(photographer_id):
                                  photographer_id=photographer_id, 
                                  error='Date, time, and location are required')
 
-        booking_date_obj = datetime.strptime(booking_date, '%Y-%m-%d')
+        try:
+            booking_date_obj = datetime.strptime(booking_date, '%Y-%m-%d')
+        except ValueError:
+            return render_template('book.html', photographer=photographer, 
+                                 photographer_id=photographer_id, 
+                                 error='Please enter a valid date')
+        # bookings are stored, and slots keyed, on the canonical date and
+        # time so '2026-11-2 9:00' and '2026-11-02 09:00' are the same slot
+        booking_day = booking_date_obj.date().isoformat()
         day_name = booking_date_obj.strftime('%A')
         
         if day_name not in photographer.get('availability', []):
@@ -404,24 +769,88 @@ def book(photographer_id):
                                  photographer_id=photographer_id, 
                                  error=f'Photographer is not available on {day_name}. Available days: {available_days}')
 
+        try:
+            start_minute = parse_time(booking_time)
+        except ValueError:
+            return render_template('book.html', photographer=photographer, 
+                                 photographer_id=photographer_id, 
+                                 error='Please enter a valid time')
+        if not slot_index.fits_in_day(start_minute):
+            latest = format_time(MINUTES_PER_DAY - slot_index.slot_minutes)
+            return render_template('book.html', photographer=photographer, 
+                                 photographer_id=photographer_id, 
+                                 error=f'Bookings must end by midnight; the latest start is {latest}')
+
         booking_id = get_next_booking_id()
-        bookings_db[booking_id] = {
+        try:
+            slot_index.reserve(photographer_id, booking_day, start_minute, booking_id)
+        except SlotConflict:
+            return render_template('book.html', photographer=photographer, 
+                                 photographer_id=photographer_id, 
+                                 error=f'Photographer is already booked around {booking_time} on {booking_date}. Please choose another time.')
+
+        booking = {
             'id': booking_id,
             'booking_number': booking_id,
             'user_id': session['user_id'],
             'photographer_id': photographer_id,
-            'date': booking_date,
-            'time': booking_time,
+            'date': booking_day,
+            'time': format_time(start_minute),
             'location': location,
             'notes': notes,
             'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'status': 'Pending'
         }
+        try:
+            bookings_db.add(booking_id, booking)
+        except SlotConflict:
+            # another worker process took the slot first
+            slot_index.release(photographer_id, booking_day, booking_id)
+            return render_template('book.html', photographer=photographer, 
+                                 photographer_id=photographer_id, 
+                                 error=f'Photographer is already booked around {booking_time} on {booking_date}. Please choose another time.')
+        except BaseException:
+            # a booking that was never stored must not keep its slot
+            slot_index.release(photographer_id, booking_day, booking_id)
+            raise
+
+        booking_analytics.record(booking_id, booking, photographer)
+        notify_new_booking(booking_id, photographer_id, photographer, booking)
 
         return redirect(url_for('dashboard'))
 
     return render_template('book.html', photographer=photographer, photographer_id=photographer_id)
 
+@app.route('/photographers/<int:photographer_id>/slots')
+def photographer_slots(photographer_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'login required'}), 401
+
+    photographer = get_photographer_by_id(photographer_id)
+    if not photographer:
+        return jsonify({'error': 'photographer not found'}), 404
+
+    try:
+        start_day = parse_day(request.args.get('start', datetime.now().date().isoformat()))
+        end_day = parse_day(request.args.get('end', start_day.isoformat()))
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+
+    if end_day < start_day or (end_day - start_day).days >= app.config['BOOKING_SLOT_LOOKUP_MAX_DAYS']:
+        return jsonify({'error': 'invalid date range'}), 400
+
+    slots = slot_index.free_slots(
+        photographer_id, start_day, end_day,
+        parse_time(app.config['BOOKING_DAY_START']),
+        parse_time(app.config['BOOKING_DAY_END']),
+        weekdays=photographer.get('availability')
+    )
+    return jsonify({
+        'photographer_id': photographer_id,
+        'slot_minutes': slot_index.slot_minutes,
+        'slots': slots
+    })
+
 @app.route('/dashboard')
 def dashboard():
     if 'user_id' not in session:
@@ -432,20 +861,70 @@ def dashboard():
 
     return render_template('dashboard.html', bookings=bookings)
 
+@app.route('/photographers/<int:photographer_id>/photos', methods=['GET', 'POST'])
+def photographer_photos(photographer_id):
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    if session.get('user_type') != 'admin' and not (
+            session.get('user_type') == 'photographer' and session.get('photographer_id') == photographer_id):
+        return redirect(url_for('login'))
+
+    photographer = get_photographer_by_id(photographer_id)
+    if not photographer:
+        return redirect(url_for('photographers'))
+
+    if request.method == 'POST':
+        if request.content_length is not None and request.content_length > app.config['PHOTO_MAX_BYTES'] + 64 * 1024:
+            return render_template('photographer_photos.html', photographer=photographer,
+                                   photographer_id=photographer_id, error='That image is too large'), 413
+
+        kind = request.args.get('kind') or request.form.get('kind', 'portrait')
+        if kind not in ('portrait', 'portfolio'):
+            kind = 'portrait'
+
+        # multipart form posts arrive as a spooled file; API clients may send
+        # the raw image as the body, which is read straight off the socket
+        if request.mimetype.startswith('image/'):
+            stream = request.stream
+        else:
+            upload = request.files.get('photo')
+            if upload is None or not upload.filename:
+                return render_template('photographer_photos.html', photographer=photographer,
+                                       photographer_id=photographer_id, error='Please choose an image to upload'), 400
+            stream = upload.stream
+
+        try:
+            photo = photo_pipeline.ingest(stream)
+        except UploadError as e:
+            if request.mimetype.startswith('image/'):
+                return jsonify({'error': str(e)}), 400
+            return render_template('photographer_photos.html', photographer=photographer,
+                                   photographer_id=photographer_id, error=str(e)), 400
+
+        updated = dict(photographer)
+        if kind == 'portrait':
+            updated['image'] = photo['original']
+            updated['image_thumb'] = photo['thumb']
+            updated['image_card'] = photo['card']
+        else:
+            portfolio = [p for p in updated.get('portfolio', []) if p.get('hash') != photo['hash']]
+            portfolio.append(photo)
+            updated['portfolio'] = portfolio
+        photographers_db[photographer_id] = updated
+        response_cache.bump('photographers')
+
+        if request.mimetype.startswith('image/'):
+            return jsonify(photo), 201
+        return redirect(url_for('photographer_photos', photographer_id=photographer_id))
+
+    return render_template('photographer_photos.html', photographer=photographer, photographer_id=photographer_id)
+
 @app.route('/photographer-dashboard')
 def photographer_dashboard():
     if 'user_id' not in session or session.get('user_type') != 'photographer':
         return redirect(url_for('login'))
 
-    all_bookings = []
-    current_photographer_id = session.get('photographer_id')
-    for booking_id, booking in bookings_db.items():
-        if booking.get('photographer_id') != current_photographer_id:
-            continue
-        booking_copy = booking.copy()
-        # ensure an `id` field is present for template use
-        booking_copy['id'] = booking_id
-        all_bookings.append(booking_copy)
+    all_bookings = bookings_db.for_photographer(session.get('photographer_id'))
 
     return render_template('photographer_dashboard.html', bookings=all_bookings)
 
@@ -454,37 +933,30 @@ def admin_dashboard():
     if 'user_id' not in session or session.get('user_type') != 'admin':
         return redirect(url_for('login_admin'))
 
-    total_users = len(users_db)
-    total_photographers = len(photographers_db)
-    total_bookings = len(bookings_db)
-    customer_users = sum(1 for u in users_db.values() if u['user_type'] == 'customer')
-    photographer_users = sum(1 for u in users_db.values() if u['user_type'] == 'photographer')
+    users_by_type = users_db.count_by_type()
+    bookings_by_status = bookings_db.count_by_status()
 
     stats = {
-        'total_users': total_users,
-        'customer_users': customer_users,
-        'photographer_users': photographer_users,
-        'total_photographers': total_photographers,
-        'total_bookings': total_bookings
+        'total_users': sum(users_by_type.values()),
+        'customer_users': users_by_type.get('customer', 0),
+        'photographer_users': users_by_type.get('photographer', 0),
+        'total_photographers': len(photographers_db),
+        'total_bookings': sum(bookings_by_status.values())
     }
 
     return render_template('admin_dashboard.html', stats=stats)
 
 @app.route('/admin/photographers')
+@cached_view(response_cache, 'photographers')
 def admin_photographers():
     if 'user_id' not in session or session.get('user_type') != 'admin':
         return redirect(url_for('login_admin'))
 
-    photographers_list = []
-    for photo_id, photo_info in photographers_db.items():
-        photographer = photo_info.copy()
-        photographer['id'] = photo_id
-        photographers_list.append(photographer)
-
-    return render_template('admin_photographers.html', photographers=photographers_list)
+    return render_template('admin_photographers.html', **catalog_page())
 
 
 @app.route('/admin/manage-users')
+@cached_view(response_cache, 'users')
 def admin_manage_users():
     if 'user_id' not in session or session.get('user_type') != 'admin':
         return redirect(url_for('login_admin'))
@@ -503,17 +975,51 @@ def admin_reports():
     if 'user_id' not in session or session.get('user_type') != 'admin':
         return redirect(url_for('login_admin'))
 
-    total_users = len(users_db)
-    total_bookings = len(bookings_db)
-    photographer_users_count = sum(1 for u in users_db.values() if u.get('user_type') == 'photographer')
+    users_by_type = users_db.count_by_type()
+    bookings_by_status = bookings_db.count_by_status()
 
     stats = {
-        'total_users': total_users,
-        'total_bookings': total_bookings,
-        'photographer_users': photographer_users_count
+        'total_users': sum(users_by_type.values()),
+        'total_bookings': sum(bookings_by_status.values()),
+        'photographer_users': users_by_type.get('photographer', 0),
+        'bookings_by_status': sorted(bookings_by_status.items())
     }
 
-    return render_template('admin_reports.html', stats=stats)
+    # bookings and revenue over a date window, by period and by one dimension
+    granularity = request.args.get('granularity', 'month')
+    by = request.args.get('by', 'photographer')
+    if granularity not in GRANULARITIES:
+        granularity = 'month'
+    if by not in DIMENSIONS:
+        by = 'photographer'
+    error = None
+    try:
+        start = parse_day(request.args['start']) if request.args.get('start') else None
+        end = parse_day(request.args['end']) if request.args.get('end') else None
+    except ValueError:
+        start = end = None
+        error = 'Start and end must be YYYY-MM-DD dates'
+    analytics = booking_analytics.report(start, end, granularity, by, limit=app.config['REPORT_GROUP_LIMIT'])
+    if by == 'photographer':
+        for group in analytics['groups']:
+            photographer = get_photographer_by_id(group['key'])
+            group['label'] = photographer['name'] if photographer else f"#{group['key']}"
+    else:
+        for group in analytics['groups']:
+            group['label'] = group['key'] or 'Unknown'
+
+    return render_template('admin_reports.html', stats=stats, analytics=analytics, error=error,
+                           granularity=granularity, by=by, granularities=GRANULARITIES, dimensions=DIMENSIONS,
+                           start=start.isoformat() if start else '', end=end.isoformat() if end else '')
+
+
+@app.route('/admin/reports/consistency')
+def admin_reports_consistency():
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return redirect(url_for('login_admin'))
+
+    drift = check_counters(users_db, bookings_db)
+    return jsonify({'consistent': not drift, 'drift': drift})
 
 
 @app.route('/admin/settings', methods=['GET', 'POST'])
@@ -564,7 +1070,12 @@ def admin_add_photographer():
         if len(password) < 6:
             return render_template('admin_add_photographer.html', error='Password must be at least 6 characters')
 
-        next_photo_id = max(photographers_db.keys()) + 1 if photographers_db else 1
+        try:
+            password_hash = hash_password(password)
+        except HasherBusy:
+            return render_template('admin_add_photographer.html', error=BUSY_MESSAGE), 503
+
+        next_photo_id = get_next_photographer_id()
 
         photographers_db[next_photo_id] = {
             'name': name,
@@ -580,10 +1091,14 @@ def admin_add_photographer():
         }
 
         photographer_users[username] = {
-            'password': hash_password(password),
+            'password': password_hash,
             'photographer_id': next_photo_id,
             'user_type': 'photographer'
         }
+        catalog_index.add(next_photo_id, photographers_db[next_photo_id])
+        search_index.add(next_photo_id, photographers_db[next_photo_id])
+        booking_analytics.set_photographer(next_photo_id, photographers_db[next_photo_id])
+        response_cache.bump('photographers')
 
         return redirect(url_for('admin_photographers'))
 
@@ -596,9 +1111,31 @@ def admin_delete_photographer(photographer_id):
 
     if photographer_id in photographers_db:
         del photographers_db[photographer_id]
+        catalog_index.remove(photographer_id)
+        search_index.remove(photographer_id)
+        response_cache.bump('photographers')
+        app.session_interface.revoke(f'photographer:{photographer_id}')
 
     return redirect(url_for('admin_photographers'))
 
+@app.route('/admin/photographer/<int:photographer_id>/sessions/revoke', methods=['POST'])
+def admin_revoke_photographer_sessions(photographer_id):
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return redirect(url_for('login_admin'))
+
+    app.session_interface.revoke(f'photographer:{photographer_id}')
+    return redirect(url_for('admin_photographers'))
+
+@app.route('/admin/users/<int:user_id>/sessions/revoke', methods=['POST'])
+def admin_revoke_user_sessions(user_id):
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return redirect(url_for('login_admin'))
+
+    user = get_user_by_id(user_id)
+    if user:
+        app.session_interface.revoke(f"{user['user_type']}:{user_id}")
+    return redirect(url_for('admin_manage_users'))
+
 
 @app.route('/admin/photographer/<int:photographer_id>/edit', methods=['GET', 'POST'])
 def admin_edit_photographer(photographer_id):
@@ -614,13 +1151,8 @@ def admin_edit_photographer(photographer_id):
     photographer_for_template['id'] = photographer_id
 
     # find current username/password hash for this photographer, if any
-    current_username = None
-    current_password_hash = None
-    for uname, info in list(photographer_users.items()):
-        if info.get('photographer_id') == photographer_id:
-            current_username = uname
-            current_password_hash = info.get('password')
-            break
+    current_username, current_info = photographer_users.find_by_photographer(photographer_id)
+    current_password_hash = current_info.get('password') if current_info else None
 
     if request.method == 'POST':
         name = request.form.get('name', '').strip()
@@ -649,8 +1181,16 @@ def admin_edit_photographer(photographer_id):
         if username != current_username and username in photographer_users:
             return render_template('admin_add_photographer.html', error='Username already exists', editing=True, photographer=photographer_for_template, current_username=current_username)
 
+        # hash up front so a busy hasher leaves the record untouched
+        new_password_hash = None
+        if len(password) >= 6:
+            try:
+                new_password_hash = hash_password(password)
+            except HasherBusy:
+                return render_template('admin_add_photographer.html', error=BUSY_MESSAGE, editing=True, photographer=photographer_for_template, current_username=current_username), 503
+
         # update photographer record
-        photographers_db[photographer_id] = {
+        updated = {
             'name': name,
             'specialization': specialization,
             'rate': rate,
@@ -662,6 +1202,20 @@ def admin_edit_photographer(photographer_id):
             'skills': [s.strip() for s in skills.split(',')] if skills else [],
             'availability': availability if availability else photographer.get('availability', ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'])
         }
+        # uploaded photos are managed on the photos page; keep them unless
+        # the image URL was replaced here
+        if updated['image'] == photographer.get('image'):
+            for key in ('image_thumb', 'image_card'):
+                if key in photographer:
+                    updated[key] = photographer[key]
+        if 'portfolio' in photographer:
+            updated['portfolio'] = photographer['portfolio']
+        photographers_db[photographer_id] = updated
+
+        catalog_index.update(photographer_id, updated)
+        search_index.update(photographer_id, updated)
+        booking_analytics.set_photographer(photographer_id, updated)
+        response_cache.bump('photographers')
 
         # handle username mapping
         if current_username and current_username != username:
@@ -673,14 +1227,14 @@ def admin_edit_photographer(photographer_id):
             if len(password) < 6:
                 return render_template('admin_add_photographer.html', error='Password must be at least 6 characters', editing=True, photographer=photographer_for_template, current_username=current_username)
             photographer_users[username] = {
-                'password': hash_password(password),
+                'password': new_password_hash,
                 'photographer_id': photographer_id,
                 'user_type': 'photographer'
             }
         else:
             # preserve existing hash if available
             photographer_users[username] = {
-                'password': current_password_hash or hash_password('changeme'),
+                'password': current_password_hash or legacy_hash('changeme'),
                 'photographer_id': photographer_id,
                 'user_type': 'photographer'
             }
@@ -690,6 +1244,204 @@ def admin_edit_photographer(photographer_id):
     # GET
     return render_template('admin_add_photographer.html', editing=True, photographer=photographer_for_template, current_username=current_username)
 
+@app.route('/admin/data')
+def admin_data():
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return redirect(url_for('login_admin'))
+
+    return render_template('admin_data.html')
+
+@app.route('/admin/photographers/import', methods=['POST'])
+def admin_import_photographers():
+    # CSV or JSONL in, an NDJSON report out: one line per rejected row, one
+    # per committed batch and a final summary. The upload is read and
+    # validated while the report streams back
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return error_response(401, 'admin login required')
+
+    upload = request.files.get('file')
+    if upload is not None and upload.filename:
+        stream = upload.stream
+        fmt = request.form.get('format') or ('csv' if upload.filename.lower().endswith('.csv') else 'jsonl')
+    elif request.mimetype in ('text/csv', 'application/x-ndjson', 'application/jsonl'):
+        stream = request.stream
+        fmt = 'csv' if request.mimetype == 'text/csv' else 'jsonl'
+    else:
+        return error_response(400, 'upload a CSV or JSONL file')
+    if fmt not in ('csv', 'jsonl'):
+        return error_response(400, 'format must be csv or jsonl')
+
+    importer = PhotographerImporter(
+        photographers_db, photographer_users, (catalog_index, search_index),
+        password_hasher.scheme, password_hasher.params,
+        batch_size=app.config['BULK_IMPORT_BATCH_SIZE'],
+        workers=app.config['BULK_IMPORT_HASH_WORKERS'],
+        on_commit=lambda: response_cache.bump('photographers')
+    )
+    report = ndjson_lines(importer.run(read_rows(stream, fmt)), chunk_bytes=0)
+    return app.response_class(stream_with_context(report), mimetype='application/x-ndjson')
+
+# -- JSON API ---------------------------------------------------------------
+# the same data as the HTML pages without the templates: cursor pagination,
+# ?fields= to pick fields, gzip when the client accepts it
+
+@app.errorhandler(ApiError)
+def api_error(error):
+    return error_response(error.status, error.message)
+
+@app.after_request
+def compress_api_response(response):
+    if request.path.startswith(API_PREFIX + '/'):
+        return gzip_response(response, app.config['API_GZIP_LEVEL'])
+    return response
+
+def next_page_link(next_cursor, param='cursor'):
+    if not next_cursor:
+        return None
+    args = request.args.to_dict()
+    args[param] = next_cursor
+    return url_for(request.endpoint, **request.view_args, **args)
+
+def photographer_resource(photographer_id, photographer, fields):
+    record = dict(photographer)
+    record['id'] = photographer_id
+    return select_fields(record, fields)
+
+@app.route(API_PREFIX + '/photographers')
+def api_photographers():
+    if 'user_id' not in session:
+        return error_response(401, 'login required')
+
+    fields = requested_fields(PHOTOGRAPHER_FIELDS)
+    limit = page_limit(app.config['API_PAGE_SIZE'], app.config['API_MAX_PAGE_SIZE'])
+    try:
+        ids, next_cursor = catalog_index.query(
+            sort=request.args.get('sort', 'id'), cursor=request.args.get('cursor') or None,
+            limit=limit, **catalog_filters()
+        )
+    except ValueError:
+        raise ApiError(400, 'invalid cursor')
+
+    data = []
+    for photographer_id in ids:
+        photographer = photographers_db.get(photographer_id)
+        if photographer is not None:
+            data.append(photographer_resource(photographer_id, photographer, fields))
+    return jsonify({'data': data, 'next_cursor': next_cursor, 'next': next_page_link(next_cursor)})
+
+@app.route(API_PREFIX + '/photographers/search')
+def api_search_photographers():
+    # ?q= ranked by BM25 within the catalog filters; pages by offset
+    if 'user_id' not in session:
+        return error_response(401, 'login required')
+
+    query = request.args.get('q', '').strip()
+    if not query:
+        raise ApiError(400, 'q is required')
+    fields = requested_fields(PHOTOGRAPHER_FIELDS)
+    limit = page_limit(app.config['API_PAGE_SIZE'], app.config['API_MAX_PAGE_SIZE'])
+    results, _, next_offset = search_page(query, catalog_filters(), limit)
+
+    data = []
+    for photographer_id, score in results:
+        photographer = photographers_db.get(photographer_id)
+        if photographer is not None:
+            resource = photographer_resource(photographer_id, photographer, fields)
+            resource['score'] = round(score, 4)
+            data.append(resource)
+    return jsonify({'data': data, 'next_offset': next_offset, 'next': next_page_link(next_offset, 'offset')})
+
+@app.route(API_PREFIX + '/photographers/suggest')
+def api_suggest_photographers():
+    # autocomplete: the query with its last word completed
+    if 'user_id' not in session:
+        return error_response(401, 'login required')
+
+    limit = page_limit(app.config['SEARCH_SUGGESTIONS'], app.config['SEARCH_SUGGESTIONS'])
+    return jsonify({'data': search_index.suggest(request.args.get('q', ''), limit)})
+
+@app.route(API_PREFIX + '/photographers/<int:photographer_id>')
+def api_photographer(photographer_id):
+    if 'user_id' not in session:
+        return error_response(401, 'login required')
+
+    photographer = get_photographer_by_id(photographer_id)
+    if not photographer:
+        return error_response(404, 'photographer not found')
+    return jsonify({'data': photographer_resource(photographer_id, photographer,
+                                                  requested_fields(PHOTOGRAPHER_FIELDS))})
+
+@app.route(API_PREFIX + '/bookings')
+def api_bookings():
+    # customers get /dashboard's bookings, photographers get
+    # /photographer-dashboard's; both in (date, time, id) order
+    user_type = session.get('user_type')
+    if 'user_id' not in session or user_type not in ('customer', 'photographer'):
+        return error_response(401, 'login required')
+
+    fields = requested_fields(BOOKING_FIELDS)
+    limit = page_limit(app.config['API_PAGE_SIZE'], app.config['API_MAX_PAGE_SIZE'])
+    cursor = request.args.get('cursor')
+    after = decode_booking_cursor(cursor) if cursor else None
+
+    # one extra row tells whether there is a next page
+    if user_type == 'customer':
+        page = bookings_db.for_user(session['user_id'], extra=with_photographer_name,
+                                    after=after, limit=limit + 1)
+    else:
+        page = bookings_db.for_photographer(session.get('photographer_id'), after=after, limit=limit + 1)
+
+    next_cursor = encode_booking_cursor(page[limit - 1]) if len(page) > limit else None
+    return jsonify({
+        'data': [select_fields(booking, fields) for booking in page[:limit]],
+        'next_cursor': next_cursor,
+        'next': next_page_link(next_cursor)
+    })
+
+@app.route(API_PREFIX + '/admin/bookings/export')
+def api_admin_bookings_export():
+    # bookings as NDJSON (default) or CSV, streamed in id order straight
+    # from the store; start/end (inclusive dates) and photographer_id filter
+    if 'user_id' not in session or session.get('user_type') != 'admin':
+        return error_response(401, 'admin login required')
+
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in ('jsonl', 'ndjson', 'csv'):
+        raise ApiError(400, 'format must be jsonl or csv')
+    fields = requested_fields(BOOKING_FIELDS)
+    try:
+        start_date = parse_day(request.args['start']).isoformat() if request.args.get('start') else None
+        end_date = parse_day(request.args['end']).isoformat() if request.args.get('end') else None
+    except ValueError:
+        raise ApiError(400, 'start and end must be YYYY-MM-DD dates')
+    photographer_id = int_arg('photographer_id')
+    after_id = int_arg('after_id')
+    names = {}
+
+    def photographer_name(photographer_id):
+        # a handful of photographers cover millions of bookings
+        if photographer_id not in names:
+            photographer = get_photographer_by_id(photographer_id)
+            names[photographer_id] = photographer['name'] if photographer else 'Unknown'
+        return names[photographer_id]
+
+    def rows():
+        for booking_id, booking in bookings_db.scan(after_id=after_id, photographer_id=photographer_id,
+                                                    start_date=start_date, end_date=end_date):
+            record = dict(booking)
+            record['id'] = booking_id
+            if 'photographer_name' in fields:
+                record['photographer_name'] = photographer_name(booking['photographer_id'])
+            yield select_fields(record, fields)
+
+    if fmt == 'csv':
+        response = app.response_class(csv_chunks(rows(), fields), mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename=bookings.csv'
+    else:
+        response = app.response_class(ndjson_lines(rows()), mimetype='application/x-ndjson')
+        response.headers['Content-Disposition'] = 'attachment; filename=bookings.jsonl'
+    return response
+
 @app.errorhandler(404)
 def page_not_found(error):
     return render_template('404.html'), 404
@@ -699,7 +1451,7 @@ def server_error(error):
     return render_template('500.html'), 500
 
 if __name__ == '__main__':
-    app.run(
+    create_app().run(
         host='localhost',
         port=5000,
         debug=True
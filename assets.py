@@ -0,0 +1,156 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+
+# python assets.py copies every file under static/ into ASSET_BUILD_DIR as
+# name.<hash>.ext, with .gz and .br siblings for text formats, and writes
+# manifest.json mapping each source name to its fingerprinted name and the
+# encodings built for it. The app serves those files as immutable and only
+# ever picks between the prebuilt variants, it never compresses per request
+
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+# user photos are content-addressed already and served as they are
+SKIP_DIRS = ('uploads',)
+
+# best first when the client accepts several equally
+ENCODINGS = ('br', 'gzip')
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+# images and fonts are compressed formats already
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# below this the gzip/brotli framing costs more than it saves
+COMPRESS_MIN_BYTES = 256
+
+# a fingerprinted name never changes content, so browsers can keep it for
+# a year without revalidating
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def content_type(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def compressible(name):
+    return content_type(name).startswith(COMPRESSIBLE_TYPES)
+
+
+def fingerprint(name, data):
+    stem, extension = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{extension}'
+
+
+def compress(data):
+    # encoding -> bytes, only for the encodings that come out smaller
+    import brotli
+    variants = {
+        'br': brotli.compress(data, quality=11),
+        # mtime=0 keeps the .gz identical from build to build
+        'gzip': gzip.compress(data, 9, mtime=0),
+    }
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+def write_file(build_dir, name, data):
+    target = os.path.join(build_dir, *name.split('/'))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # write under a temporary name and rename so a running server never
+    # sees half a file
+    partial = f'{target}.{os.getpid()}.part'
+    with open(partial, 'wb') as f:
+        f.write(data)
+    os.replace(partial, target)
+
+
+def source_files(source_dir, skip=SKIP_DIRS):
+    for root, dirs, files in os.walk(source_dir):
+        relative = os.path.relpath(root, source_dir)
+        dirs[:] = sorted(d for d in dirs if os.path.normpath(os.path.join(relative, d)) not in skip)
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            yield os.path.relpath(path, source_dir).replace(os.sep, '/'), path
+
+
+def build(source_dir, build_dir, skip=SKIP_DIRS):
+    # files from earlier builds are left in place, so pages rendered before
+    # a deploy still find the assets they link to; the manifest is written
+    # last and switches the app over on its next start
+    manifest = {}
+    for name, path in source_files(source_dir, skip):
+        with open(path, 'rb') as f:
+            data = f.read()
+        fingerprinted = fingerprint(name, data)
+        variants = compress(data) if compressible(name) and len(data) >= COMPRESS_MIN_BYTES else {}
+        if not os.path.exists(os.path.join(build_dir, *fingerprinted.split('/'))):
+            for encoding, body in variants.items():
+                write_file(build_dir, fingerprinted + SUFFIXES[encoding], body)
+            write_file(build_dir, fingerprinted, data)
+        manifest[name] = {
+            'path': fingerprinted,
+            'bytes': len(data),
+            'encodings': {encoding: len(body) for encoding, body in variants.items()},
+        }
+    write_file(build_dir, MANIFEST, json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+class AssetManifest:
+    # the built manifest, read once at start. Only names listed in it are
+    # served, so a request can never reach outside the build directory.
+    # Without a build it is empty and asset_url falls back to /static
+
+    def __init__(self, build_dir, manifest):
+        self.build_dir = build_dir
+        self._paths = {name: entry['path'] for name, entry in manifest.items()}
+        # fingerprinted name -> (content type, encodings available)
+        self._files = {
+            entry['path']: (content_type(name), tuple(e for e in ENCODINGS if e in entry['encodings']))
+            for name, entry in manifest.items()
+        }
+
+    @classmethod
+    def load(cls, build_dir):
+        try:
+            with open(os.path.join(build_dir, MANIFEST), 'rb') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        return cls(build_dir, manifest)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def path_for(self, name):
+        # the fingerprinted name of a static/ file, None if it was not built
+        return self._paths.get(name)
+
+    def negotiate(self, path, accept_encodings):
+        """Pick the variant of a fingerprinted file for an Accept-Encoding.
+
+        Returns (file path, content type, encoding or None for identity,
+        whether other encodings exist), or None for names not in the
+        manifest.
+        """
+        found = self._files.get(path)
+        if found is None:
+            return None
+        mimetype, encodings = found
+        encoding = None
+        best = 0
+        for candidate in encodings:
+            quality = accept_encodings[candidate]
+            if quality > best:
+                encoding, best = candidate, quality
+        filename = path + SUFFIXES[encoding] if encoding else path
+        return os.path.join(self.build_dir, *filename.split('/')), mimetype, encoding, bool(encodings)
+
+
+if __name__ == '__main__':
+    from app import app
+
+    built = build(os.path.join(app.root_path, 'static'), app.config['ASSET_BUILD_DIR'])
+    for name, entry in built.items():
+        sizes = ', '.join(f'{encoding} {size}' for encoding, size in entry['encodings'].items())
+        print(f"{name} -> {entry['path']} ({entry['bytes']} bytes{', ' + sizes if sizes else ''})")
@@ -1,9 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session
-import boto3
+from flask import Blueprint, current_app, render_template, request, redirect, url_for, session, jsonify
 import uuid
 import os
 from werkzeug.utils import secure_filename
-from botocore.exceptions import ClientError
+
+from aws_cache import CachedTable
+from aws_clients import AWSClientFactory, LazyTable
+from dynamo_batch import batch_get_items
+from metrics import admin_or_token
+from notifications import NotificationDispatcher
 
 aws_bp = Blueprint('aws', __name__)
 
@@ -11,27 +15,34 @@ aws_bp = Blueprint('aws', __name__)
 REGION = 'us-east-1'
 SNS_TOPIC_ARN = 'arn:aws:sns:us-east-1:897722679886:aws_topic'
 
-dynamodb = boto3.resource('dynamodb', region_name=REGION)
-sns = boto3.client('sns', region_name=REGION)
-
-users_table = dynamodb.Table('Users')
-admin_users_table = dynamodb.Table('AdminUsers')
-projects_table = dynamodb.Table('Projects')
-enrollments_table = dynamodb.Table('Enrollments')
+# clients are created lazily, once per process, on first use
+aws = AWSClientFactory.from_env(REGION)
+
+# read-through caches: seconds an entry (or a known-missing key) is trusted
+# and how many entries each table may hold
+USERS_CACHE_TTL = 60
+ENROLLMENTS_CACHE_TTL = 30
+NEGATIVE_CACHE_TTL = 10
+CACHE_MAX_ENTRIES = 10000
+
+users_table = CachedTable(LazyTable(aws, 'Users'), key_names=['username'],
+                          ttl=USERS_CACHE_TTL, negative_ttl=NEGATIVE_CACHE_TTL,
+                          max_entries=CACHE_MAX_ENTRIES)
+admin_users_table = LazyTable(aws, 'AdminUsers')
+projects_table = LazyTable(aws, 'Projects')
+enrollments_table = CachedTable(LazyTable(aws, 'Enrollments'), key_names=['username'],
+                                ttl=ENROLLMENTS_CACHE_TTL, negative_ttl=NEGATIVE_CACHE_TTL,
+                                max_entries=CACHE_MAX_ENTRIES)
 
 UPLOAD_FOLDER = 'static/uploads'
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+notifier = NotificationDispatcher(lambda: aws.client('sns'), SNS_TOPIC_ARN)
+
 # ---------------- HELPERS ----------------
 def send_notification(subject, message):
-    try:
-        sns.publish(
-            TopicArn=SNS_TOPIC_ARN,
-            Subject=subject,
-            Message=message
-        )
-    except ClientError as e:
-        print("SNS error:", e)
+    # queued for the background dispatcher; never blocks the request
+    notifier.submit(subject, message)
 
 # ---------------- ROUTES ----------------
 
@@ -83,14 +94,19 @@ def dashboard():
     res = enrollments_table.get_item(Key={'username': username})
     project_ids = res.get('Item', {}).get('project_ids', [])
 
-    projects = []
-    for pid in project_ids:
-        p = projects_table.get_item(Key={'id': pid})
-        if 'Item' in p:
-            projects.append(p['Item'])
+    projects = batch_get_items(aws.resource('dynamodb'), projects_table.name, 'id', project_ids)
 
     return render_template('aws/dashboard.html', projects=projects)
 
+@aws_bp.route('/cache-stats')
+def cache_stats():
+    # cache internals are for operators, gated like /metrics: an admin
+    # session or the METRICS_TOKEN bearer token, not any signed-in user
+    if not admin_or_token(current_app.config.get('METRICS_TOKEN')):
+        return jsonify({'error': 'admin login or metrics token required'}), 401
+
+    return jsonify([users_table.stats(), enrollments_table.stats()])
+
 @aws_bp.route('/logout')
 def logout():
     session.pop('aws_user', None)
@@ -0,0 +1,112 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class CachedTable:
+    # read-through cache in front of a DynamoDB Table. get_item answers from
+    # memory while an entry is younger than ttl; keys that do not exist are
+    # cached too (for negative_ttl) so repeated signups and failed logins do
+    # not cost a read. put_item writes to DynamoDB first and then replaces
+    # the cached copy. Anything else is passed straight to the table.
+    # Items go into the cache and come out of it as deep copies, so a caller
+    # editing what it got back (or what it wrote) never changes the cache
+
+    def __init__(self, table, key_names, ttl=60.0, negative_ttl=None, max_entries=10000,
+                 clock=time.monotonic):
+        self.table = table
+        self.key_names = tuple(key_names)
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getattr__(self, name):
+        return getattr(self.table, name)
+
+    def _cache_key(self, attributes):
+        return tuple(attributes[name] for name in self.key_names)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            item, expires = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if item is _MISSING:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def _store(self, key, item):
+        ttl = self.negative_ttl if item is _MISSING else self.ttl
+        with self._lock:
+            self._entries[key] = (item, self.clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_item(self, Key, **kwargs):
+        if kwargs:
+            # projections and consistent reads bypass the cache
+            return self.table.get_item(Key=Key, **kwargs)
+        key = self._cache_key(Key)
+        entry = self._lookup(key)
+        if entry is not None:
+            item = entry[0]
+            return {} if item is _MISSING else {'Item': copy.deepcopy(item)}
+        response = self.table.get_item(Key=Key)
+        self._store(key, copy.deepcopy(response['Item']) if 'Item' in response else _MISSING)
+        return response
+
+    def put_item(self, Item, **kwargs):
+        key = self._cache_key(Item)
+        try:
+            response = self.table.put_item(Item=Item, **kwargs)
+        except Exception:
+            self.invalidate(Item)
+            raise
+        if kwargs:
+            # conditional or value-returning writes: let the next read refetch
+            self.invalidate(Item)
+        else:
+            self._store(key, copy.deepcopy(Item))
+        return response
+
+    def invalidate(self, attributes):
+        with self._lock:
+            self._entries.pop(self._cache_key(attributes), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'table': getattr(self.table, 'name', None),
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,105 @@
+import os
+import threading
+
+
+class AWSClientFactory:
+    # boto3 clients built on first use and shared by every thread of the
+    # current process (clients are thread-safe; resources are not, so those
+    # are cached per thread). botocore connection pools must not be shared
+    # across fork, so a child process starts with empty caches and builds
+    # its own clients the first time it needs them
+
+    def __init__(self, region, max_pool_connections=50, tcp_keepalive=True,
+                 retry_mode='standard', max_attempts=5, connect_timeout=5, read_timeout=10):
+        self.region = region
+        self.max_pool_connections = max_pool_connections
+        self.tcp_keepalive = tcp_keepalive
+        self.retry_mode = retry_mode
+        self.max_attempts = max_attempts
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self._lock = threading.Lock()
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    @classmethod
+    def from_env(cls, region):
+        return cls(
+            region=os.environ.get('AWS_REGION', region),
+            max_pool_connections=int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', 50)),
+            tcp_keepalive=os.environ.get('AWS_TCP_KEEPALIVE', '1') != '0',
+            retry_mode=os.environ.get('AWS_RETRY_MODE', 'standard'),
+            max_attempts=int(os.environ.get('AWS_MAX_ATTEMPTS', 5))
+        )
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self._clients = {}
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def _config(self):
+        from botocore.config import Config
+        return Config(
+            region_name=self.region,
+            max_pool_connections=self.max_pool_connections,
+            tcp_keepalive=self.tcp_keepalive,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            retries={'mode': self.retry_mode, 'total_max_attempts': self.max_attempts}
+        )
+
+    def _boto_session(self):
+        # boto3's default session is not thread-safe to create clients from,
+        # so every client comes from one explicit session per process
+        if self._session is None:
+            import boto3
+            self._session = boto3.session.Session(region_name=self.region)
+        return self._session
+
+    def _check_pid(self):
+        if self._pid != os.getpid():
+            # fork without register_at_fork (or from a non-Python fork path)
+            self._reset()
+
+    def client(self, service):
+        self._check_pid()
+        client = self._clients.get(service)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(service)
+                if client is None:
+                    client = self._boto_session().client(service, config=self._config())
+                    self._clients[service] = client
+        return client
+
+    def resource(self, service):
+        self._check_pid()
+        resources = self._local.__dict__.setdefault('resources', {})
+        resource = resources.get(service)
+        if resource is None:
+            with self._lock:
+                resource = self._boto_session().resource(service, config=self._config())
+            resources[service] = resource
+        return resource
+
+    def table(self, name):
+        self._check_pid()
+        tables = self._local.__dict__.setdefault('tables', {})
+        table = tables.get(name)
+        if table is None:
+            table = tables[name] = self.resource('dynamodb').Table(name)
+        return table
+
+
+class LazyTable:
+    # stands in for a DynamoDB Table at import time and resolves it through
+    # the factory on first use
+    def __init__(self, factory, name):
+        self.factory = factory
+        self.name = name
+
+    def __getattr__(self, attribute):
+        return getattr(self.factory.table(self.name), attribute)
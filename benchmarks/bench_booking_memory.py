@@ -0,0 +1,103 @@
+# Resident memory of the in-memory booking store at 1M bookings.
+#
+#   python benchmarks/bench_booking_memory.py [--bookings 1000000]
+#   python benchmarks/bench_booking_memory.py --before <git-ref>
+#
+# Every sample runs in a fresh interpreter that imports booking_store from
+# the tree being measured, adds --bookings synthetic bookings through
+# BookingStore.add (records plus the per-customer and per-photographer
+# indexes) and reports how much the process RSS grew. Bookings are built the
+# way the booking form builds them: fresh date, time, location and
+# created_at strings per booking, status from a literal. With --before the
+# same run is repeated in a temporary git worktree checked out at that ref.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE = r'''
+import gc, json, os, random, sys, time
+from datetime import date, timedelta
+sys.path.insert(0, '.')
+from booking_store import BookingStore
+
+LOCATIONS = ['New York, NY', 'Los Angeles, CA', 'Chicago, IL', 'Houston, TX', 'Phoenix, AZ',
+             'Seattle, WA', 'Miami, FL', 'Boston, MA', 'Denver, CO', 'Austin, TX',
+             'Atlanta, GA', 'Portland, OR']
+STATUSES = ['Pending', 'Pending', 'Confirmed', 'Confirmed', 'Confirmed', 'Completed', 'Cancelled', 'Rejected']
+
+
+def rss_kb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * (os.sysconf('SC_PAGE_SIZE') // 1024)
+
+
+count, users, photographers = (int(v) for v in sys.argv[1:4])
+rng = random.Random(42)
+first_day = date(2026, 1, 1)
+store = BookingStore()
+gc.collect()
+before = rss_kb()
+started = time.perf_counter()
+for booking_id in range(1, count + 1):
+    day = first_day + timedelta(days=rng.randrange(730))
+    minute = rng.randrange(9, 18) * 60
+    store.add(booking_id, {
+        'id': booking_id,
+        'booking_number': booking_id,
+        'user_id': rng.randrange(1, users + 1),
+        'photographer_id': rng.randrange(1, photographers + 1),
+        'date': day.isoformat(),
+        'time': f'{minute // 60:02d}:{minute % 60:02d}',
+        # a new string per booking, as request.form gives
+        'location': ''.join(rng.choice(LOCATIONS)),
+        'notes': '',
+        'created_at': f'{(day - timedelta(days=rng.randint(1, 60))).isoformat()} 12:00:00',
+        'status': rng.choice(STATUSES),
+    })
+load_seconds = time.perf_counter() - started
+gc.collect()
+after = rss_kb()
+print(json.dumps({'bookings': count, 'rss_growth_mb': round((after - before) / 1024, 1),
+                  'bytes_per_booking': round((after - before) * 1024 / count, 1),
+                  'load_seconds': round(load_seconds, 2)}))
+'''
+
+
+def measure(tree, args):
+    out = subprocess.run([sys.executable, '-c', SAMPLE, str(args.bookings), str(args.users),
+                          str(args.photographers)], cwd=tree, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--photographers', type=int, default=10000)
+    parser.add_argument('--before', help='git ref to compare against')
+    args = parser.parse_args()
+
+    result = {'after': measure(ROOT, args)}
+    if args.before:
+        with tempfile.TemporaryDirectory() as tmp:
+            before_tree = os.path.join(tmp, 'before')
+            subprocess.run(['git', 'worktree', 'add', '--detach', before_tree, args.before],
+                           cwd=ROOT, check=True, capture_output=True)
+            try:
+                before = measure(before_tree, args)
+            finally:
+                subprocess.run(['git', 'worktree', 'remove', '--force', before_tree],
+                               cwd=ROOT, check=False, capture_output=True)
+        result['before'] = dict(before, ref=args.before)
+        result['memory_saved'] = round(1 - result['after']['rss_growth_mb'] / before['rss_growth_mb'], 3)
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# Journal write throughput, snapshot size and cold-start time of the
+# journaled memory stores.
+#
+#   python benchmarks/bench_journal.py [--bookings 1000000] [--tail 100000]
+#
+# Fills a fresh JOURNAL_DIR through the journaled stores (every booking is
+# a journaled write), takes a snapshot, writes --tail more bookings that
+# stay in the journal only, and then starts a new interpreter that opens
+# the directory the way app.py does: mmap the snapshot, load the stores
+# and replay the journal tail. A last run kills the writer with os._exit
+# mid-stream and reports how many acknowledged writes the restart lost.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMON = r'''
+import json, os, random, sys, time
+from datetime import date, timedelta
+sys.path.insert(0, '.')
+from journal import DurableStores
+from repository import create_repositories
+
+LOCATIONS = ['New York, NY', 'Los Angeles, CA', 'Chicago, IL', 'Houston, TX', 'Phoenix, AZ',
+             'Seattle, WA', 'Miami, FL', 'Boston, MA', 'Denver, CO', 'Austin, TX']
+STATUSES = ['Pending', 'Confirmed', 'Confirmed', 'Completed', 'Cancelled']
+
+
+def open_durable(directory):
+    # what create_repositories does for JOURNAL_DIR, minus the periodic snapshots
+    return DurableStores.open({'JOURNAL_DIR': directory, 'JOURNAL_SNAPSHOT_INTERVAL': 1e9,
+                               'JOURNAL_SNAPSHOT_BYTES': 1 << 62},
+                              create_repositories({'STORAGE_BACKEND': 'memory'}, {}, {}, {}))
+
+
+def add_bookings(stores, count, users, photographers, seed):
+    rng = random.Random(seed)
+    first_day = date(2026, 1, 1)
+    for _ in range(count):
+        booking_id = stores.bookings.next_id()
+        day = first_day + timedelta(days=rng.randrange(730))
+        stores.bookings.add(booking_id, {
+            'id': booking_id, 'booking_number': booking_id,
+            'user_id': rng.randrange(1, users + 1), 'photographer_id': rng.randrange(1, photographers + 1),
+            'date': day.isoformat(), 'time': f'{rng.randrange(8, 18):02d}:00',
+            'location': rng.choice(LOCATIONS), 'notes': '',
+            'created_at': f'{(day - timedelta(days=rng.randint(1, 60))).isoformat()} 12:00:00',
+            'status': rng.choice(STATUSES),
+        })
+'''
+
+FILL = COMMON + r'''
+directory, count, tail, users = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+durable = open_durable(directory)
+stores = durable.repositories
+for user_id in range(1, users + 1):
+    stores.users.add(stores.users.next_id(), {'username': f'user{user_id}', 'email': f'user{user_id}@example.com',
+                                              'password': 'x', 'user_type': 'customer'})
+started = time.perf_counter()
+add_bookings(stores, count, users, 5000, 1)
+write_seconds = time.perf_counter() - started
+started = time.perf_counter()
+path, size = durable.snapshot()
+snapshot_seconds = time.perf_counter() - started
+add_bookings(stores, tail, users, 5000, 2)
+durable.close()
+print(json.dumps({'writes_per_second': round(count / write_seconds), 'snapshot_seconds': round(snapshot_seconds, 2),
+                  'snapshot_mb': round(size / 2 ** 20, 1),
+                  'snapshot_bytes_per_booking': round(size / count, 1)}))
+'''
+
+START = COMMON + r'''
+directory = sys.argv[1]
+started = time.perf_counter()
+durable = open_durable(directory)
+seconds = time.perf_counter() - started
+print(json.dumps(dict(durable.recovery, cold_start_seconds=round(seconds, 2), bookings=len(durable.stores.bookings),
+                      users=len(durable.stores.users))))
+durable.close()
+'''
+
+CRASH = COMMON + r'''
+directory, count = sys.argv[1], int(sys.argv[2])
+stores = open_durable(directory).repositories
+add_bookings(stores, count, 10, 50, 3)
+# acknowledged but at most one commit window from disk
+print(json.dumps({'acknowledged': len(stores.bookings)}), flush=True)
+os._exit(0)
+'''
+
+
+def run(code, *args):
+    out = subprocess.run([sys.executable, '-c', code] + [str(arg) for arg in args], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--tail', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--crash-writes', type=int, default=20000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = os.path.join(tmp, 'journal')
+        result = {'fill': run(FILL, directory, args.bookings, args.tail, args.users)}
+        result['cold_start'] = run(START, directory)
+
+        crash_directory = os.path.join(tmp, 'crash')
+        acknowledged = run(CRASH, crash_directory, args.crash_writes)['acknowledged']
+        recovered = run(START, crash_directory)['bookings']
+        result['crash'] = {'acknowledged': acknowledged, 'recovered': recovered,
+                           'lost': acknowledged - recovered}
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
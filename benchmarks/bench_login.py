@@ -0,0 +1,125 @@
+# Customer login throughput at several password KDF cost settings.
+#
+#   python benchmarks/bench_login.py --threads 16 --seconds 5
+#
+# Each setting registers a fresh set of users hashed with that setting, then
+# drives POST /login/customer from many threads through the Flask test
+# client and reports successful logins per second and latency percentiles.
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as booking_app  # noqa: E402
+from passwords import PasswordHasher, legacy_hash  # noqa: E402
+
+booking_app.create_app()
+
+
+SETTINGS = [
+    ('legacy-sha256', None),
+    ('pbkdf2-100k', {'scheme': 'pbkdf2_sha256', 'params': {'iterations': 100000}}),
+    ('pbkdf2-260k', {'scheme': 'pbkdf2_sha256', 'params': {'iterations': 260000}}),
+    ('pbkdf2-600k', {'scheme': 'pbkdf2_sha256', 'params': {'iterations': 600000}}),
+    ('scrypt-n16k', {'scheme': 'scrypt', 'params': {'n': 2 ** 14, 'r': 8, 'p': 1}}),
+]
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_setting(name, setting, users, threads, seconds, workers):
+    if setting is None:
+        # stored hashes stay SHA-256 for the whole run: the hasher is set to
+        # legacy-compatible cost so nothing is upgraded mid-benchmark
+        hasher = PasswordHasher(workers=workers, params={'iterations': 1})
+        hasher.needs_rehash = lambda encoded: False
+        make_hash = legacy_hash
+    else:
+        hasher = PasswordHasher(workers=workers, max_pending=threads * 2, timeout=30, **setting)
+        make_hash = hasher.hash
+    booking_app.password_hasher = hasher
+
+    prefix = f'{name}-{time.monotonic_ns()}'
+    password = 'benchmark-password'
+    password_hash = make_hash(password)
+    for i in range(users):
+        booking_app.users_db.add(booking_app.get_next_user_id(), {
+            'username': f'{prefix}-{i}', 'email': f'{prefix}-{i}@example.com',
+            'password': password_hash, 'user_type': 'customer', 'created_at': ''
+        })
+
+    latencies = []
+    failures = [0]
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+
+    def worker(index):
+        client = booking_app.app.test_client()
+        n = index
+        local = []
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = client.post('/login/customer', data={
+                'username': f'{prefix}-{n % users}', 'password': password
+            })
+            elapsed = time.perf_counter() - start
+            if response.status_code == 302:
+                local.append(elapsed)
+            else:
+                with lock:
+                    failures[0] += 1
+            n += threads
+        with lock:
+            latencies.extend(local)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - started
+    hasher.shutdown()
+
+    return {
+        'setting': name,
+        'logins': len(latencies),
+        'rejected': failures[0],
+        'logins_per_second': round(len(latencies) / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--only', nargs='*', help='setting names to run')
+    args = parser.parse_args()
+
+    results = []
+    for name, setting in SETTINGS:
+        if args.only and name not in args.only:
+            continue
+        result = run_setting(name, setting, args.users, args.threads, args.seconds, args.workers)
+        print(json.dumps(result), file=sys.stderr)
+        results.append(result)
+    print(json.dumps({'threads': args.threads, 'workers': args.workers, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
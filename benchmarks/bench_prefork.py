@@ -0,0 +1,236 @@
+# Per-worker memory and startup time under gunicorn, with and without
+# building the app in the master before the fork.
+#
+#   python benchmarks/bench_prefork.py [--workers 4] [--scale 0.3]
+#
+# Each variant starts gunicorn on the same synthetic data set (bench_routes'
+# populate at --scale of its full size) and waits until every worker has
+# loaded the app (gunicorn's post_worker_init); that wait is the startup
+# time. It then drives the catalog, search, API and report pages until every
+# worker has served --requests of them, has each worker run one full
+# collection (as a long-running worker eventually does) and reads
+# /proc/<pid>/smaps_rollup of every worker:
+#
+#   per-worker   preload off: each worker imports and builds the app itself
+#                (how the app had to be run before create_app/wsgi.py)
+#   preload      wsgi.py's create_app() + warm_up() in the master, no gc.freeze
+#   preload+freeze  gunicorn.conf.py as shipped: preload plus gc.freeze()
+#
+# uss is memory only that worker holds (private pages), pss splits shared
+# pages between the processes sharing them. Sessions go to a shared sqlite
+# file so a login is valid in every worker.
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY = r'''
+import os
+import bench_routes
+from bench_routes import booking_app, populate, PASSWORD
+from passwords import legacy_hash
+
+scale = float(os.environ['BENCH_SCALE'])
+populate(int(100000 * scale), int(10000 * scale), int(1000000 * scale), 42, legacy_hash(PASSWORD),
+         progress=open(os.devnull, 'w'))
+
+
+@booking_app.app.after_request
+def worker_pid(response):
+    response.headers['X-Worker-Pid'] = str(os.getpid())
+    return response
+
+
+if os.environ.get('BENCH_WARM_UP') == '1':
+    booking_app.warm_up()
+application = booking_app.app
+'''
+
+HOOKS = r'''
+
+def post_worker_init(worker):
+    import os
+    open(os.path.join(os.environ['BENCH_READY_DIR'], str(os.getpid())), 'w').close()
+
+def post_request(worker, req, environ, resp):
+    # one full collection per worker after its first request
+    if not getattr(worker, 'bench_collected', False):
+        worker.bench_collected = True
+        import gc
+        gc.collect()
+'''
+
+VARIANTS = {
+    'per-worker': "preload_app = False\nworker_class = 'gthread'\nthreads = 4\n",
+    'preload': "preload_app = True\nworker_class = 'gthread'\nthreads = 4\n",
+    'preload+freeze': None,   # gunicorn.conf.py
+}
+
+PAGES = [
+    '/photographers', '/photographers?sort=rate', '/photographers?q=wedding', '/photographers?q=portrait+studio',
+    '/api/v1/photographers?limit=100', '/api/v1/photographers/search?q=drone+lighting',
+    '/api/v1/photographers/suggest?q=we', '/admin/reports?granularity=week&by=location',
+    '/admin/photographers',
+]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request(port, method, path, body=None, cookie=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = {'Connection': 'close'}
+    if cookie:
+        headers['Cookie'] = cookie
+    if body is not None:
+        body = urllib.parse.urlencode(body)
+        headers['Content-Type'] = 'application/x-www-form-urlencoded'
+    try:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response
+    finally:
+        connection.close()
+
+
+def smaps(pid):
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[-1] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {'rss_mb': fields['Rss'] / 1024, 'pss_mb': fields['Pss'] / 1024,
+            'uss_mb': (fields['Private_Clean'] + fields['Private_Dirty']) / 1024}
+
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+
+def run_variant(name, args, tmp):
+    port = free_port()
+    conf = os.path.join(tmp, f'{name}.conf.py')
+    with open(conf, 'w') as f:
+        if VARIANTS[name] is None:
+            with open(os.path.join(ROOT, 'gunicorn.conf.py')) as shipped:
+                f.write(shipped.read())
+        else:
+            f.write(VARIANTS[name])
+        f.write(f'\nbind = "127.0.0.1:{port}"\nworkers = {args.workers}\n')
+        f.write(HOOKS)
+    ready_dir = os.path.join(tmp, f'{name}.ready')
+    os.mkdir(ready_dir)
+    env = dict(os.environ, BENCH_SCALE=str(args.scale), BENCH_WARM_UP='0' if name == 'per-worker' else '1',
+               BENCH_READY_DIR=ready_dir,
+               SESSION_BACKEND='sqlite', SESSION_SQLITE_PATH=os.path.join(tmp, f'{name}.sessions.db'),
+               PYTHONPATH=os.pathsep.join([tmp, ROOT, os.path.join(ROOT, 'benchmarks')]))
+    env.pop('JOURNAL_DIR', None)
+
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', conf, 'bench_prefork_entry:application'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    try:
+        while len(os.listdir(ready_dir)) < args.workers:
+            if server.poll() is not None:
+                raise RuntimeError(f'gunicorn exited: {server.stderr.read().decode()[-2000:]}')
+            time.sleep(0.05)
+        ready_seconds = time.perf_counter() - started
+
+        cookies = {}
+        for role, path, form in (('customer', '/login/customer', {'username': 'bench-user-0',
+                                                                  'password': 'benchmark-password'}),
+                                 ('admin', '/login/admin', {'username': 'admin', 'password': 'admin123'})):
+            response = request(port, 'POST', path, form)
+            cookies[role] = response.getheader('Set-Cookie').split(';', 1)[0]
+
+        # accepts are not shared out evenly, so keep going until every
+        # worker has had its share (or the deadline passes)
+        served = {}
+        lock = threading.Lock()
+        deadline = time.monotonic() + args.max_seconds
+
+        def drive(n):
+            i = 0
+            while time.monotonic() < deadline:
+                with lock:
+                    if len(served) >= args.workers and min(served.values()) >= args.requests:
+                        return
+                path = PAGES[(n + i) % len(PAGES)]
+                i += 1
+                response = request(port, 'GET', path, cookie=cookies['admin' if path.startswith('/admin') else 'customer'])
+                with lock:
+                    pid = response.getheader('X-Worker-Pid')
+                    served[pid] = served.get(pid, 0) + 1
+
+        threads = [threading.Thread(target=drive, args=(n,)) for n in range(args.workers * 2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        workers = children(server.pid)
+        memory = [smaps(pid) for pid in workers]
+        master = smaps(server.pid)
+        return {
+            'startup_seconds': round(ready_seconds, 2),
+            'workers': len(workers),
+            'requests_per_worker': sorted(served.values()),
+            'worker_uss_mb': round(sum(m['uss_mb'] for m in memory) / len(memory), 1),
+            'worker_pss_mb': round(sum(m['pss_mb'] for m in memory) / len(memory), 1),
+            'worker_rss_mb': round(sum(m['rss_mb'] for m in memory) / len(memory), 1),
+            'total_pss_mb': round(sum(m['pss_mb'] for m in memory) + master['pss_mb'], 1),
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--scale', type=float, default=0.3, help="fraction of bench_routes' full data set")
+    parser.add_argument('--requests', type=int, default=50, help='requests every worker serves')
+    parser.add_argument('--max-seconds', type=float, default=180)
+    parser.add_argument('--only', nargs='*', choices=list(VARIANTS))
+    args = parser.parse_args()
+
+    result = {'workers': args.workers, 'scale': args.scale}
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, 'bench_prefork_entry.py'), 'w') as f:
+            f.write(ENTRY)
+        for name in args.only or VARIANTS:
+            result[name] = run_variant(name, args, tmp)
+            print(json.dumps({name: result[name]}), file=sys.stderr)
+
+    base = result.get('per-worker')
+    shipped = result.get('preload+freeze')
+    if base and shipped:
+        result['savings'] = {
+            'worker_uss': round(1 - shipped['worker_uss_mb'] / base['worker_uss_mb'], 3),
+            'total_pss': round(1 - shipped['total_pss_mb'] / base['total_pss_mb'], 3),
+            'startup': round(1 - shipped['startup_seconds'] / base['startup_seconds'], 3),
+        }
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,614 @@
+# Latency, throughput and memory of every route against a large synthetic
+# data set.
+#
+#   python benchmarks/bench_routes.py                      # 100k users, 10k photographers, 1M bookings
+#   python benchmarks/bench_routes.py --scale 0.01         # same shape, 1% of the size
+#   python benchmarks/bench_routes.py --save-baseline baseline.json
+#   python benchmarks/bench_routes.py --baseline baseline.json [--tolerance 0.25]
+#
+# The stores are filled through the repository interfaces (so STORAGE_BACKEND
+# and SQLITE_PATH apply as usual), then every endpoint in app.url_map is
+# driven through the Flask test client. Results go to stdout as JSON: p50,
+# p95 and p99 latency, requests per second and peak traced allocation per
+# scenario, plus load time and peak RSS for the process. With --baseline the
+# run is compared against a stored result and the exit status is 1 if any
+# scenario got slower or hungrier than the tolerance allows, which is how a
+# lookup that quietly turns into a scan of every user or booking shows up.
+import argparse
+import io
+import itertools
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PHOTO_UPLOAD_ROOT', tempfile.mkdtemp(prefix='bench-uploads-'))
+os.environ.setdefault('ASSET_BUILD_DIR', tempfile.mkdtemp(prefix='bench-assets-'))
+# /metrics is opt-in; on here so its route is covered and the store wrappers are timed
+os.environ.setdefault('METRICS_ENABLED', '1')
+
+import app as booking_app  # noqa: E402
+from catalog import WEEKDAYS  # noqa: E402
+from passwords import PasswordHasher  # noqa: E402
+from scheduling import SlotConflict, format_time, parse_time  # noqa: E402
+from assets import build as build_assets  # noqa: E402
+
+build_assets(os.path.join(booking_app.app.root_path, 'static'), booking_app.app.config['ASSET_BUILD_DIR'])
+booking_app.create_app()
+
+
+PASSWORD = 'benchmark-password'
+
+FIRST_NAMES = ['Alex', 'Priya', 'Chen', 'Maria', 'Omar', 'Yuki', 'Lena', 'Tom', 'Ava', 'Ravi',
+               'Sofia', 'Noah', 'Mei', 'Ivan', 'Zara', 'Leo']
+LAST_NAMES = ['Smith', 'Patel', 'Garcia', 'Kim', 'Nguyen', 'Okafor', 'Rossi', 'Silva', 'Cohen',
+              'Khan', 'Muller', 'Tanaka', 'Brown', 'Lopez']
+SPECIALIZATIONS = ['Wedding Photography', 'Portrait Photography', 'Event Photography',
+                   'Fashion Photography', 'Product Photography', 'Family Photography',
+                   'Corporate Photography', 'Newborn Photography', 'Sports Photography',
+                   'Real Estate Photography']
+LOCATIONS = ['New York, NY', 'Los Angeles, CA', 'Chicago, IL', 'Houston, TX', 'Phoenix, AZ',
+             'Seattle, WA', 'Miami, FL', 'Boston, MA', 'Denver, CO', 'Austin, TX',
+             'Atlanta, GA', 'Portland, OR']
+SKILLS = ['Lighting', 'Retouching', 'Drone', 'Studio', 'Candid', 'Film', 'Video', 'Black & White']
+STATUSES = ['Pending', 'Pending', 'Confirmed', 'Confirmed', 'Confirmed', 'Completed', 'Cancelled',
+            'Rejected']
+
+
+# -- synthetic data ----------------------------------------------------------
+
+def synthetic_users(count, rng, password_hash, prefix='bench-user'):
+    for i in range(count):
+        yield {
+            'username': f'{prefix}-{i}',
+            'email': f'{prefix}-{i}@example.com',
+            'password': password_hash,
+            'user_type': 'customer',
+            'created_at': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} '
+                          f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00',
+        }
+
+
+def synthetic_photographer(rng, n):
+    name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {n}'
+    return {
+        'name': name,
+        'specialization': rng.choice(SPECIALIZATIONS),
+        'rate': rng.randrange(2000, 40001, 500),
+        'contact': f'photographer{n}@example.com',
+        'bio': f'{name} has been shooting for years and loves natural light.',
+        'image': 'https://via.placeholder.com/400x400?text=' + name.replace(' ', '+'),
+        'experience': rng.randint(1, 30),
+        'location': rng.choice(LOCATIONS),
+        'skills': rng.sample(SKILLS, rng.randint(1, 4)),
+        'availability': sorted(rng.sample(WEEKDAYS, rng.randint(3, 7)), key=WEEKDAYS.index),
+    }
+
+
+def synthetic_bookings(count, rng, user_ids, photographer_ids, first_day, days, slot_starts):
+    # yields (photographer_id, day, start_minute, booking fields); the caller
+    # reserves the slot and skips the occasional collision
+    for _ in range(count):
+        photographer_id = rng.choice(photographer_ids)
+        day = first_day + timedelta(days=rng.randrange(days))
+        start = rng.choice(slot_starts)
+        yield photographer_id, day.isoformat(), start, {
+            'user_id': rng.choice(user_ids),
+            'photographer_id': photographer_id,
+            'date': day.isoformat(),
+            'time': format_time(start),
+            'location': rng.choice(LOCATIONS),
+            'notes': '',
+            'created_at': f'{(day - timedelta(days=rng.randint(1, 60))).isoformat()} 12:00:00',
+            'status': rng.choice(STATUSES),
+        }
+
+
+def populate(users, photographers, bookings, seed, password_hash, progress=sys.stderr):
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    user_ids = []
+    for record in synthetic_users(users, rng, password_hash):
+        user_id = booking_app.get_next_user_id()
+        booking_app.users_db.add(user_id, record)
+        user_ids.append(user_id)
+    print(f'loaded {users} users in {time.perf_counter() - started:.1f}s', file=progress)
+
+    photographer_ids = list(booking_app.photographers_db.keys())
+    records = dict(booking_app.photographers_db.items())
+    for n in range(photographers):
+        photographer_id = booking_app.get_next_photographer_id()
+        record = synthetic_photographer(rng, photographer_id)
+        booking_app.photographers_db[photographer_id] = record
+        booking_app.catalog_index.add(photographer_id, record)
+        records[photographer_id] = record
+        booking_app.photographer_users[f'bench-photographer-{photographer_id}'] = {
+            'password': password_hash,
+            'photographer_id': photographer_id,
+            'user_type': 'photographer'
+        }
+        photographer_ids.append(photographer_id)
+    booking_app.search_index.add_many(records.items())
+    print(f'loaded {photographers} photographers in {time.perf_counter() - started:.1f}s', file=progress)
+
+    slot_minutes = booking_app.app.config['BOOKING_SLOT_MINUTES']
+    slot_starts = list(range(parse_time(booking_app.app.config['BOOKING_DAY_START']),
+                             parse_time(booking_app.app.config['BOOKING_DAY_END']) - slot_minutes + 1,
+                             slot_minutes))
+    added = collisions = 0
+    for photographer_id, day, start, booking in synthetic_bookings(
+            bookings, rng, user_ids or [1], photographer_ids, date(2025, 1, 1), 730, slot_starts):
+        booking_id = booking_app.get_next_booking_id()
+        booking['id'] = booking['booking_number'] = booking_id
+        try:
+            booking_app.slot_index.reserve(photographer_id, day, start, booking_id)
+            # with sqlite the store itself refuses the overlap
+            booking_app.bookings_db.add(booking_id, booking)
+        except SlotConflict:
+            booking_app.slot_index.release(photographer_id, day, booking_id)
+            collisions += 1
+            continue
+        booking_app.booking_analytics.record(booking_id, booking, records[photographer_id])
+        added += 1
+        if added % 100000 == 0:
+            print(f'  {added} bookings...', file=progress)
+    print(f'loaded {added} bookings ({collisions} slot collisions skipped) in '
+          f'{time.perf_counter() - started:.1f}s', file=progress)
+
+    booking_app.response_cache.bump('users', 'photographers')
+    return {
+        'users': len(booking_app.users_db),
+        'photographers': len(booking_app.photographers_db),
+        'bookings': len(booking_app.bookings_db),
+        'user_ids': user_ids,
+        'photographer_ids': photographer_ids,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+
+
+# -- scenarios ---------------------------------------------------------------
+
+# prepare(i) returns (session, method, url, data, content_type); it runs
+# outside the timed section, so it may set up whatever the request consumes
+Scenario = namedtuple('Scenario', 'name endpoint method prepare expect')
+
+ADMIN = {'user_id': 'admin', 'username': 'admin', 'user_type': 'admin'}
+
+
+def customer_session(user_id):
+    return {'user_id': user_id, 'username': f'user-{user_id}', 'user_type': 'customer'}
+
+
+def photographer_session(photographer_id):
+    return {'user_id': f'bench-photographer-{photographer_id}', 'username': f'bench-photographer-{photographer_id}',
+            'photographer_id': photographer_id, 'photographer_name': f'#{photographer_id}',
+            'user_type': 'photographer'}
+
+
+def jpeg_bytes(i):
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new('RGB', (640, 480), ((i * 37) % 256, (i * 91) % 256, (i * 13) % 256)).save(buf, 'JPEG')
+    return buf.getvalue()
+
+
+def build_scenarios(data, seed):
+    rng = random.Random(seed + 1)
+    lock = threading.Lock()
+    user_ids = data['user_ids'] or [1]
+    photographer_ids = data['photographer_ids']
+    run_id = time.monotonic_ns()
+
+    def pick(values):
+        with lock:
+            return rng.choice(values)
+
+    def existing_username():
+        user = booking_app.get_user_by_id(pick(user_ids))
+        return user['username'] if user else 'missing'
+
+    slot_minutes = booking_app.app.config['BOOKING_SLOT_MINUTES']
+    day_start = parse_time(booking_app.app.config['BOOKING_DAY_START'])
+    slots_per_day = (parse_time(booking_app.app.config['BOOKING_DAY_END']) - day_start) // slot_minutes
+    next_slot = itertools.count()
+
+    def free_booking_slot():
+        # walk forward from a day well past the generated bookings so every
+        # POST /book lands on a free slot of an available weekday
+        photographer_id = pick(photographer_ids)
+        availability = booking_app.get_photographer_by_id(photographer_id).get('availability') or WEEKDAYS
+        n = next(next_slot)
+        day = date(2030, 1, 1) + timedelta(days=n // slots_per_day)
+        while day.strftime('%A') not in availability:
+            day += timedelta(days=1)
+        start = day_start + (n % slots_per_day) * slot_minutes
+        return photographer_id, day.isoformat(), format_time(start)
+
+    def photographer_form(name, username, password):
+        return {
+            'name': name, 'specialization': pick(SPECIALIZATIONS), 'rate': '12000',
+            'contact': f'{username}@example.com', 'bio': 'Synthetic benchmark photographer.',
+            'experience': '5', 'location': pick(LOCATIONS), 'username': username,
+            'password': password, 'skills': 'Lighting, Studio', 'availability': ['Monday', 'Friday'],
+        }
+
+    def disposable_photographer(i):
+        photographer_id = booking_app.get_next_photographer_id()
+        record = synthetic_photographer(random.Random(i), photographer_id)
+        booking_app.photographers_db[photographer_id] = record
+        booking_app.catalog_index.add(photographer_id, record)
+        booking_app.search_index.add(photographer_id, record)
+        return photographer_id
+
+    catalog_queries = [
+        '', '?sort=rate', '?sort=-rate', '?sort=experience', '?sort=name',
+        '?location=Seattle%2C+WA', '?specialization=Wedding+Photography&sort=rate',
+        '?weekday=Saturday&min_rate=10000', '?min_experience=10&max_rate=20000',
+    ]
+    search_queries = [
+        '?q=wedding', '?q=portrait+studio', '?q=drone&location=Seattle%2C+WA', '?q=candid+film+lighting',
+        '?q=alex', '?q=event&min_rate=10000', '?q=natural+light&offset=24',
+    ]
+    images = {}
+
+    def image(i):
+        key = i % 64
+        if key not in images:
+            images[key] = jpeg_bytes(key)
+        return images[key]
+
+    def import_csv(i, rows=20):
+        lines = ['name,specialization,rate,contact,bio,experience,location,username,password']
+        for n in range(rows):
+            username = f'bench-import-{run_id}-{i}-{n}'
+            lines.append(f'Imported {n},{pick(SPECIALIZATIONS)},12000,{username}@example.com,'
+                         f'Synthetic import.,5,"{pick(LOCATIONS)}",{username},{PASSWORD}')
+        return ('\n'.join(lines) + '\n').encode()
+
+    asset_path = '/assets/' + booking_app.asset_manifest.path_for('style.css')
+
+    scenarios = [
+        Scenario('index', 'index', 'GET', lambda i: (None, 'GET', '/', None, None), {200}),
+        Scenario('static', 'static', 'GET', lambda i: (None, 'GET', '/static/style.css', None, None), {200}),
+        Scenario('asset', 'asset', 'GET', lambda i: (None, 'GET', asset_path, None, None), {200}),
+        Scenario('login page', 'login', 'GET', lambda i: (None, 'GET', '/login', None, None), {200}),
+        Scenario('register page', 'register', 'GET', lambda i: (None, 'GET', '/register', None, None), {200}),
+        Scenario('register', 'register', 'POST', lambda i: (None, 'POST', '/register', {
+            'username': f'bench-reg-{run_id}-{i}', 'email': f'bench-reg-{run_id}-{i}@example.com',
+            'password': PASSWORD, 'confirm_password': PASSWORD}, None), {302}),
+        Scenario('register duplicate', 'register', 'POST', lambda i: (None, 'POST', '/register', {
+            'username': existing_username(), 'email': 'nobody@example.com',
+            'password': PASSWORD, 'confirm_password': PASSWORD}, None), {200}),
+        Scenario('customer login page', 'login_customer', 'GET',
+                 lambda i: (None, 'GET', '/login/customer', None, None), {200}),
+        Scenario('customer login', 'login_customer', 'POST', lambda i: (None, 'POST', '/login/customer', {
+            'username': existing_username(), 'password': PASSWORD}, None), {302}),
+        Scenario('customer login unknown user', 'login_customer', 'POST', lambda i: (None, 'POST', '/login/customer', {
+            'username': f'nobody-{i}', 'password': PASSWORD}, None), {200}),
+        Scenario('photographer login page', 'login_photographer', 'GET',
+                 lambda i: (None, 'GET', '/login/photographer', None, None), {200}),
+        Scenario('photographer login', 'login_photographer', 'POST', lambda i: (None, 'POST', '/login/photographer', {
+            'username': f'bench-photographer-{pick(photographer_ids[10:] or photographer_ids)}',
+            'password': PASSWORD}, None), {302, 200}),
+        Scenario('admin login page', 'login_admin', 'GET', lambda i: (None, 'GET', '/login/admin', None, None), {200}),
+        Scenario('admin login', 'login_admin', 'POST', lambda i: (None, 'POST', '/login/admin', {
+            'username': 'admin', 'password': 'admin123'}, None), {302}),
+        Scenario('logout', 'logout', 'GET', lambda i: (customer_session(pick(user_ids)), 'GET', '/logout', None, None),
+                 {302}),
+        Scenario('catalog', 'photographers', 'GET', lambda i: (
+            customer_session(pick(user_ids)), 'GET', '/photographers' + catalog_queries[i % len(catalog_queries)],
+            None, None), {200}),
+        Scenario('catalog search', 'photographers', 'GET', lambda i: (
+            customer_session(pick(user_ids)), 'GET', '/photographers' + search_queries[i % len(search_queries)],
+            None, None), {200}),
+        Scenario('book page', 'book', 'GET', lambda i: (
+            customer_session(pick(user_ids)), 'GET', f'/book/{pick(photographer_ids)}', None, None), {200}),
+        Scenario('book', 'book', 'POST', lambda i: (lambda pid, day, start: (
+            customer_session(pick(user_ids)), 'POST', f'/book/{pid}',
+            {'booking_date': day, 'booking_time': start, 'location': pick(LOCATIONS), 'notes': 'bench'}, None)
+        )(*free_booking_slot()), {302}),
+        Scenario('free slots (week)', 'photographer_slots', 'GET', lambda i: (
+            customer_session(pick(user_ids)), 'GET',
+            f'/photographers/{pick(photographer_ids)}/slots?start=2025-06-02&end=2025-06-08', None, None), {200}),
+        Scenario('customer dashboard', 'dashboard', 'GET', lambda i: (
+            customer_session(pick(user_ids)), 'GET', '/dashboard', None, None), {200}),
+        Scenario('photo page', 'photographer_photos', 'GET', lambda i: (lambda pid: (
+            photographer_session(pid), 'GET', f'/photographers/{pid}/photos', None, None))(pick(photographer_ids)),
+            {200}),
+        Scenario('photo upload', 'photographer_photos', 'POST', lambda i: (
+            ADMIN, 'POST', f'/photographers/{pick(photographer_ids)}/photos?kind=portfolio', image(i),
+            'image/jpeg'), {201}),
+        Scenario('photographer dashboard', 'photographer_dashboard', 'GET', lambda i: (
+            photographer_session(pick(photographer_ids)), 'GET', '/photographer-dashboard', None, None), {200}),
+        Scenario('admin dashboard', 'admin_dashboard', 'GET', lambda i: (ADMIN, 'GET', '/admin-dashboard', None, None),
+                 {200}),
+        Scenario('admin photographers', 'admin_photographers', 'GET', lambda i: (
+            ADMIN, 'GET', '/admin/photographers' + catalog_queries[i % len(catalog_queries)], None, None), {200}),
+        Scenario('admin users', 'admin_manage_users', 'GET', lambda i: (ADMIN, 'GET', '/admin/manage-users', None, None),
+                 {200}),
+        Scenario('admin reports', 'admin_reports', 'GET', lambda i: (ADMIN, 'GET', '/admin/reports', None, None), {200}),
+        Scenario('admin reports (weekly by location, one quarter)', 'admin_reports', 'GET', lambda i: (
+            ADMIN, 'GET', '/admin/reports?granularity=week&by=location&start=2025-04-01&end=2025-06-30', None, None),
+            {200}),
+        Scenario('counter consistency', 'admin_reports_consistency', 'GET', lambda i: (
+            ADMIN, 'GET', '/admin/reports/consistency', None, None), {200}),
+        Scenario('settings page', 'admin_settings', 'GET', lambda i: (ADMIN, 'GET', '/admin/settings', None, None),
+                 {200}),
+        Scenario('settings save', 'admin_settings', 'POST', lambda i: (
+            ADMIN, 'POST', '/admin/settings', {'site_title': 'Perfect Portraits Studio'}, None), {200}),
+        Scenario('add photographer page', 'admin_add_photographer', 'GET', lambda i: (
+            ADMIN, 'GET', '/admin/photographer/add', None, None), {200}),
+        Scenario('add photographer', 'admin_add_photographer', 'POST', lambda i: (
+            ADMIN, 'POST', '/admin/photographer/add',
+            photographer_form(f'Bench Added {i}', f'bench-added-{run_id}-{i}', PASSWORD), None), {302}),
+        Scenario('edit photographer page', 'admin_edit_photographer', 'GET', lambda i: (
+            ADMIN, 'GET', f'/admin/photographer/{pick(photographer_ids)}/edit', None, None), {200}),
+        Scenario('edit photographer', 'admin_edit_photographer', 'POST', lambda i: (lambda pid: (
+            ADMIN, 'POST', f'/admin/photographer/{pid}/edit',
+            photographer_form(booking_app.get_photographer_by_id(pid)['name'], f'bench-photographer-{pid}', ''),
+            None))(pick(photographer_ids)), {302}),
+        Scenario('revoke user sessions', 'admin_revoke_user_sessions', 'POST', lambda i: (
+            ADMIN, 'POST', f'/admin/users/{pick(user_ids)}/sessions/revoke', None, None), {302}),
+        Scenario('revoke photographer sessions', 'admin_revoke_photographer_sessions', 'POST', lambda i: (
+            ADMIN, 'POST', f'/admin/photographer/{pick(photographer_ids)}/sessions/revoke', None, None), {302}),
+        Scenario('import page', 'admin_data', 'GET', lambda i: (ADMIN, 'GET', '/admin/data', None, None), {200}),
+        Scenario('import 20 photographers', 'admin_import_photographers', 'POST', lambda i: (
+            ADMIN, 'POST', '/admin/photographers/import', import_csv(i), 'text/csv'), {200}),
+        Scenario('api photographers', 'api_photographers', 'GET', lambda i: (
+            customer_session(pick(user_ids)), 'GET',
+            '/api/v1/photographers' + (catalog_queries[i % len(catalog_queries)] or '?') + '&fields=id,name,rate',
+            None, None), {200}),
+        Scenario('api photographer', 'api_photographer', 'GET', lambda i: (
+            customer_session(pick(user_ids)), 'GET', f'/api/v1/photographers/{pick(photographer_ids)}', None, None),
+            {200}),
+        Scenario('api search', 'api_search_photographers', 'GET', lambda i: (
+            customer_session(pick(user_ids)), 'GET',
+            '/api/v1/photographers/search' + search_queries[i % len(search_queries)] + '&fields=id,name', None, None),
+            {200}),
+        Scenario('api suggest', 'api_suggest_photographers', 'GET', lambda i: (
+            customer_session(pick(user_ids)), 'GET',
+            '/api/v1/photographers/suggest?q=' + ['we', 'port', 'studio li', 'dr', 'pri'][i % 5], None, None), {200}),
+        Scenario('api customer bookings', 'api_bookings', 'GET', lambda i: (
+            customer_session(pick(user_ids)), 'GET', '/api/v1/bookings', None, None), {200}),
+        Scenario('api photographer bookings', 'api_bookings', 'GET', lambda i: (
+            photographer_session(pick(photographer_ids)), 'GET', '/api/v1/bookings?limit=100', None, None), {200}),
+        Scenario('api booking export', 'api_admin_bookings_export', 'GET', lambda i: (
+            ADMIN, 'GET', '/api/v1/admin/bookings/export', None, None), {200}),
+        Scenario('csv booking export (one photographer)', 'api_admin_bookings_export', 'GET', lambda i: (
+            ADMIN, 'GET', f'/api/v1/admin/bookings/export?format=csv&photographer_id={pick(photographer_ids)}',
+            None, None), {200}),
+        Scenario('metrics', 'metrics', 'GET', lambda i: (ADMIN, 'GET', '/metrics', None, None), {200}),
+        Scenario('metrics without login', 'metrics', 'GET', lambda i: (None, 'GET', '/metrics', None, None), {401}),
+        Scenario('delete photographer', 'admin_delete_photographer', 'POST', lambda i: (
+            ADMIN, 'POST', f'/admin/photographer/{disposable_photographer(i)}/delete', None, None), {302}),
+    ]
+    return scenarios
+
+
+def uncovered_routes(scenarios):
+    covered = {(s.endpoint, s.method) for s in scenarios}
+    missing = []
+    for rule in booking_app.app.url_map.iter_rules():
+        for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+            if (rule.endpoint, method) not in covered:
+                missing.append(f'{method} {rule.rule}')
+    return missing
+
+
+# -- measurement -------------------------------------------------------------
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def issue(client, prepared, trace=False):
+    session_data, method, url, data, content_type = prepared
+    if session_data is not None:
+        with client.session_transaction() as s:
+            s.clear()
+            s.update(session_data)
+    kwargs = {'data': data}
+    if content_type:
+        kwargs['content_type'] = content_type
+    if trace:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    response = client.open(url, method=method, **kwargs)
+    response.get_data()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if trace else 0
+    return elapsed, response.status_code, peak
+
+
+def run_scenario(scenario, requests, threads, warmup, memory_samples):
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies = []
+    unexpected = {}
+
+    def worker(count):
+        client = booking_app.app.test_client()
+        local = []
+        for _ in range(count):
+            elapsed, status, _ = issue(client, scenario.prepare(next(counter)))
+            local.append(elapsed)
+            if status not in scenario.expect:
+                with lock:
+                    unexpected[status] = unexpected.get(status, 0) + 1
+        with lock:
+            latencies.extend(local)
+
+    warm_client = booking_app.app.test_client()
+    for _ in range(warmup):
+        issue(warm_client, scenario.prepare(next(counter)))
+
+    shares = [requests // threads + (1 if t < requests % threads else 0) for t in range(threads)]
+    started = time.perf_counter()
+    if threads == 1:
+        worker(requests)
+    else:
+        pool = [threading.Thread(target=worker, args=(share,)) for share in shares]
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+    wall = time.perf_counter() - started
+
+    peak_alloc = 0
+    if memory_samples:
+        tracemalloc.start()
+        for _ in range(memory_samples):
+            prepared = scenario.prepare(next(counter))
+            peak_alloc = max(peak_alloc, issue(warm_client, prepared, trace=True)[2])
+        tracemalloc.stop()
+
+    return {
+        'scenario': scenario.name,
+        'route': f'{scenario.method} {scenario.endpoint}',
+        'requests': len(latencies),
+        'unexpected_status': {str(k): v for k, v in sorted(unexpected.items())},
+        'requests_per_second': round(len(latencies) / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3) if latencies else 0.0,
+        'peak_alloc_kb': round(peak_alloc / 1024, 1),
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def compare(result, baseline, tolerance, min_delta_ms, min_delta_kb):
+    regressions = []
+    if baseline.get('dataset') != result['dataset']:
+        print(f"warning: baseline data set {baseline.get('dataset')} differs from {result['dataset']}",
+              file=sys.stderr)
+    before = {r['scenario']: r for r in baseline.get('scenarios', [])}
+    for current in result['scenarios']:
+        old = before.get(current['scenario'])
+        if old is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if current[metric] > old[metric] * (1 + tolerance) and current[metric] - old[metric] > min_delta_ms:
+                regressions.append(f"{current['scenario']}: {metric} {old[metric]} -> {current[metric]}")
+        if current['requests_per_second'] * (1 + tolerance) < old['requests_per_second']:
+            regressions.append(f"{current['scenario']}: requests_per_second "
+                               f"{old['requests_per_second']} -> {current['requests_per_second']}")
+        if (current['peak_alloc_kb'] > old['peak_alloc_kb'] * (1 + tolerance)
+                and current['peak_alloc_kb'] - old['peak_alloc_kb'] > min_delta_kb):
+            regressions.append(f"{current['scenario']}: peak_alloc_kb "
+                               f"{old['peak_alloc_kb']} -> {current['peak_alloc_kb']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--photographers', type=int, default=10000)
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--scale', type=float, default=1.0, help='multiplies the three sizes above')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per scenario')
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--memory-samples', type=int, default=5,
+                        help='extra requests per scenario run under tracemalloc (0 to skip)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--kdf-iterations', type=int,
+                        help='PBKDF2 iterations for this run; lower it to see past password hashing')
+    parser.add_argument('--only', nargs='*', help='scenario names to run')
+    parser.add_argument('--output', help='also write the JSON result to this file')
+    parser.add_argument('--save-baseline', metavar='PATH', help='write the result as the new baseline')
+    parser.add_argument('--baseline', metavar='PATH', help='compare against a stored baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slowdown before a metric counts as a regression')
+    parser.add_argument('--min-delta-ms', type=float, default=0.5,
+                        help='ignore latency changes smaller than this')
+    parser.add_argument('--min-delta-kb', type=float, default=256,
+                        help='ignore allocation changes smaller than this')
+    args = parser.parse_args()
+
+    if args.kdf_iterations:
+        booking_app.password_hasher = PasswordHasher(params={'iterations': args.kdf_iterations},
+                                                     max_pending=max(64, args.threads * 2), timeout=30)
+    password_hash = booking_app.password_hasher.hash(PASSWORD)
+
+    rss_before = peak_rss_mb()
+    data = populate(int(args.users * args.scale), int(args.photographers * args.scale),
+                    int(args.bookings * args.scale), args.seed, password_hash)
+    rss_loaded = peak_rss_mb()
+
+    scenarios = build_scenarios(data, args.seed)
+    missing = uncovered_routes(scenarios)
+    if missing:
+        print(f'warning: no scenario for {", ".join(missing)}', file=sys.stderr)
+
+    results = []
+    for scenario in scenarios:
+        if args.only and scenario.name not in args.only:
+            continue
+        result = run_scenario(scenario, args.requests, args.threads, args.warmup, args.memory_samples)
+        print(json.dumps(result), file=sys.stderr)
+        results.append(result)
+    booking_app.password_hasher.shutdown()
+    booking_app.photo_pipeline.shutdown()
+
+    report = {
+        'dataset': {
+            'backend': booking_app.app.config['STORAGE_BACKEND'],
+            'users': data['users'],
+            'photographers': data['photographers'],
+            'bookings': data['bookings'],
+            'seed': args.seed,
+        },
+        'settings': {
+            'requests': args.requests,
+            'threads': args.threads,
+            'password_scheme': booking_app.password_hasher.scheme,
+            'kdf_iterations': args.kdf_iterations,
+        },
+        'load_seconds': data['seconds'],
+        'rss_before_load_mb': rss_before,
+        'rss_after_load_mb': rss_loaded,
+        'peak_rss_mb': peak_rss_mb(),
+        'uncovered_routes': missing,
+        'scenarios': results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.min_delta_ms, args.min_delta_kb)
+        report['baseline'] = args.baseline
+        report['regressions'] = regressions
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
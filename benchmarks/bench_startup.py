@@ -0,0 +1,75 @@
+# Import and first-request time of aws_app, before and after a change.
+#
+#   python benchmarks/bench_startup.py --before <git-ref> [--runs 15]
+#
+# Every sample runs in a fresh interpreter. The "before" tree is a temporary
+# git worktree checked out at --before; "after" is the working tree. The
+# first request hits /aws/logout, which needs no AWS call, so the number is
+# the cost of getting the blueprint ready to serve rather than network time.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, '.')
+import aws_app
+t1 = time.perf_counter()
+from flask import Flask
+app = Flask('bench', template_folder='templates')
+app.secret_key = 'bench'
+app.register_blueprint(aws_app.aws_bp, url_prefix='/aws')
+response = app.test_client().get('/aws/logout')
+t2 = time.perf_counter()
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'first_request_ms': (t2 - t0) * 1000,
+                  'status': response.status_code}))
+'''
+
+
+def measure(tree, runs):
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', SAMPLE], cwd=tree, env=env,
+                             capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {
+        'import_ms_median': round(statistics.median(s['import_ms'] for s in samples), 2),
+        'first_request_ms_median': round(statistics.median(s['first_request_ms'] for s in samples), 2),
+        'runs': runs,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--before', required=True, help='git ref to compare against')
+    parser.add_argument('--runs', type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before_tree = os.path.join(tmp, 'before')
+        subprocess.run(['git', 'worktree', 'add', '--detach', before_tree, args.before],
+                       cwd=ROOT, check=True, capture_output=True)
+        try:
+            before = measure(before_tree, args.runs)
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', before_tree],
+                           cwd=ROOT, check=False, capture_output=True)
+    after = measure(ROOT, args.runs)
+
+    print(json.dumps({
+        'before': dict(before, ref=args.before),
+        'after': after,
+        'import_speedup': round(before['import_ms_median'] / after['import_ms_median'], 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# Concurrency stress check for the id allocators and the striped stores.
+#
+#   python benchmarks/stress_concurrency.py --threads 64 --ops 2000
+#
+# Exits non-zero if any write was lost or any id was handed out twice.
+import argparse
+import os
+import sys
+import threading
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.setswitchinterval(1e-6)
+
+import app as booking_app  # noqa: E402
+
+booking_app.create_app()
+
+
+def run_threads(count, target):
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def worker(index):
+        barrier.wait()
+        try:
+            target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors
+
+
+def stress_users(threads, ops):
+    def register(index):
+        for n in range(ops):
+            user_id = booking_app.get_next_user_id()
+            booking_app.users_db.add(user_id, {
+                'username': f'user-{index}-{n}',
+                'email': f'user-{index}-{n}@example.com',
+                'password': '',
+                'user_type': 'customer',
+                'created_at': ''
+            })
+
+    errors = run_threads(threads, register)
+    expected = threads * ops
+    return errors, len(booking_app.users_db) == expected, f'users: {len(booking_app.users_db)}/{expected}'
+
+
+def stress_duplicate_registration(threads):
+    # every thread races to claim the same username; exactly one may win
+    winners = []
+
+    def register(index):
+        try:
+            booking_app.users_db.add(booking_app.get_next_user_id(), {
+                'username': 'contested', 'email': f'c{index}@example.com',
+                'password': '', 'user_type': 'customer', 'created_at': ''
+            })
+            winners.append(index)
+        except booking_app.DuplicateUserError:
+            pass
+
+    errors = run_threads(threads, register)
+    return errors, len(winners) == 1, f'contested username winners: {len(winners)}'
+
+
+def stress_bookings(threads, ops):
+    first_day = date(2030, 1, 1)
+
+    def book(index):
+        for n in range(ops):
+            booking_id = booking_app.get_next_booking_id()
+            booking_app.bookings_db.add(booking_id, {
+                'id': booking_id,
+                'user_id': index % 7,
+                'photographer_id': n % 10 + 1,
+                'date': (first_day + timedelta(days=n % 365)).isoformat(),
+                'time': '10:00',
+                'status': 'Pending'
+            })
+
+    errors = run_threads(threads, book)
+    expected = threads * ops
+    indexed = sum(booking_app.bookings_db.count_for_user(u) for u in range(7))
+    ok = len(booking_app.bookings_db) == expected and indexed == expected
+    return errors, ok, f'bookings: {len(booking_app.bookings_db)}/{expected}, indexed {indexed}'
+
+
+def stress_slot_race(threads):
+    # every thread races for the same photographer slot; exactly one may win
+    winners = []
+
+    def reserve(index):
+        try:
+            booking_app.slot_index.reserve(1, '2031-06-02', 600, index)
+            winners.append(index)
+        except booking_app.SlotConflict:
+            pass
+
+    errors = run_threads(threads, reserve)
+    return errors, len(winners) == 1, f'slot winners: {len(winners)}'
+
+
+def stress_photographer_ids(threads, ops):
+    before = len(booking_app.photographers_db)
+
+    def add(index):
+        for n in range(ops):
+            photographer_id = booking_app.get_next_photographer_id()
+            booking_app.photographers_db[photographer_id] = {'name': f'p-{index}-{n}'}
+
+    errors = run_threads(threads, add)
+    expected = before + threads * ops
+    return errors, len(booking_app.photographers_db) == expected, f'photographers: {len(booking_app.photographers_db)}/{expected}'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=64)
+    parser.add_argument('--ops', type=int, default=2000)
+    args = parser.parse_args()
+
+    checks = [
+        stress_users(args.threads, args.ops),
+        stress_duplicate_registration(args.threads),
+        stress_bookings(args.threads, args.ops),
+        stress_slot_race(args.threads),
+        stress_photographer_ids(args.threads, max(1, args.ops // 20)),
+    ]
+
+    failed = False
+    for errors, ok, summary in checks:
+        status = 'ok' if ok and not errors else 'FAIL'
+        print(f'{status:4} {summary}')
+        for e in errors[:5]:
+            print(f'     {type(e).__name__}: {e}')
+        failed = failed or status != 'ok'
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,358 @@
+import bisect
+import sys
+import threading
+from collections import Counter
+from collections.abc import Mapping
+from datetime import date, datetime, timedelta
+from operator import attrgetter
+from types import MappingProxyType
+
+from concurrency import IdAllocator, StripedLock
+from repository import BookingRepository
+from scheduling import MINUTES_PER_DAY, parse_day, parse_time, format_time
+from stats import Counters
+
+
+BOOKING_STATUSES = ('Pending', 'Confirmed', 'Completed', 'Cancelled', 'Rejected')
+STATUS_CODES = {status: code for code, status in enumerate(BOOKING_STATUSES)}
+
+RECORD_FIELDS = ('id', 'booking_number', 'user_id', 'photographer_id', 'date', 'time', 'location', 'notes',
+                 'created_at', 'status')
+_FIELD_SET = frozenset(RECORD_FIELDS)
+
+# index entries pack (date, time, id) into one int: minute of the era in
+# the high bits, booking id in the low 40
+ID_BITS = 40
+ID_MASK = (1 << ID_BITS) - 1
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _when(day, time):
+    return parse_day(day).toordinal() * MINUTES_PER_DAY + parse_time(time)
+
+
+def _position(after):
+    # a (date, time, id) cursor tuple -> the packed index entry it names
+    day, time, booking_id = after
+    return (_when(day, time) << ID_BITS) | booking_id
+
+
+class BookingRecord(Mapping):
+    # one booking in about a quarter of the memory of the equivalent dict:
+    # no per-record hash table, date and time packed into a single int,
+    # created_at as epoch seconds, status as an index into BOOKING_STATUSES
+    # and the location interned, since most bookings share a handful of
+    # them. The old string values come back through properties, so Jinja's
+    # booking.date and code written against dicts (booking['status'],
+    # dict(booking)) see no difference. Absent fields are stored as None
+    # and are not keys of the mapping
+
+    __slots__ = ('id', '_number', 'user_id', 'photographer_id', '_when', 'location', 'notes', '_created',
+                 '_status')
+
+    def __init__(self, booking_id, user_id, photographer_id, day, time, status='Pending', location=None,
+                 notes=None, created_at=None, booking_number=None):
+        self.id = booking_id
+        # nearly always the id itself, which then costs nothing to keep
+        self._number = None if booking_number == booking_id else booking_number
+        self.user_id = user_id
+        self.photographer_id = photographer_id
+        self._when = _when(day, time)
+        self.location = sys.intern(location) if isinstance(location, str) else location
+        self.notes = notes
+        self.created_at = created_at
+        self.status = status
+
+    @classmethod
+    def from_dict(cls, booking_id, booking):
+        return cls(booking_id, booking.get('user_id'), booking.get('photographer_id'), booking['date'],
+                   booking['time'], booking.get('status', 'Pending'), booking.get('location'),
+                   booking.get('notes'), booking.get('created_at'), booking.get('booking_number'))
+
+    @property
+    def booking_number(self):
+        return self.id if self._number is None else self._number
+
+    @property
+    def date(self):
+        return date.fromordinal(self._when // MINUTES_PER_DAY).isoformat()
+
+    @property
+    def time(self):
+        return format_time(self._when % MINUTES_PER_DAY)
+
+    @property
+    def day_ordinal(self):
+        return self._when // MINUTES_PER_DAY
+
+    @property
+    def created_at(self):
+        if isinstance(self._created, int):
+            return (_EPOCH + timedelta(seconds=self._created)).isoformat(' ')
+        return self._created
+
+    @created_at.setter
+    def created_at(self, value):
+        # 'YYYY-MM-DD HH:MM:SS' is kept as seconds; anything else as given
+        try:
+            self._created = int((datetime.fromisoformat(value) - _EPOCH).total_seconds())
+        except (TypeError, ValueError):
+            self._created = value
+
+    @property
+    def status(self):
+        return BOOKING_STATUSES[self._status]
+
+    @status.setter
+    def status(self, value):
+        try:
+            self._status = STATUS_CODES[value]
+        except KeyError:
+            raise ValueError(f'unknown booking status {value!r}') from None
+
+    def sort_key(self):
+        return (self._when << ID_BITS) | self.id
+
+    @classmethod
+    def from_state(cls, state):
+        # state: the raw slot values in __slots__ order, as snapshots keep them
+        record = cls.__new__(cls)
+        (record.id, record._number, record.user_id, record.photographer_id, record._when, record.location,
+         record.notes, record._created, record._status) = state
+        return record
+
+    # mapping interface
+
+    def __getitem__(self, key):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        value = getattr(self, key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return (field for field in RECORD_FIELDS if getattr(self, field) is not None)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        return {field: value for field in RECORD_FIELDS if (value := getattr(self, field)) is not None}
+
+    def __repr__(self):
+        return f'BookingRecord({self.to_dict()!r})'
+
+
+class BookingStore(BookingRepository):
+    # id-keyed BookingRecords plus per-customer and per-photographer
+    # indexes kept in (date, time, id) order, so dashboards only touch the
+    # bookings that belong to them. Bookings added as dicts are converted
+
+    def __init__(self):
+        self._records = {}
+        self._by_user = {}
+        self._by_photographer = {}
+        self._locks = StripedLock()
+        self._ids = IdAllocator()
+        # highest id ever added, so scan() can walk the ids without listing them
+        self._high_id = 0
+        self._high_lock = threading.Lock()
+        self._status_counts = Counters()
+        self._photographer_counts = Counters()
+
+    def next_id(self):
+        return self._ids.next()
+
+    def _index_add(self, index, key, entry):
+        bisect.insort(index.setdefault(key, []), entry)
+
+    def _index_remove(self, index, key, entry):
+        entries = index.get(key)
+        if not entries:
+            return
+        pos = bisect.bisect_left(entries, entry)
+        if pos < len(entries) and entries[pos] == entry:
+            del entries[pos]
+        if not entries:
+            del index[key]
+
+    def _index_locks(self, booking):
+        return self._locks.for_keys(('user', booking.user_id),
+                                    ('photographer', booking.photographer_id))
+
+    def add(self, booking_id, booking):
+        if not isinstance(booking, BookingRecord):
+            booking = BookingRecord.from_dict(booking_id, booking)
+        entry = booking.sort_key()
+        with self._locks.for_key(('booking', booking_id)):
+            if self._records.setdefault(booking_id, booking) is not booking:
+                raise KeyError(f'booking {booking_id} already exists')
+        with self._high_lock:
+            if booking_id > self._high_id:
+                self._high_id = booking_id
+        with self._index_locks(booking):
+            self._index_add(self._by_user, booking.user_id, entry)
+            self._index_add(self._by_photographer, booking.photographer_id, entry)
+        self._status_counts.add(booking.status)
+        self._photographer_counts.add(booking.photographer_id)
+        return booking_id
+
+    def set_status(self, booking_id, status):
+        with self._locks.for_key(('booking', booking_id)):
+            booking = self._records.get(booking_id)
+            if booking is None:
+                return None
+            previous = booking.status
+            booking.status = status
+            self._status_counts.move(previous, status)
+        return booking
+
+    def delete(self, booking_id):
+        with self._locks.for_key(('booking', booking_id)):
+            booking = self._records.pop(booking_id, None)
+        if booking is None:
+            return None
+        with self._index_locks(booking):
+            entry = booking.sort_key()
+            self._index_remove(self._by_user, booking.user_id, entry)
+            self._index_remove(self._by_photographer, booking.photographer_id, entry)
+        self._status_counts.add(booking.status, -1)
+        self._photographer_counts.add(booking.photographer_id, -1)
+        return booking
+
+    def _views(self, index, key, extra, after=None, limit=None):
+        with self._locks.for_key(key):
+            entries = index.get(key[1], ())
+            start = bisect.bisect_right(entries, _position(after)) if after is not None else 0
+            entries = entries[start:start + limit] if limit is not None else entries[start:]
+        views = []
+        for entry in entries:
+            booking = self._records.get(entry & ID_MASK)
+            if booking is None:
+                continue
+            view = booking.to_dict()
+            if extra is not None:
+                view.update(extra(view))
+            views.append(MappingProxyType(view))
+        return views
+
+    def for_user(self, user_id, extra=None, after=None, limit=None):
+        return self._views(self._by_user, ('user', user_id), extra, after, limit)
+
+    def for_photographer(self, photographer_id, extra=None, after=None, limit=None):
+        return self._views(self._by_photographer, ('photographer', photographer_id), extra, after, limit)
+
+    def scan(self, after_id=None, batch_size=500, photographer_id=None, start_date=None, end_date=None):
+        # ids come from the IdAllocator in increasing order, so the table is
+        # walked by id, batch_size lookups at a time, up to the highest id
+        # present when the scan started; nothing is copied but one batch. A
+        # photographer's bookings are read from that photographer's index
+        first_day = parse_day(start_date).toordinal() if start_date is not None else None
+        last_day = parse_day(end_date).toordinal() if end_date is not None else None
+        if photographer_id is not None:
+            yield from self._scan_photographer(photographer_id, after_id, first_day, last_day)
+            return
+        high = self._high_id
+        next_id = (after_id or 0) + 1
+        while next_id <= high:
+            end = min(next_id + batch_size, high + 1)
+            batch = [(booking_id, self._records.get(booking_id)) for booking_id in range(next_id, end)]
+            next_id = end
+            for booking_id, booking in batch:
+                if booking is None:
+                    continue
+                if (first_day is not None and booking.day_ordinal < first_day) or \
+                        (last_day is not None and booking.day_ordinal > last_day):
+                    continue
+                yield booking_id, booking
+
+    def _scan_photographer(self, photographer_id, after_id, first_day, last_day):
+        # the index is in (date, time, id) order, so the date bounds are two
+        # bisects; only the ids inside them are sorted into id order
+        with self._locks.for_key(('photographer', photographer_id)):
+            entries = self._by_photographer.get(photographer_id, ())
+            start = 0 if first_day is None else bisect.bisect_left(
+                entries, (first_day * MINUTES_PER_DAY) << ID_BITS)
+            end = len(entries) if last_day is None else bisect.bisect_left(
+                entries, ((last_day + 1) * MINUTES_PER_DAY) << ID_BITS)
+            ids = sorted(entry & ID_MASK for entry in entries[start:end])
+        if after_id is not None:
+            ids = ids[bisect.bisect_right(ids, after_id):]
+        for booking_id in ids:
+            booking = self._records.get(booking_id)
+            if booking is not None:
+                yield booking_id, booking
+
+    def restart_ids(self):
+        # continue numbering after the highest stored id
+        self._ids = IdAllocator.after(self._records)
+
+    def dump(self):
+        # the bookings as one list per BookingRecord slot, for snapshots
+        bookings = list(self._records.values())
+        return [list(map(attrgetter(slot), bookings)) for slot in BookingRecord.__slots__]
+
+    def load(self, columns):
+        # replaces the contents with a dump(). Index entries and counts are
+        # computed column by column, and each index list is sorted once at
+        # the end rather than kept sorted booking by booking
+        ids, _, user_ids, photographer_ids, whens, _, _, _, statuses = columns
+        make = BookingRecord.from_state
+        records = dict(zip(ids, map(make, zip(*columns))))
+        entries = [(when << ID_BITS) | booking_id for when, booking_id in zip(whens, ids)]
+        by_user = {}
+        by_photographer = {}
+        for index, keys in ((by_user, user_ids), (by_photographer, photographer_ids)):
+            for key, entry in zip(keys, entries):
+                bucket = index.get(key)
+                if bucket is None:
+                    index[key] = [entry]
+                else:
+                    bucket.append(entry)
+            for bucket in index.values():
+                bucket.sort()
+        self._records, self._by_user, self._by_photographer = records, by_user, by_photographer
+        self._high_id = max(ids, default=0)
+        self._status_counts.replace({BOOKING_STATUSES[code]: count for code, count in Counter(statuses).items()})
+        self._photographer_counts.replace(Counter(photographer_ids))
+        self.restart_ids()
+
+    def count_for_user(self, user_id):
+        return len(self._by_user.get(user_id, ()))
+
+    def count_for_photographer(self, photographer_id):
+        return len(self._by_photographer.get(photographer_id, ()))
+
+    def count_by_status(self):
+        return self._status_counts.snapshot()
+
+    def count_by_photographer(self):
+        return self._photographer_counts.snapshot()
+
+    # read-only mapping interface
+
+    def get(self, booking_id, default=None):
+        return self._records.get(booking_id, default)
+
+    def __getitem__(self, booking_id):
+        return self._records[booking_id]
+
+    def __contains__(self, booking_id):
+        return booking_id in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(list(self._records))
+
+    def keys(self):
+        return list(self._records.keys())
+
+    def values(self):
+        return list(self._records.values())
+
+    def items(self):
+        return list(self._records.items())
@@ -0,0 +1,273 @@
+import csv
+import gc
+import io
+import itertools
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from catalog import WEEKDAYS
+from passwords import LEGACY_SHA256, hash_password_sync
+
+
+PHOTOGRAPHER_COLUMNS = (
+    'name', 'specialization', 'rate', 'contact', 'bio', 'experience', 'location', 'image',
+    'skills', 'availability', 'username', 'password', 'password_hash'
+)
+REQUIRED_COLUMNS = ('name', 'specialization', 'rate', 'contact', 'bio', 'experience', 'location', 'username')
+
+DEFAULT_AVAILABILITY = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+
+ENCODED_HASH = re.compile(r'^(pbkdf2_sha256\$\d+\$|scrypt\$\d+\$\d+\$\d+\$)[A-Za-z0-9+/]+\$[A-Za-z0-9+/]+$')
+
+# cells starting with these are run as formulas by spreadsheet programs
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class RowError(ValueError):
+    pass
+
+
+# -- reading -----------------------------------------------------------------
+
+class _Readable(io.RawIOBase):
+    # lets io.TextIOWrapper sit on upload streams that only provide read()
+    # (werkzeug's LimitedStream, SpooledTemporaryFile on older Pythons)
+
+    def __init__(self, stream):
+        self._stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def read_rows(stream, fmt):
+    # yields (row_number, row) or (row_number, RowError) one row at a time
+    # from a binary stream, so the file is never held in memory
+    text = io.TextIOWrapper(_Readable(stream), encoding='utf-8-sig', errors='replace', newline='')
+    if fmt == 'csv':
+        reader = csv.reader(text)
+        # blank lines before the header are skipped (werkzeug can hand a
+        # large multipart upload back with its leading CRLF still attached)
+        header = next((cells for cells in reader if any(cell.strip() for cell in cells)), None)
+        if header is None:
+            return
+        header = [cell.strip() for cell in header]
+        # numbered as a spreadsheet shows them, the header being row 1
+        skipped = reader.line_num - 1
+        for cells in reader:
+            if not cells:
+                continue
+            if len(cells) > len(header):
+                yield reader.line_num - skipped, RowError('row has more cells than the header')
+            else:
+                yield reader.line_num - skipped, dict(itertools.zip_longest(header, cells))
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(text, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, RowError(f'invalid JSON: {e}')
+                continue
+            if not isinstance(row, dict):
+                yield line_number, RowError('each line must be a JSON object')
+                continue
+            yield line_number, row
+    else:
+        raise ValueError(f'unknown import format {fmt!r}')
+
+
+def _text(row, column):
+    value = row.get(column)
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _list(row, column):
+    value = row.get(column)
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [part.strip() for part in re.split(r'[,;|]', value or '') if part.strip()]
+
+
+def parse_photographer_row(row):
+    # -> (photographer, username, password, password_hash); exactly one of
+    # password and password_hash is set
+    missing = [column for column in REQUIRED_COLUMNS if not _text(row, column)]
+    if missing:
+        raise RowError(f"missing {', '.join(missing)}")
+    unknown = sorted(set(row) - set(PHOTOGRAPHER_COLUMNS))
+    if unknown:
+        raise RowError(f"unknown column(s) {', '.join(unknown)}")
+
+    try:
+        rate = int(_text(row, 'rate'))
+        experience = int(_text(row, 'experience'))
+    except ValueError:
+        raise RowError('rate and experience must be numbers') from None
+
+    availability = _list(row, 'availability')
+    bad_days = [day for day in availability if day not in WEEKDAYS]
+    if bad_days:
+        raise RowError(f"unknown weekday(s) {', '.join(bad_days)}")
+
+    password = _text(row, 'password')
+    password_hash = _text(row, 'password_hash')
+    if password and password_hash:
+        raise RowError('give either password or password_hash, not both')
+    if password_hash:
+        if not (ENCODED_HASH.match(password_hash) or LEGACY_SHA256.match(password_hash)):
+            raise RowError('password_hash is not a recognised hash')
+    elif len(password) < 6:
+        raise RowError('password must be at least 6 characters')
+
+    name = _text(row, 'name')
+    photographer = {
+        'name': name,
+        'specialization': _text(row, 'specialization'),
+        'rate': rate,
+        'contact': _text(row, 'contact'),
+        'bio': _text(row, 'bio'),
+        'image': _text(row, 'image') or 'https://via.placeholder.com/400x400?text=' + name.replace(' ', '+'),
+        'experience': experience,
+        'location': _text(row, 'location'),
+        'skills': _list(row, 'skills'),
+        'availability': availability or list(DEFAULT_AVAILABILITY),
+    }
+    return photographer, _text(row, 'username'), password or None, password_hash or None
+
+
+# -- importing ---------------------------------------------------------------
+
+class PhotographerImporter:
+    # validates rows as they stream in, hashes plain-text passwords for a
+    # whole batch in a process pool of its own (so an import cannot starve
+    # logins of the shared hasher) and commits each batch of photographers
+    # and credentials together. Only one batch is in memory at a time;
+    # duplicates are checked against the batch and the committed stores
+
+    def __init__(self, photographers, credentials, indexes, scheme, params,
+                 batch_size=500, workers=2, on_commit=None):
+        # indexes: objects with add_many((id, photographer) pairs), e.g. the
+        # catalog and search indexes
+        self.photographers = photographers
+        self.credentials = credentials
+        self.indexes = indexes
+        self.scheme = scheme
+        self.params = params
+        self.batch_size = batch_size
+        self.workers = workers
+        self.on_commit = on_commit
+
+    def _hash_all(self, executor, passwords):
+        if executor is None:
+            return [hash_password_sync(p, self.scheme, self.params) for p in passwords]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(executor.map(hash_password_sync, passwords, itertools.repeat(self.scheme),
+                                 itertools.repeat(self.params), chunksize=chunksize))
+
+    def _commit(self, executor, batch):
+        plain = [i for i, entry in enumerate(batch) if entry[3] is not None]
+        hashes = self._hash_all(executor, [batch[i][3] for i in plain])
+        for i, encoded in zip(plain, hashes):
+            batch[i][4] = encoded
+
+        ids = self.photographers.next_ids(len(batch))
+        photographers = []
+        credentials = []
+        for photographer_id, (_, photographer, username, _, encoded) in zip(ids, batch):
+            photographers.append((photographer_id, photographer))
+            credentials.append((username, {
+                'password': encoded,
+                'photographer_id': photographer_id,
+                'user_type': 'photographer'
+            }))
+        # every object the writes below allocate stays alive, so a collection
+        # would only rescan a heap that grows with each batch
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            self.photographers.put_many(photographers)
+            self.credentials.put_many(credentials)
+            for index in self.indexes:
+                index.add_many(photographers)
+        finally:
+            if collecting:
+                gc.enable()
+        if self.on_commit is not None:
+            self.on_commit()
+        return [(row_number, photographer_id, username)
+                for (row_number, *_), (photographer_id, _), (username, _)
+                in zip(batch, photographers, credentials)]
+
+    def run(self, rows):
+        # yields one report dict per rejected row, one per committed batch
+        # and a final summary
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers else None
+        imported = rejected = 0
+        batch = []
+        usernames = set()
+        try:
+            for row_number, row in rows:
+                try:
+                    if isinstance(row, RowError):
+                        raise row
+                    photographer, username, password, password_hash = parse_photographer_row(row)
+                    if username in usernames or username in self.credentials:
+                        raise RowError(f'username {username!r} already exists')
+                except RowError as e:
+                    rejected += 1
+                    yield {'row': row_number, 'error': str(e)}
+                    continue
+                usernames.add(username)
+                batch.append([row_number, photographer, username, password, password_hash])
+                if len(batch) >= self.batch_size:
+                    committed = self._commit(executor, batch)
+                    imported += len(committed)
+                    yield {'committed': len(committed), 'through_row': committed[-1][0],
+                           'last_photographer_id': committed[-1][1]}
+                    batch = []
+                    usernames = set()
+            if batch:
+                committed = self._commit(executor, batch)
+                imported += len(committed)
+                yield {'committed': len(committed), 'through_row': committed[-1][0],
+                       'last_photographer_id': committed[-1][1]}
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+        yield {'summary': {'imported': imported, 'rejected': rejected}}
+
+
+# -- exporting ---------------------------------------------------------------
+
+def _csv_cell(value):
+    if isinstance(value, (list, dict)):
+        value = json.dumps(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunks(records, fields, chunk_bytes=64 * 1024):
+    # header plus one line per record, written into a small buffer that is
+    # flushed every ~64KB
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for record in records:
+        writer.writerow([_csv_cell(record.get(field, '')) for field in fields])
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
@@ -0,0 +1,257 @@
+import base64
+import bisect
+import json
+import threading
+
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+SORTS = {
+    # name -> (sorted index, descending?)
+    'id': ('id', False),
+    'rate': ('rate', False),
+    '-rate': ('rate', True),
+    'experience': ('experience', True),
+    'name': ('name', False),
+}
+
+# type of the sort value a cursor carries for each sorted index
+SORT_VALUE_TYPES = {'id': int, 'rate': int, 'experience': int, 'name': str}
+
+
+def _norm(value):
+    return (value or '').strip().lower()
+
+
+def encode_cursor(sort_value, photographer_id):
+    raw = json.dumps([sort_value, photographer_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    # -> (sort value, id); anything but a [value, int id] pair is rejected
+    # here so a forged cursor never reaches a bisect
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f'invalid cursor {cursor!r}') from e
+    if not isinstance(decoded, list) or len(decoded) != 2 or type(decoded[1]) is not int:
+        raise ValueError(f'invalid cursor {cursor!r}')
+    sort_value, photographer_id = decoded
+    return sort_value, photographer_id
+
+
+def _merge_sorted(entries, batch):
+    # -> entries (sorted) with batch (sorted) merged in. Each batch entry is
+    # placed with a bisect and the runs of existing entries between them are
+    # copied as slices, so a merge costs len(batch) * log(len(entries))
+    # comparisons; a batch that sorts after everything (new ids) is appended
+    if not entries or batch[0] > entries[-1]:
+        entries.extend(batch)
+        return entries
+    merged = []
+    start = 0
+    for entry in batch:
+        end = bisect.bisect_right(entries, entry, start)
+        merged += entries[start:end]
+        merged.append(entry)
+        start = end
+    merged += entries[start:]
+    return merged
+
+
+class CatalogIndex:
+    # inverted indexes for the equality filters plus sorted (value, id) lists
+    # for the range filters and sort orders, so a filtered page is built from
+    # set intersections and bisects instead of copying the whole catalog.
+    # New entries wait in per-list pending lists that are merged in when a
+    # query needs the list or once they outgrow an eighth of it, so a bulk
+    # load copies each list a bounded number of times rather than per batch
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._records = {}
+        self._by_location = {}
+        self._by_specialization = {}
+        self._by_weekday = {}
+        self._labels = {'location': {}, 'specialization': {}}
+        self._sorted = {'id': [], 'rate': [], 'experience': [], 'name': []}
+        self._pending = {field: [] for field in self._sorted}
+
+    @classmethod
+    def build(cls, photographers):
+        index = cls()
+        index.add_many(photographers.items())
+        return index
+
+    def _postings_add(self, index, key, photographer_id):
+        index.setdefault(key, set()).add(photographer_id)
+
+    def _postings_remove(self, index, key, photographer_id):
+        postings = index.get(key)
+        if postings is not None:
+            postings.discard(photographer_id)
+            if not postings:
+                del index[key]
+
+    def _sorted_remove(self, entries, entry):
+        pos = bisect.bisect_left(entries, entry)
+        if pos < len(entries) and entries[pos] == entry:
+            del entries[pos]
+
+    def _entries(self, field):
+        # caller holds the lock; -> the sorted list with pending entries
+        # merged in: they are sorted on their own and merged in one pass
+        pending = self._pending[field]
+        if pending:
+            self._sorted[field] = _merge_sorted(self._sorted[field], sorted(pending))
+            self._pending[field] = []
+        return self._sorted[field]
+
+    def add(self, photographer_id, photographer):
+        self.add_many([(photographer_id, photographer)])
+
+    update = add
+
+    def add_many(self, items):
+        with self._lock:
+            for photographer_id, photographer in items:
+                for field, entry in self._add(photographer_id, photographer):
+                    self._pending[field].append(entry)
+            for field, pending in self._pending.items():
+                if len(pending) > max(1024, len(self._sorted[field]) // 8):
+                    self._entries(field)
+
+    def _add(self, photographer_id, photographer):
+        # caller holds the lock; returns the entries for the sorted lists
+        self._remove(photographer_id)
+        record = {
+            'name': photographer.get('name', ''),
+            'location': photographer.get('location', ''),
+            'specialization': photographer.get('specialization', ''),
+            'rate': int(photographer.get('rate') or 0),
+            'experience': int(photographer.get('experience') or 0),
+            'availability': list(photographer.get('availability') or []),
+        }
+        self._records[photographer_id] = record
+        self._postings_add(self._by_location, _norm(record['location']), photographer_id)
+        self._postings_add(self._by_specialization, _norm(record['specialization']), photographer_id)
+        self._labels['location'].setdefault(_norm(record['location']), record['location'])
+        self._labels['specialization'].setdefault(_norm(record['specialization']), record['specialization'])
+        for day in record['availability']:
+            self._postings_add(self._by_weekday, day, photographer_id)
+        return self._sort_entries(photographer_id, record)
+
+    def remove(self, photographer_id):
+        with self._lock:
+            self._remove(photographer_id)
+
+    def _remove(self, photographer_id):
+        record = self._records.pop(photographer_id, None)
+        if record is None:
+            return
+        for index, field in ((self._by_location, 'location'), (self._by_specialization, 'specialization')):
+            key = _norm(record[field])
+            self._postings_remove(index, key, photographer_id)
+            if key not in index:
+                self._labels[field].pop(key, None)
+        for day in record['availability']:
+            self._postings_remove(self._by_weekday, day, photographer_id)
+        for field, entry in self._sort_entries(photographer_id, record):
+            self._sorted_remove(self._entries(field), entry)
+
+    def _sort_entries(self, photographer_id, record):
+        return (
+            ('id', (photographer_id, photographer_id)),
+            ('rate', (record['rate'], photographer_id)),
+            ('experience', (record['experience'], photographer_id)),
+            ('name', (record['name'].lower(), photographer_id)),
+        )
+
+    def facets(self):
+        with self._lock:
+            return {
+                'locations': sorted(self._labels['location'].values()),
+                'specializations': sorted(self._labels['specialization'].values()),
+                'weekdays': [day for day in WEEKDAYS if day in self._by_weekday],
+            }
+
+    def _range(self, entries, low, high):
+        start = 0 if low is None else bisect.bisect_left(entries, (low,))
+        end = len(entries) if high is None else bisect.bisect_left(entries, (high + 1,))
+        return {photographer_id for _, photographer_id in entries[start:end]}
+
+    def _candidates(self, location, specialization, weekday, min_rate, max_rate, min_experience):
+        sets = []
+        if location:
+            sets.append(self._by_location.get(_norm(location), set()))
+        if specialization:
+            sets.append(self._by_specialization.get(_norm(specialization), set()))
+        if weekday:
+            sets.append(self._by_weekday.get(weekday, set()))
+        if min_rate is not None or max_rate is not None:
+            sets.append(self._range(self._entries('rate'), min_rate, max_rate))
+        if min_experience is not None:
+            sets.append(self._range(self._entries('experience'), min_experience, None))
+        if not sets:
+            return None
+        sets.sort(key=len)
+        result = set(sets[0])
+        for other in sets[1:]:
+            result &= other
+            if not result:
+                break
+        return result
+
+    def candidates(self, location=None, specialization=None, weekday=None, min_rate=None,
+                   max_rate=None, min_experience=None):
+        # ids passing the filters, or None when no filter is set
+        with self._lock:
+            result = self._candidates(location, specialization, weekday, min_rate, max_rate, min_experience)
+            return None if result is None else set(result)
+
+    def query(self, location=None, specialization=None, weekday=None, min_rate=None,
+              max_rate=None, min_experience=None, sort='id', cursor=None, limit=24):
+        field, descending = SORTS.get(sort, SORTS['id'])
+        after = None
+        if cursor:
+            after = decode_cursor(cursor)
+            if type(after[0]) is not SORT_VALUE_TYPES[field]:
+                raise ValueError(f'invalid cursor {cursor!r} for sort {sort!r}')
+
+        with self._lock:
+            candidates = self._candidates(location, specialization, weekday,
+                                          min_rate, max_rate, min_experience)
+            entries = self._entries(field)
+            if candidates is not None and len(candidates) * 8 < len(entries):
+                # a selective filter: sorting the few matches beats walking the index
+                entries = sorted(self._sort_entries_for(candidates, field))
+                candidates = None
+            page = self._walk(entries, descending, after, candidates, limit + 1)
+
+        next_cursor = encode_cursor(*page[limit - 1]) if len(page) > limit else None
+        return [pid for _, pid in page[:limit]], next_cursor
+
+    def _sort_entries_for(self, photographer_ids, field):
+        for photographer_id in photographer_ids:
+            for name, entry in self._sort_entries(photographer_id, self._records[photographer_id]):
+                if name == field:
+                    yield entry
+
+    def _walk(self, entries, descending, after, candidates, count):
+        # keyset pagination: resume right after the cursor entry in index order
+        if descending:
+            pos = len(entries) if after is None else bisect.bisect_left(entries, after)
+            positions = range(pos - 1, -1, -1)
+        else:
+            pos = 0 if after is None else bisect.bisect_right(entries, after)
+            positions = range(pos, len(entries))
+        page = []
+        for i in positions:
+            entry = entries[i]
+            if candidates is None or entry[1] in candidates:
+                page.append(entry)
+                if len(page) == count:
+                    break
+        return page
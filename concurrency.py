@@ -0,0 +1,209 @@
+import itertools
+import threading
+from contextlib import contextmanager
+
+
+class IdAllocator:
+    # itertools.count.__next__ runs entirely in C while holding the GIL, so
+    # concurrent callers always get distinct ids without taking a lock
+
+    def __init__(self, start=1):
+        self._counter = itertools.count(start)
+
+    def next(self):
+        return next(self._counter)
+
+    @classmethod
+    def after(cls, existing_ids):
+        return cls(max(existing_ids, default=0) + 1)
+
+
+class StripedLock:
+    # a fixed pool of locks selected by key hash: writers touching unrelated
+    # keys rarely contend, and the pool size bounds memory regardless of how
+    # many keys there are
+
+    def __init__(self, stripes=64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def _index(self, key):
+        return hash(key) % len(self._locks)
+
+    def for_key(self, key):
+        return self._locks[self._index(key)]
+
+    @contextmanager
+    def for_keys(self, *keys):
+        # always acquire in stripe order so two multi-key writers cannot deadlock
+        indexes = sorted({self._index(key) for key in keys})
+        for index in indexes:
+            self._locks[index].acquire()
+        try:
+            yield
+        finally:
+            for index in reversed(indexes):
+                self._locks[index].release()
+
+
+# overlay values standing for a missing key
+_MISSING = object()
+_DELETED = object()
+
+
+class CopyOnWriteDict:
+    # readers get the current contents without locking and never see a dict
+    # change while they iterate it. The contents are a base dict that is
+    # never changed once published plus an overlay of recent writes (a
+    # deletion is a _DELETED marker). Writers change the overlay in place
+    # under the write lock; once it outgrows an eighth of the base it is
+    # folded into a fresh base, published with a single reference swap.
+    # A run of batch writes (a bulk import) so copies the data a bounded
+    # number of times per doubling instead of once per write. Meant for
+    # read-mostly data such as the photographer catalog
+
+    # overlays below this size are never folded, so small dicts are not
+    # copied on every few writes
+    FOLD_MIN = 256
+
+    def __init__(self, initial=None):
+        self._layers = (dict(initial or {}), {})
+        self._length = len(self._layers[0])
+        self._write_lock = threading.Lock()
+
+    def snapshot(self):
+        # -> a dict of the contents that nobody changes afterwards
+        with self._write_lock:
+            if self._layers[1]:
+                self._layers = (self._folded(), {})
+            return self._layers[0]
+
+    def _folded(self):
+        # caller holds the write lock; -> a new dict of the contents
+        base, overlay = self._layers
+        data = dict(base)
+        for key, value in overlay.items():
+            if value is _DELETED:
+                data.pop(key, None)
+            else:
+                data[key] = value
+        return data
+
+    def _put(self, key, value):
+        # caller holds the write lock
+        base, overlay = self._layers
+        previous = overlay.get(key, _MISSING)
+        present = key in base if previous is _MISSING else previous is not _DELETED
+        if value is _DELETED:
+            if not present:
+                return
+            self._length -= 1
+        elif not present:
+            self._length += 1
+        overlay[key] = value
+
+    def _settle(self):
+        # caller holds the write lock
+        base, overlay = self._layers
+        if len(overlay) > max(self.FOLD_MIN, len(base) // 8):
+            self._layers = (self._folded(), {})
+
+    @contextmanager
+    def mutate(self):
+        # rewrites the whole dict at once (e.g. a load); single keys and
+        # batches go through the overlay instead
+        with self._write_lock:
+            data = self._folded()
+            yield data
+            self._layers = (data, {})
+            self._length = len(data)
+
+    def __setitem__(self, key, value):
+        with self._write_lock:
+            self._put(key, value)
+            self._settle()
+
+    def __delitem__(self, key):
+        with self._write_lock:
+            if key not in self:
+                raise KeyError(key)
+            self._put(key, _DELETED)
+            self._settle()
+
+    def update(self, items):
+        # the batch lands in the overlay, so it costs its own size rather
+        # than a copy of the whole dict
+        with self._write_lock:
+            for key, value in dict(items).items():
+                self._put(key, value)
+            self._settle()
+
+    def pop(self, key, *default):
+        with self._write_lock:
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            self._put(key, _DELETED)
+            self._settle()
+            return value
+
+    def get(self, key, default=None):
+        base, overlay = self._layers
+        value = overlay.get(key, _MISSING)
+        if value is _MISSING:
+            return base.get(key, default)
+        return default if value is _DELETED else value
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self):
+        return self._length
+
+    def _layers_for_reading(self):
+        # the base is iterated as published; only the overlay is copied,
+        # under the write lock so a writer cannot change it mid-copy
+        with self._write_lock:
+            base, overlay = self._layers
+            return base, dict(overlay)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        base, overlay = self._layers_for_reading()
+        if not overlay:
+            return base.keys()
+        return [key for key, _ in _merged_items(base, overlay)]
+
+    def values(self):
+        base, overlay = self._layers_for_reading()
+        if not overlay:
+            return base.values()
+        return [value for _, value in _merged_items(base, overlay)]
+
+    def items(self):
+        base, overlay = self._layers_for_reading()
+        if not overlay:
+            return base.items()
+        return _merged_items(base, overlay)
+
+
+def _merged_items(base, overlay):
+    # base order first, then keys only the overlay has, as a dict would list them
+    items = []
+    for key, value in base.items():
+        value = overlay.get(key, value)
+        if value is not _DELETED:
+            items.append((key, value))
+    for key, value in overlay.items():
+        if value is not _DELETED and key not in base:
+            items.append((key, value))
+    return items
@@ -0,0 +1,60 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+BATCH_GET_LIMIT = 100
+
+
+def _chunks(values, size):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _fetch_chunk(dynamodb, table_name, keys, max_attempts, base_delay, sleep):
+    # BatchGetItem may return part of a chunk under throttling; whatever
+    # comes back in UnprocessedKeys is resubmitted with jittered backoff
+    items = []
+    request = {table_name: {'Keys': keys}}
+    for attempt in range(max_attempts):
+        response = dynamodb.batch_get_item(RequestItems=request)
+        items.extend(response.get('Responses', {}).get(table_name, []))
+        request = response.get('UnprocessedKeys') or {}
+        if not request.get(table_name, {}).get('Keys'):
+            return items, []
+        if attempt < max_attempts - 1:
+            # no wait after the last attempt, nothing follows it
+            sleep(random.uniform(0, base_delay * (2 ** attempt)))
+    return items, request[table_name]['Keys']
+
+
+def batch_get_items(dynamodb, table_name, key_name, key_values, max_workers=8,
+                    max_attempts=6, base_delay=0.05, sleep=time.sleep):
+    # returns the items for key_values in the same order, skipping keys that
+    # do not exist. Chunks of 100 are fetched in parallel, so latency grows
+    # with the number of chunks rather than the number of keys
+    unique_values = list(dict.fromkeys(key_values))
+    if not unique_values:
+        return []
+    chunks = [[{key_name: value} for value in chunk]
+              for chunk in _chunks(unique_values, BATCH_GET_LIMIT)]
+
+    def fetch(chunk):
+        return _fetch_chunk(dynamodb, table_name, chunk, max_attempts, base_delay, sleep)
+
+    if len(chunks) == 1:
+        results = [fetch(chunks[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            results = list(executor.map(fetch, chunks))
+
+    found = {}
+    unprocessed = 0
+    for items, leftover in results:
+        unprocessed += len(leftover)
+        for item in items:
+            found[item[key_name]] = item
+    if unprocessed:
+        print(f'DynamoDB batch get on {table_name}: {unprocessed} keys still unprocessed')
+
+    return [found[value] for value in key_values if value in found]
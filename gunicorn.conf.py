@@ -0,0 +1,61 @@
+# gunicorn -c gunicorn.conf.py wsgi:application
+#
+# Settings come from the environment: BIND, WEB_CONCURRENCY (worker
+# processes), GUNICORN_THREADS (threads per worker) and the app's own
+# variables (STORAGE_BACKEND, JOURNAL_DIR, ...).
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# the memory backend keeps a separate copy of every store in each worker,
+# so it runs one worker unless told otherwise; sqlite shares them
+if os.environ.get('STORAGE_BACKEND', 'memory') == 'memory':
+    workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+else:
+    workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# build and warm the app once in the master (wsgi.py); the workers inherit
+# the read-mostly data instead of each loading it after the fork
+preload_app = True
+
+# the memory backend's journal (repository.create_repositories)
+journaled = os.environ.get('STORAGE_BACKEND', 'memory') == 'memory' and bool(os.environ.get('JOURNAL_DIR'))
+if journaled:
+    # the journal is written by the process that recovered it, so the one
+    # worker loads the app itself
+    preload_app = False
+
+# collections in the master while the app is built would only leave freed
+# holes in the pages the workers are about to share
+gc.disable()
+
+
+def on_starting(server):
+    # only one process may own the journal directory (a second one would
+    # fail to lock it), so refuse to start rather than boot workers that die
+    if journaled and server.cfg.workers > 1:
+        raise RuntimeError(f'JOURNAL_DIR is set but gunicorn runs {server.cfg.workers} workers; '
+                           'the journal needs exactly one, so set WEB_CONCURRENCY=1')
+
+
+def when_ready(server):
+    gc.collect()
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # anything the master allocated since the last fork joins the frozen set
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # the collector never looks at frozen objects, so a worker's collections
+    # do not write to (and un-share) the pages they live on
+    gc.enable()
@@ -0,0 +1,441 @@
+import atexit
+import fcntl
+import gc
+import marshal
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Mapping
+
+from concurrency import StripedLock
+from repository import Repositories
+
+
+# store methods that change data; every successful call is journaled
+JOURNALED_OPERATIONS = frozenset({
+    'add', 'remove', 'update_password', 'set_status', 'delete', '__setitem__', '__delitem__', 'pop', 'put_many',
+})
+
+# payload length and CRC-32 of each journal frame
+_FRAME = struct.Struct('<II')
+
+SNAPSHOT_MAGIC = b'PBSNAP01'
+# magic, first journal segment not covered by the snapshot, CRC-32 of the body
+_SNAPSHOT_HEADER = struct.Struct('<8sQI')
+
+_SEGMENT_NAME = re.compile(r'journal-(\d{12})\.log$')
+_SNAPSHOT_NAME = re.compile(r'snapshot-(\d{12})\.bin$')
+_OWNER_NAME = 'owner.lock'
+
+MARSHAL_VERSION = 4
+
+
+def _segment_path(directory, number):
+    return os.path.join(directory, f'journal-{number:012d}.log')
+
+
+def _snapshot_path(directory, number):
+    return os.path.join(directory, f'snapshot-{number:012d}.bin')
+
+
+def _numbered(directory, pattern):
+    # -> [(number, path)] of the files in directory matching pattern, oldest first
+    found = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def _own_directory(directory):
+    # -> the lock file, exclusively locked for this process; the lock goes
+    # away with the file, so a crashed owner never leaves it behind
+    f = open(os.path.join(directory, _OWNER_NAME), 'a+')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.seek(0)
+        owner = f.read().strip() or 'another process'
+        f.close()
+        raise RuntimeError(f'{directory} is owned by process {owner}; only one process may use '
+                           'a JOURNAL_DIR, so run a single worker') from None
+    f.truncate(0)
+    f.write(str(os.getpid()))
+    f.flush()
+    return f
+
+
+def _fsync_directory(directory):
+    # makes a create, rename or unlink in directory survive a crash
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _plain(value):
+    # BookingRecords and read-only views are journaled as dicts
+    if isinstance(value, Mapping) and not isinstance(value, dict):
+        return dict(value)
+    return value
+
+
+def encode_frame(store, operation, args):
+    payload = marshal.dumps((store, operation, tuple(_plain(arg) for arg in args)), MARSHAL_VERSION)
+    return _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_frames(path):
+    # -> (entries, good_length): every intact frame of a segment and the
+    # byte offset just past the last one. A crash mid-write leaves a short
+    # or garbled frame at the end; reading stops there
+    with open(path, 'rb') as f:
+        data = f.read()
+    entries = []
+    offset = 0
+    while offset + _FRAME.size <= len(data):
+        length, crc = _FRAME.unpack_from(data, offset)
+        start = offset + _FRAME.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        entries.append(marshal.loads(payload))
+        offset = start + length
+    return entries, offset
+
+
+class Journal:
+    # append-only log of store writes with group commit: a write only
+    # appends its encoded frame to an in-memory buffer, and a background
+    # thread writes and fsyncs everything buffered once per commit_interval,
+    # so one fsync covers every write in that window and a crash loses at
+    # most the last window. The log is split into numbered segments so a
+    # snapshot can start a fresh one and let the older segments go
+
+    def __init__(self, directory, segment, commit_interval=0.01):
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.segment = segment
+        self.bytes_written = 0
+        self._file = open(_segment_path(directory, segment), 'ab')
+        _fsync_directory(directory)
+        self._buffer = []
+        self._lock = threading.Lock()
+        # held while writing to the segment files, so commits and rotations
+        # land in order
+        self._io_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = os.getpid()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        if os.getpid() != self._pid:
+            # a forked child would interleave its frames with the parent's
+            raise RuntimeError('the store journal is owned by process %d; run a single worker '
+                               'process when JOURNAL_DIR is set' % self._pid)
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='store-journal', daemon=True)
+                self._thread.start()
+
+    def append(self, store, operation, args):
+        frame = encode_frame(store, operation, args)
+        self._ensure_started()
+        with self._lock:
+            self._buffer.append(frame)
+
+    def _run(self):
+        while not self._stopping.wait(self.commit_interval):
+            try:
+                self.commit()
+            except OSError as e:
+                # the frames stay buffered and the next window tries again
+                print(f'Journal: commit to {self.directory} failed: {e}')
+
+    def _take(self):
+        # caller holds the io lock
+        with self._lock:
+            frames, self._buffer = self._buffer, []
+        return frames
+
+    def _write(self, f, frames):
+        # caller holds the io lock
+        if not frames:
+            return
+        data = b''.join(frames)
+        try:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        except OSError:
+            with self._lock:
+                self._buffer[:0] = frames
+            raise
+        self.bytes_written += len(data)
+
+    def commit(self):
+        # one write and one fsync for everything appended since the last commit
+        with self._io_lock:
+            self._write(self._file, self._take())
+
+    def rotate(self):
+        # finishes the current segment and starts the next; returns the new
+        # segment number. Every write appended before the call is in an
+        # older segment
+        with self._io_lock:
+            with self._lock:
+                frames, self._buffer = self._buffer, []
+                previous = self._file
+                self.segment += 1
+                self._file = open(_segment_path(self.directory, self.segment), 'ab')
+            _fsync_directory(self.directory)
+            try:
+                self._write(previous, frames)
+            finally:
+                previous.close()
+            self.bytes_written = 0
+            return self.segment
+
+    def close(self):
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join()
+        if os.getpid() == self._pid and not self._file.closed:
+            self.commit()
+            self._file.close()
+
+
+def write_snapshot(directory, segment, state):
+    # state: {store name: dump}. Written beside the final name and renamed
+    # into place, so a crash leaves either the old snapshot or the new one
+    body = marshal.dumps(state, MARSHAL_VERSION)
+    path = _snapshot_path(directory, segment)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(_SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, segment, zlib.crc32(body)))
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    _fsync_directory(directory)
+    return path, len(body)
+
+
+def read_snapshot(path):
+    # -> (segment, state). The file is memory-mapped and unmarshalled
+    # straight from the mapping, so it is never copied into a bytes object
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if len(mapped) < _SNAPSHOT_HEADER.size:
+            raise ValueError(f'{path} is not a store snapshot')
+        magic, segment, crc = _SNAPSHOT_HEADER.unpack_from(mapped)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f'{path} is not a store snapshot')
+        body = memoryview(mapped)[_SNAPSHOT_HEADER.size:]
+        try:
+            if zlib.crc32(body) != crc:
+                raise ValueError(f'{path} is corrupt (checksum mismatch)')
+            return segment, marshal.loads(body)
+        finally:
+            body.release()
+
+
+def replay(store, operation, args):
+    # journaled writes are applied again on top of the snapshot. A write can
+    # land just after the journal rotated yet before the snapshot read its
+    # store, so it may already be there: adds replace, removals tolerate a
+    # missing key and everything else simply sets the same value again
+    if operation == 'add' and args[0] in store:
+        getattr(store, 'delete' if hasattr(store, 'set_status') else 'remove')(args[0])
+    if operation == '__delitem__':
+        store.pop(args[0], None)
+        return
+    getattr(store, operation)(*args)
+
+
+class JournaledStore:
+    # wraps a memory store so every successful write is appended to the
+    # journal. Writes to the same key are journaled in the order they were
+    # applied (a striped lock covers the write and the append); everything
+    # else is forwarded untouched
+
+    def __init__(self, store, name, journal, locks):
+        self._store = store
+        self._name = name
+        self._journal = journal
+        self._locks = locks
+
+    def __getattr__(self, attribute):
+        value = getattr(self._store, attribute)
+        if attribute not in JOURNALED_OPERATIONS:
+            return value
+        wrapped = self.__dict__[attribute] = self._journaled(attribute, value)
+        return wrapped
+
+    def _journaled(self, operation, method):
+        name = self._name
+
+        def write(*args):
+            if operation == 'put_many':
+                args = (list(args[0]),)
+                keys = [(name, key) for key, _ in args[0]]
+            else:
+                keys = [(name, args[0])]
+            with self._locks.for_keys(*keys):
+                result = method(*args)
+                self._journal.append(name, operation, args)
+            return result
+        return write
+
+    def __getitem__(self, key):
+        return self._store[key]
+
+    def __setitem__(self, key, value):
+        return self.__getattr__('__setitem__')(key, value)
+
+    def __delitem__(self, key):
+        return self.__getattr__('__delitem__')(key)
+
+    def __contains__(self, key):
+        return key in self._store
+
+    def __len__(self):
+        return len(self._store)
+
+    def __iter__(self):
+        return iter(self._store)
+
+
+class DurableStores:
+    # the memory stores made durable: on open the latest snapshot is loaded
+    # and the journal segments after it are replayed; from then on writes
+    # go through JournaledStore proxies. A background thread takes a new
+    # snapshot every snapshot_interval seconds if anything was written, or
+    # sooner once the journal passes snapshot_bytes, and then deletes the
+    # segments and snapshots it supersedes. One process owns a directory:
+    # open() locks it and a second process opening it gets a RuntimeError
+
+    def __init__(self, directory, stores, journal, snapshot_interval=300.0, snapshot_bytes=16 * 1024 * 1024):
+        self.directory = directory
+        self.stores = stores
+        self.journal = journal
+        self.snapshot_interval = snapshot_interval
+        self.snapshot_bytes = snapshot_bytes
+        locks = StripedLock()
+        self.repositories = Repositories(**{
+            name: JournaledStore(store, name, journal, locks) for name, store in stores._asdict().items()
+        })
+        self._snapshot_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._last_snapshot = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='store-snapshots', daemon=True)
+        self._owner = None
+        self.recovery = {}
+
+    @classmethod
+    def open(cls, config, stores):
+        directory = config['JOURNAL_DIR']
+        os.makedirs(directory, exist_ok=True)
+        owner = _own_directory(directory)
+        # the load allocates millions of objects and nothing in it is
+        # garbage; without this every collection rescans the growing heap
+        collecting = gc.isenabled()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            first_segment = 0
+            snapshots = _numbered(directory, _SNAPSHOT_NAME)
+            if snapshots:
+                first_segment, state = read_snapshot(snapshots[-1][1])
+                for name, dump in state.items():
+                    getattr(stores, name).load(dump)
+                del state
+            loaded = time.perf_counter()
+
+            replayed = 0
+            segments = [(n, path) for n, path in _numbered(directory, _SEGMENT_NAME) if n >= first_segment]
+            for position, (number, path) in enumerate(segments):
+                entries, good_length = read_frames(path)
+                for name, operation, args in entries:
+                    replay(getattr(stores, name), operation, args)
+                replayed += len(entries)
+                if good_length < os.path.getsize(path):
+                    if position != len(segments) - 1:
+                        raise ValueError(f'{path} is corrupt before the end of the journal')
+                    # the torn tail of the last write before a crash
+                    with open(path, 'r+b') as f:
+                        f.truncate(good_length)
+            for store in (stores.users, stores.photographers, stores.bookings):
+                store.restart_ids()
+
+        finally:
+            if collecting:
+                gc.enable()
+
+        next_segment = max([first_segment] + [number + 1 for number, _ in segments])
+        durable = cls(directory, stores, Journal(directory, next_segment, config.get('JOURNAL_COMMIT_INTERVAL', 0.01)),
+                      snapshot_interval=config.get('JOURNAL_SNAPSHOT_INTERVAL', 300.0),
+                      snapshot_bytes=config.get('JOURNAL_SNAPSHOT_BYTES', 16 * 1024 * 1024))
+        durable._owner = owner
+        durable.recovery = {
+            'snapshot_seconds': round(loaded - started, 3),
+            'replay_seconds': round(time.perf_counter() - loaded, 3),
+            'replayed_writes': replayed,
+        }
+        durable._thread.start()
+        atexit.register(durable.close)
+        return durable
+
+    def snapshot(self):
+        # rotate first, then read the stores: anything written after the
+        # rotation is in the new segment (and possibly the snapshot too,
+        # which replay tolerates), anything before it is in the snapshot
+        with self._snapshot_lock:
+            segment = self.journal.rotate()
+            state = {name: store.dump() for name, store in self.stores._asdict().items()}
+            path, size = write_snapshot(self.directory, segment, state)
+            for number, old_path in _numbered(self.directory, _SEGMENT_NAME):
+                if number < segment:
+                    os.remove(old_path)
+            for number, old_path in _numbered(self.directory, _SNAPSHOT_NAME):
+                if number < segment:
+                    os.remove(old_path)
+            _fsync_directory(self.directory)
+            self._last_snapshot = time.monotonic()
+            return path, size
+
+    def _due(self):
+        written = self.journal.bytes_written
+        if written >= self.snapshot_bytes:
+            return True
+        return written > 0 and time.monotonic() - self._last_snapshot >= self.snapshot_interval
+
+    def _run(self):
+        while not self._stopping.wait(1.0):
+            try:
+                if self._due():
+                    self.snapshot()
+            except (OSError, ValueError) as e:
+                print(f'Journal: snapshot in {self.directory} failed: {e}')
+
+    def close(self):
+        self._stopping.set()
+        self.journal.close()
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+
+def open_journaled(config, stores):
+    # -> Repositories whose writes are journaled under config['JOURNAL_DIR']
+    return DurableStores.open(config, stores).repositories
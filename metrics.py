@@ -0,0 +1,300 @@
+import bisect
+import hmac
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, g, request, session, before_render_template, template_rendered
+
+
+# seconds; tuned for pages that take from well under a millisecond (cache
+# hits) to a few hundred (password hashing)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+HELP = {
+    'http_request_duration_seconds': ('histogram', 'Time from request start to response, by endpoint.'),
+    'http_view_duration_seconds': ('histogram', 'Request time spent outside template rendering, by endpoint.'),
+    'template_render_duration_seconds': ('histogram', 'Time spent rendering each template.'),
+    'http_requests_total': ('counter', 'Requests served, by endpoint, method and status.'),
+    'store_operation_duration_seconds': ('histogram', 'Time spent in repository calls.'),
+    'store_operations_total': ('counter', 'Repository calls, by store, operation and kind.'),
+    'store_operation_errors_total': ('counter', 'Repository calls that raised.'),
+}
+
+# repository method -> kind, so dashboards can group lookups, scans and
+# writes without knowing every method name
+OPERATION_KINDS = {
+    'get': 'lookup', '__getitem__': 'lookup', '__contains__': 'lookup', 'username_exists': 'lookup',
+    'email_exists': 'lookup', 'get_by_username': 'lookup', 'id_for_username': 'lookup',
+    'find_by_photographer': 'lookup', '__len__': 'count', 'count_by_type': 'count',
+    'count_by_status': 'count', 'count_by_photographer': 'count', 'count_for_user': 'count',
+    'count_for_photographer': 'count', 'items': 'scan', 'keys': 'scan', 'values': 'scan',
+    '__iter__': 'scan', 'for_user': 'scan', 'for_photographer': 'scan', 'scan': 'scan',
+    'add': 'insert', '__setitem__': 'insert', 'next_id': 'insert', 'update_password': 'update',
+    'set_status': 'update',
+    'remove': 'delete', 'delete': 'delete', 'pop': 'delete', '__delitem__': 'delete',
+}
+
+
+class _Shard:
+    # one thread's counters and histograms. Only the owning thread writes,
+    # so updates need no lock; the collector copies the dicts, which is a
+    # single C-level operation under the GIL
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counters = {}
+        self.histograms = {}
+
+
+class Metrics:
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(None)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            enabled=config.get('METRICS_ENABLED', True),
+            buckets=config.get('METRICS_BUCKETS', DEFAULT_BUCKETS)
+        )
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, labels, amount=1):
+        if not self.enabled:
+            return
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, labels, seconds):
+        if not self.enabled:
+            return
+        histograms = self._shard().histograms
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            # one slot per bucket plus +Inf, then sum
+            histogram = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect.bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+
+    @contextmanager
+    def timer(self, name, labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, labels, time.perf_counter() - start)
+
+    # -- collection ----------------------------------------------------------
+
+    def _merge_into(self, target, shard):
+        for key, value in shard.counters.copy().items():
+            target.counters[key] = target.counters.get(key, 0) + value
+        for key, histogram in shard.histograms.copy().items():
+            merged = target.histograms.get(key)
+            if merged is None:
+                target.histograms[key] = list(histogram)
+            else:
+                for i, value in enumerate(histogram):
+                    merged[i] += value
+
+    def collect(self):
+        # fold shards of finished threads into the retired totals so a
+        # thread-per-request server does not grow the shard list forever
+        with self._lock:
+            live = []
+            for shard in self._shards:
+                if shard.thread.is_alive():
+                    live.append(shard)
+                else:
+                    self._merge_into(self._retired, shard)
+            self._shards = live
+            total = _Shard(None)
+            self._merge_into(total, self._retired)
+            for shard in live:
+                self._merge_into(total, shard)
+        return total
+
+    def render(self):
+        total = self.collect()
+        families = {}
+        for (name, labels), value in total.counters.items():
+            families.setdefault(name, []).append((labels, value))
+        for (name, labels), histogram in total.histograms.items():
+            families.setdefault(name, []).append((labels, histogram))
+
+        lines = []
+        for name in sorted(families):
+            kind, text = HELP.get(name, ('untyped', name))
+            lines.append(f'# HELP {name} {text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(families[name], key=lambda entry: entry[0]):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(self.buckets + (math.inf,), value[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else _number(bound)
+                    lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels)} {_number(value[-1])}')
+                lines.append(f'{name}_count{_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+    # -- flask ---------------------------------------------------------------
+
+    def init_app(self, app, path='/metrics', authorize=None):
+        # authorize: called for each request to path, a false result is a
+        # 401; without it the page is open to anyone who can reach it
+        if not self.enabled:
+            return
+
+        @app.before_request
+        def start_timer():
+            g._metrics_start = time.perf_counter()
+            g._metrics_render = 0.0
+
+        @app.after_request
+        def record_request(response):
+            start = g.pop('_metrics_start', None)
+            if start is None:
+                return response
+            elapsed = time.perf_counter() - start
+            endpoint = request.endpoint or 'unmatched'
+            rendering = g.pop('_metrics_render', 0.0)
+            self.observe('http_request_duration_seconds', (('endpoint', endpoint),), elapsed)
+            self.observe('http_view_duration_seconds', (('endpoint', endpoint),), max(elapsed - rendering, 0.0))
+            self.inc('http_requests_total', (('endpoint', endpoint), ('method', request.method),
+                                             ('status', str(response.status_code))))
+            return response
+
+        def render_started(sender, template, context, **extra):
+            g._metrics_render_start = time.perf_counter()
+
+        def render_finished(sender, template, context, **extra):
+            start = g.pop('_metrics_render_start', None)
+            if start is None:
+                return
+            elapsed = time.perf_counter() - start
+            g._metrics_render = g.get('_metrics_render', 0.0) + elapsed
+            self.observe('template_render_duration_seconds', (('template', template.name or 'string'),), elapsed)
+
+        before_render_template.connect(render_started, app, weak=False)
+        template_rendered.connect(render_finished, app, weak=False)
+
+        def metrics_view():
+            if authorize is not None and not authorize():
+                return Response('metrics need an admin session or the metrics token\n', 401,
+                                {'WWW-Authenticate': 'Bearer'}, mimetype='text/plain')
+            return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+        app.add_url_rule(path, 'metrics', metrics_view)
+
+    def instrument(self, store, name):
+        if not self.enabled:
+            return store
+        return InstrumentedStore(store, name, self)
+
+
+def admin_or_token(token):
+    # who may read operator pages such as /metrics: an admin session, or a
+    # scraper sending "Authorization: Bearer <token>" when a token is set
+    if 'user_id' in session and session.get('user_type') == 'admin':
+        return True
+    supplied = request.headers.get('Authorization', '')
+    return bool(token) and hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _timed(metrics, store_name, operation, method):
+    labels = (('store', store_name), ('operation', operation),
+              ('kind', OPERATION_KINDS.get(operation, 'other')))
+
+    @wraps(method)
+    def call(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            metrics.inc('store_operation_errors_total', labels)
+            raise
+        finally:
+            metrics.observe('store_operation_duration_seconds', labels, time.perf_counter() - start)
+            metrics.inc('store_operations_total', labels)
+    return call
+
+
+class InstrumentedStore:
+    # wraps a repository so every call is counted and timed. Plain attribute
+    # access is forwarded untouched; bound methods are wrapped once and
+    # cached on the proxy
+
+    def __init__(self, store, name, metrics):
+        self._store = store
+        self._name = name
+        self._metrics = metrics
+
+    def __getattr__(self, attribute):
+        value = getattr(self._store, attribute)
+        if not callable(value) or attribute.startswith('_'):
+            return value
+        wrapped = _timed(self._metrics, self._name, attribute, value)
+        self.__dict__[attribute] = wrapped
+        return wrapped
+
+    def _call(self, operation, *args):
+        # special methods are looked up on the type, so the proxy defines
+        # them below and routes them through the same cached wrappers
+        wrapped = self.__dict__.get(operation)
+        if wrapped is None:
+            wrapped = self.__dict__[operation] = _timed(
+                self._metrics, self._name, operation, getattr(self._store, operation))
+        return wrapped(*args)
+
+    def __getitem__(self, key):
+        return self._call('__getitem__', key)
+
+    def __setitem__(self, key, value):
+        return self._call('__setitem__', key, value)
+
+    def __delitem__(self, key):
+        return self._call('__delitem__', key)
+
+    def __contains__(self, key):
+        return self._call('__contains__', key)
+
+    def __len__(self):
+        return self._call('__len__')
+
+    def __iter__(self):
+        return self._call('__iter__')
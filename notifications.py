@@ -0,0 +1,173 @@
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+
+SNS_BATCH_LIMIT = 10
+
+
+class NotificationDispatcher:
+    # publishes SNS notifications from a background thread so requests only
+    # pay for a queue put. Messages are grouped into PublishBatch calls of up
+    # to ten, transient failures are retried with exponential backoff and
+    # full jitter, and anything that still fails (or does not fit in the
+    # queue) is appended to a JSONL dead-letter file for replay
+
+    def __init__(self, client_factory, topic_arn, max_queue=10000, linger=0.05,
+                 max_attempts=5, base_delay=0.2, max_delay=10.0,
+                 dead_letter_path='notifications.deadletter.jsonl', sleep=time.sleep):
+        self.client_factory = client_factory
+        self.topic_arn = topic_arn
+        self.linger = linger
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dead_letter_path = dead_letter_path
+        self.sleep = sleep
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.published = 0
+        self.dead_lettered = 0
+        atexit.register(self.shutdown)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='sns-dispatcher', daemon=True)
+                self._pid = os.getpid()
+                self._thread.start()
+
+    def submit(self, subject, message, attributes=None):
+        entry = {'Subject': subject[:100], 'Message': message}
+        if attributes:
+            entry['MessageAttributes'] = {
+                name: {'DataType': 'Number' if isinstance(value, (int, float)) else 'String',
+                       'StringValue': str(value)}
+                for name, value in attributes.items()
+            }
+        if self._stopping.is_set():
+            self._spill([entry], 'dispatcher stopped')
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._spill([entry], 'queue full')
+            return False
+        return True
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.linger
+        while len(batch) < SNS_BATCH_LIMIT:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0
+                             else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._publish(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            elif self._stopping.is_set():
+                return
+
+    def _backoff(self, attempt):
+        self.sleep(random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt))))
+
+    def _publish(self, batch):
+        pending = {str(i): entry for i, entry in enumerate(batch)}
+        client = None
+        error = None
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self._backoff(attempt - 1)
+            try:
+                client = client or self.client_factory()
+                response = client.publish_batch(
+                    TopicArn=self.topic_arn,
+                    PublishBatchRequestEntries=[dict(entry, Id=i) for i, entry in pending.items()]
+                )
+            except Exception as e:
+                error = str(e)
+                continue
+            for ok in response.get('Successful', []):
+                if pending.pop(ok['Id'], None) is not None:
+                    self.published += 1
+            for failed in response.get('Failed', []):
+                if failed.get('SenderFault'):
+                    # malformed message: retrying will not help
+                    entry = pending.pop(failed['Id'], None)
+                    if entry is not None:
+                        self._spill([entry], failed.get('Message') or failed.get('Code', 'sender fault'))
+                else:
+                    error = failed.get('Message') or failed.get('Code')
+            if not pending:
+                return
+        self._spill(list(pending.values()), error or 'retries exhausted')
+
+    def _spill(self, entries, reason):
+        with self._spill_lock:
+            with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps({
+                        'topic_arn': self.topic_arn,
+                        'reason': reason,
+                        'failed_at': time.time(),
+                        'entry': entry,
+                    }) + '\n')
+            self.dead_lettered += len(entries)
+        print(f'SNS: {len(entries)} notification(s) dead-lettered: {reason}')
+
+    def flush(self, timeout=10.0):
+        # -> True once everything submitted so far has been published or
+        # dead-lettered; False after timeout seconds, or as soon as no
+        # worker in this process is left to drain the queue (it died, or
+        # this is a forked child)
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                thread = self._thread
+                if thread is None or self._pid != os.getpid() or not thread.is_alive():
+                    return False
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                # wake up now and then to notice a worker that died
+                self._queue.all_tasks_done.wait(min(remaining, 0.5))
+        return True
+
+    def shutdown(self, timeout=10.0):
+        # stop accepting, drain what is queued, then let the worker exit
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and self._pid == os.getpid() and thread.is_alive():
+            thread.join(timeout)
+        leftover = []
+        while True:
+            try:
+                leftover.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if leftover:
+            self._spill(leftover, 'not sent before shutdown')
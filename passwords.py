@@ -0,0 +1,149 @@
+import base64
+import hashlib
+import hmac
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+
+LEGACY_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+class HasherBusy(Exception):
+    # raised instead of queueing when the hashing pool is saturated or a
+    # hash did not finish in time; callers answer with a retryable error
+    pass
+
+
+def legacy_hash(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode().rstrip('=')
+
+
+def _unb64(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+# The functions below run inside the worker processes, so they are plain
+# module-level functions that only need hashlib.
+
+def hash_password_sync(password, scheme, params):
+    salt = os.urandom(16)
+    if scheme == 'pbkdf2_sha256':
+        iterations = params['iterations']
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+        return f'pbkdf2_sha256${iterations}${_b64(salt)}${_b64(digest)}'
+    if scheme == 'scrypt':
+        n, r, p = params['n'], params['r'], params['p']
+        digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                                maxmem=256 * n * r + 1024 * 1024, dklen=32)
+        return f'scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}'
+    raise ValueError(f'unknown password scheme {scheme!r}')
+
+
+def verify_password_sync(password, encoded):
+    if LEGACY_SHA256.match(encoded):
+        return hmac.compare_digest(legacy_hash(password), encoded)
+    parts = encoded.split('$')
+    if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+        iterations, salt, expected = int(parts[1]), _unb64(parts[2]), _unb64(parts[3])
+        digest = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+        return hmac.compare_digest(digest, expected)
+    if parts[0] == 'scrypt' and len(parts) == 6:
+        n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+        salt, expected = _unb64(parts[4]), _unb64(parts[5])
+        digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                                maxmem=256 * n * r + 1024 * 1024, dklen=len(expected))
+        return hmac.compare_digest(digest, expected)
+    return False
+
+
+class PasswordHasher:
+    # runs the configured KDF in a small process pool so a burst of logins
+    # cannot pin every WSGI thread. At most max_pending hashes may be queued
+    # or running at once; past that, or past the timeout, HasherBusy is raised
+
+    def __init__(self, scheme='pbkdf2_sha256', params=None, workers=None,
+                 max_pending=64, timeout=5.0):
+        self.scheme = scheme
+        self.params = params or {'iterations': 260000}
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        scheme = config.get('PASSWORD_SCHEME', 'pbkdf2_sha256')
+        if scheme == 'scrypt':
+            params = {
+                'n': config.get('PASSWORD_SCRYPT_N', 2 ** 14),
+                'r': config.get('PASSWORD_SCRYPT_R', 8),
+                'p': config.get('PASSWORD_SCRYPT_P', 1),
+            }
+        else:
+            params = {'iterations': config.get('PASSWORD_PBKDF2_ITERATIONS', 260000)}
+        return cls(
+            scheme=scheme,
+            params=params,
+            workers=config.get('PASSWORD_HASH_WORKERS'),
+            max_pending=config.get('PASSWORD_HASH_MAX_PENDING', 64),
+            timeout=config.get('PASSWORD_HASH_TIMEOUT', 5.0)
+        )
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                # a pool inherited across fork has no live workers
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy('password hashing queue is full')
+        try:
+            future = self._pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # the slot stays taken until the worker really finishes
+            raise HasherBusy('password hashing timed out')
+
+    def hash(self, password):
+        return self._run(hash_password_sync, password, self.scheme, self.params)
+
+    def verify(self, password, encoded):
+        if not encoded:
+            return False
+        if LEGACY_SHA256.match(encoded):
+            # cheap enough to check inline; it is upgraded right after
+            return verify_password_sync(password, encoded)
+        return self._run(verify_password_sync, password, encoded)
+
+    def needs_rehash(self, encoded):
+        parts = encoded.split('$')
+        if parts[0] != self.scheme:
+            return True
+        if self.scheme == 'pbkdf2_sha256':
+            return int(parts[1]) != self.params['iterations']
+        return [int(x) for x in parts[1:4]] != [self.params['n'], self.params['r'], self.params['p']]
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
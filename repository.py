@@ -0,0 +1,246 @@
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+from concurrency import IdAllocator, CopyOnWriteDict
+
+
+class Repository(ABC):
+    # read side shared by every store: the views treat repositories as
+    # read-only mappings from id (or username) to record
+
+    @abstractmethod
+    def get(self, key, default=None):
+        pass
+
+    @abstractmethod
+    def __contains__(self, key):
+        pass
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    @abstractmethod
+    def items(self):
+        pass
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+
+class UserRepository(Repository):
+    @abstractmethod
+    def next_id(self):
+        pass
+
+    @abstractmethod
+    def add(self, user_id, user):
+        pass
+
+    @abstractmethod
+    def remove(self, user_id):
+        pass
+
+    @abstractmethod
+    def username_exists(self, username):
+        pass
+
+    @abstractmethod
+    def email_exists(self, email):
+        pass
+
+    @abstractmethod
+    def get_by_username(self, username):
+        pass
+
+    @abstractmethod
+    def update_password(self, user_id, password_hash):
+        pass
+
+    @abstractmethod
+    def count_by_type(self):
+        pass
+
+
+class PhotographerRepository(Repository):
+    @abstractmethod
+    def next_id(self):
+        pass
+
+    @abstractmethod
+    def __setitem__(self, photographer_id, photographer):
+        pass
+
+    @abstractmethod
+    def __delitem__(self, photographer_id):
+        pass
+
+    @abstractmethod
+    def put_many(self, items):
+        """Store (id, photographer) pairs as one batch."""
+
+    def next_ids(self, count):
+        return [self.next_id() for _ in range(count)]
+
+
+class BookingRepository(Repository):
+    @abstractmethod
+    def next_id(self):
+        pass
+
+    @abstractmethod
+    def add(self, booking_id, booking):
+        pass
+
+    @abstractmethod
+    def set_status(self, booking_id, status):
+        pass
+
+    @abstractmethod
+    def delete(self, booking_id):
+        pass
+
+    # for_user/for_photographer return bookings in (date, time, id) order;
+    # after is such a tuple and resumes just past it, limit caps the page
+
+    @abstractmethod
+    def for_user(self, user_id, extra=None, after=None, limit=None):
+        pass
+
+    @abstractmethod
+    def for_photographer(self, photographer_id, extra=None, after=None, limit=None):
+        pass
+
+    @abstractmethod
+    def scan(self, after_id=None, batch_size=500, photographer_id=None, start_date=None, end_date=None):
+        """Yield (id, booking) in id order, fetching batch_size at a time.
+
+        photographer_id and the inclusive YYYY-MM-DD date bounds narrow the
+        bookings returned.
+        """
+
+    @abstractmethod
+    def count_by_status(self):
+        pass
+
+    @abstractmethod
+    def count_by_photographer(self):
+        pass
+
+
+class CredentialRepository(Repository):
+    # username -> {'password', 'user_type', ['photographer_id']}
+
+    @abstractmethod
+    def __setitem__(self, username, info):
+        pass
+
+    @abstractmethod
+    def pop(self, username, default=None):
+        pass
+
+    @abstractmethod
+    def find_by_photographer(self, photographer_id):
+        pass
+
+    @abstractmethod
+    def put_many(self, items):
+        """Store (username, info) pairs as one batch."""
+
+
+class PhotographerStore(CopyOnWriteDict, PhotographerRepository):
+    def __init__(self, initial=None):
+        CopyOnWriteDict.__init__(self, initial)
+        self._ids = IdAllocator.after(self.keys())
+
+    def next_id(self):
+        return self._ids.next()
+
+    def restart_ids(self):
+        # continue numbering after the highest stored id
+        self._ids = IdAllocator.after(self.keys())
+
+    def put_many(self, items):
+        self.update(items)
+
+    def dump(self):
+        return dict(self.snapshot())
+
+    def load(self, items):
+        # replaces the contents with a dump()
+        with self.mutate() as data:
+            data.clear()
+            data.update(items)
+        self.restart_ids()
+
+
+class CredentialStore(CopyOnWriteDict, CredentialRepository):
+    def put_many(self, items):
+        self.update(items)
+
+    def dump(self):
+        return dict(self.snapshot())
+
+    def load(self, items):
+        with self.mutate() as data:
+            data.clear()
+            data.update(items)
+
+    def find_by_photographer(self, photographer_id):
+        for username, info in self.items():
+            if info.get('photographer_id') == photographer_id:
+                return username, info
+        return None, None
+
+
+Repositories = namedtuple('Repositories', [
+    'users', 'photographers', 'bookings', 'photographer_users', 'admin_users'
+])
+
+
+def create_repositories(config, photographers, photographer_users, admin_users):
+    # the seed data is only written into a backend that does not have any yet
+    backend = config.get('STORAGE_BACKEND', 'memory')
+
+    if backend == 'memory':
+        from user_store import UserStore
+        from booking_store import BookingStore
+        stores = Repositories(
+            users=UserStore(),
+            photographers=PhotographerStore(photographers),
+            bookings=BookingStore(),
+            photographer_users=CredentialStore(photographer_users),
+            admin_users=CredentialStore(admin_users)
+        )
+        if config.get('JOURNAL_DIR'):
+            # a snapshot, once there is one, replaces the seed data
+            from journal import open_journaled
+            return open_journaled(config, stores)
+        return stores
+
+    if backend == 'sqlite':
+        from sqlite_store import open_sqlite_repositories
+        return open_sqlite_repositories(config, photographers, photographer_users, admin_users)
+
+    raise ValueError(f'unknown STORAGE_BACKEND {backend!r}')
+
+
+def open_change_feed(config, stores):
+    # -> a feed of the writes other processes make to a backend they share,
+    # or None when each process has stores of its own
+    if config.get('STORAGE_BACKEND', 'memory') == 'sqlite':
+        from sqlite_store import SQLiteChangeFeed
+        return SQLiteChangeFeed(stores.bookings.pool)
+    return None
@@ -0,0 +1,117 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+
+from flask import Response, make_response, request, session
+
+
+CacheEntry = namedtuple('CacheEntry', ['body', 'etag', 'mimetype', 'versions'])
+
+
+class ResponseCache:
+    # rendered pages keyed by (endpoint, view args, query, user type). Each
+    # entry remembers the version of every data set it was rendered from; a
+    # write bumps the version and the stale entry is dropped on its next
+    # lookup. Total body size is capped and the least recently used pages go
+    # first
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def bump(self, *names):
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def versions(self, names):
+        return tuple(self._versions.get(name, 0) for name in names)
+
+    def get(self, key, depends_on):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.versions != self.versions(depends_on):
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, depends_on, body, mimetype, versions=None):
+        etag = hashlib.sha256(body).hexdigest()
+        entry = CacheEntry(body, etag, mimetype,
+                           self.versions(depends_on) if versions is None else versions)
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+        return entry
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._size -= len(entry.body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self._size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+def _respond(entry):
+    response = Response(entry.body, mimetype=entry.mimetype)
+    response.set_etag(entry.etag)
+    # pages sit behind a login, so only the browser may keep them and it
+    # has to revalidate every time; the strong ETag turns that into a 304
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+
+def cached_view(cache, *depends_on):
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or 'user_id' not in session:
+                return view(*args, **kwargs)
+
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True))),
+                session.get('user_type')
+            )
+            entry = cache.get(key, depends_on)
+            if entry is None:
+                # read the versions before rendering so a write that lands
+                # mid-render leaves the entry stale rather than wrongly fresh
+                versions = cache.versions(depends_on)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                entry = cache.put(key, depends_on, response.get_data(), response.mimetype, versions)
+            return _respond(entry)
+        return wrapper
+    return decorator
@@ -0,0 +1,133 @@
+import bisect
+from datetime import date, timedelta
+
+from concurrency import StripedLock
+
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_time(value):
+    hours, minutes = value.split(':')[:2]
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f'invalid time {value!r}')
+    return hours * 60 + minutes
+
+
+def format_time(minute):
+    return f'{minute // 60:02d}:{minute % 60:02d}'
+
+
+class SlotConflict(Exception):
+    def __init__(self, booking_id):
+        super().__init__(f'slot overlaps booking {booking_id}')
+        self.booking_id = booking_id
+
+
+class SlotIndex:
+    # per-photographer, per-date sorted interval lists. Bookings on the same
+    # date never overlap, so the lists are ordered by both start and end and
+    # a conflict check only has to look at the neighbours of the bisect point
+
+    def __init__(self, slot_minutes=120):
+        self.slot_minutes = slot_minutes
+        self._days = {}
+        self._locks = StripedLock()
+
+    def fits_in_day(self, start):
+        # slots are kept, and checked for overlaps, per calendar day, so a
+        # slot that ran past midnight would never meet the next day's
+        return start + self.slot_minutes <= MINUTES_PER_DAY
+
+    def _conflict(self, intervals, start, end):
+        pos = bisect.bisect_left(intervals, (start,))
+        if pos > 0 and intervals[pos - 1][1] > start:
+            return intervals[pos - 1][2]
+        if pos < len(intervals) and intervals[pos][0] < end:
+            return intervals[pos][2]
+        return None
+
+    def is_free(self, photographer_id, day, start):
+        intervals = self._taken(photographer_id, day, day).get(day, [])
+        return self._conflict(intervals, start, start + self.slot_minutes) is None
+
+    def _taken(self, photographer_id, start_key, end_key):
+        # -> {'YYYY-MM-DD': sorted (start, end, booking id) list} for the
+        # days in the range that have bookings
+        taken = {}
+        day = parse_day(start_key)
+        while day.isoformat() <= end_key:
+            key = day.isoformat()
+            with self._locks.for_key((photographer_id, key)):
+                intervals = self._days.get((photographer_id, key))
+                if intervals:
+                    taken[key] = list(intervals)
+            day += timedelta(days=1)
+        return taken
+
+    def reserve(self, photographer_id, day, start, booking_id):
+        end = start + self.slot_minutes
+        with self._locks.for_key((photographer_id, day)):
+            intervals = self._days.setdefault((photographer_id, day), [])
+            conflict = self._conflict(intervals, start, end)
+            if conflict is not None:
+                raise SlotConflict(conflict)
+            bisect.insort(intervals, (start, end, booking_id))
+
+    def release(self, photographer_id, day, booking_id):
+        with self._locks.for_key((photographer_id, day)):
+            intervals = self._days.get((photographer_id, day))
+            if not intervals:
+                return False
+            for pos, interval in enumerate(intervals):
+                if interval[2] == booking_id:
+                    del intervals[pos]
+                    if not intervals:
+                        del self._days[(photographer_id, day)]
+                    return True
+        return False
+
+    def free_slots(self, photographer_id, start_day, end_day, day_start, day_end, weekdays=None):
+        # candidate starts are laid out back to back from day_start; a start is
+        # offered when a full slot fits before day_end without overlapping
+        taken = self._taken(photographer_id, start_day.isoformat(), end_day.isoformat())
+        slots = {}
+        day = start_day
+        while day <= end_day:
+            if weekdays is None or day.strftime('%A') in weekdays:
+                key = day.isoformat()
+                intervals = taken.get(key, ())
+                free = []
+                start = day_start
+                while start + self.slot_minutes <= day_end:
+                    if self._conflict(intervals, start, start + self.slot_minutes) is None:
+                        free.append(format_time(start))
+                    start += self.slot_minutes
+                slots[key] = free
+            day += timedelta(days=1)
+        return slots
+
+
+class StoreSlotIndex(SlotIndex):
+    # for a store shared between worker processes: the store is the only
+    # place that sees every worker's bookings, and its add() refuses an
+    # overlapping booking atomically. reserve/release keep nothing in this
+    # process and lookups ask the store's taken_slots()
+
+    def __init__(self, bookings, slot_minutes=120):
+        super().__init__(slot_minutes)
+        self.bookings = bookings
+
+    def _taken(self, photographer_id, start_key, end_key):
+        return self.bookings.taken_slots(photographer_id, start_key, end_key)
+
+    def reserve(self, photographer_id, day, start, booking_id):
+        pass
+
+    def release(self, photographer_id, day, booking_id):
+        return False
+
+
+def parse_day(value):
+    return date.fromisoformat(value)
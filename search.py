@@ -0,0 +1,345 @@
+import heapq
+import math
+import re
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+
+TOKEN = re.compile(r'[^\W_]+')
+
+STOPWORDS = frozenset(
+    'a about all an and are as at be been but by can for from has have he her his i in into is it its me '
+    'my no not of on or our she so than that the their them there they this to was we were what when '
+    'which who will with you your'.split()
+)
+
+# name matches outrank the same word in a bio
+FIELD_WEIGHTS = {'name': 3.0, 'specialization': 2.0, 'skills': 2.0, 'bio': 1.0}
+
+_VOWEL = re.compile('[aeiouy]')
+
+
+def words(text):
+    # lower-cased words of text without stopwords, in order
+    return [word for word in TOKEN.findall(text.lower()) if word not in STOPWORDS]
+
+
+@lru_cache(maxsize=65536)
+def stem(word):
+    # a light suffix stripper (plurals, -ing, -ed, -ly) rather than a full
+    # Porter stemmer: enough to make "weddings", "wedding" and "wed" meet.
+    # Profiles reuse a small vocabulary, so results are memoised
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith('sses'):
+        word = word[:-2]
+    elif word.endswith('ies'):
+        word = word[:-3] + 'y'
+    elif word.endswith(('xes', 'ches', 'shes')):
+        word = word[:-2]
+    elif word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        word = word[:-1]
+    for suffix in ('ing', 'ed'):
+        base = word[:-len(suffix)]
+        if word.endswith(suffix) and len(base) >= 3 and _VOWEL.search(base):
+            if base[-1] == base[-2] and base[-1] not in 'lsz':
+                base = base[:-1]
+            word = base
+            break
+    if word.endswith('ly') and len(word) > 5:
+        word = word[:-2]
+    return word
+
+
+def tokenize(text):
+    return [stem(word) for word in words(text)]
+
+
+def _field_text(value):
+    if isinstance(value, (list, tuple)):
+        return ' '.join(str(v) for v in value)
+    return str(value or '')
+
+
+class _Node:
+    __slots__ = ('children', 'weight', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.weight = 0
+        self.top = ()
+
+
+class PrefixTrie:
+    # words with a weight; every node caches the `size` heaviest words below
+    # it, so a completion is a walk down the prefix plus a slice. A weight
+    # change re-ranks only the nodes on that word's path
+
+    def __init__(self, size=10):
+        self.size = size
+        self._root = _Node()
+
+    def set(self, word, weight):
+        self.set_many([(word, weight)])
+
+    def set_many(self, items):
+        # weight 0 removes a word. Every node on a changed path is re-ranked
+        # once, deepest first, so a bulk load costs one pass over the trie
+        touched = {}
+        for word, weight in items:
+            node = self._root
+            path = [node]
+            for char in word:
+                child = node.children.get(char)
+                if child is None:
+                    if weight <= 0:
+                        break
+                    child = node.children[char] = _Node()
+                node = child
+                path.append(node)
+            else:
+                node.weight = max(weight, 0)
+                for depth, node in enumerate(path):
+                    touched[id(node)] = (depth, word[:depth], node, path[depth - 1] if depth else None)
+        for depth, prefix, node, parent in sorted(touched.values(), key=lambda entry: -entry[0]):
+            if parent is not None and not node.weight and not node.children:
+                del parent.children[prefix[-1]]
+                continue
+            candidates = [entry for child in node.children.values() for entry in child.top]
+            if node.weight:
+                candidates.append((-node.weight, prefix))
+            node.top = tuple(heapq.nsmallest(self.size, candidates))
+
+    def complete(self, prefix, limit=None):
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return [word for _, word in node.top[:limit]]
+
+
+class SearchIndex:
+    # BM25 over the photographers' name, specialization, skills and bio,
+    # with per-field weights folded into the term frequencies (BM25F-style).
+    # Each posting holds the document's precomputed BM25 term weight, so a
+    # query never recomputes length normalisation; the weights are rebuilt
+    # only when the average document length drifts by more than 10%. For
+    # scoring, every document has a dense slot and each term's postings are
+    # cached as NumPy (slot, weight) arrays, so a query is one vectorised
+    # add per term plus a partial sort for the top k. Surface words feed a
+    # PrefixTrie, weighted by how many profiles use them, for autocomplete
+
+    def __init__(self, weights=None, k1=1.2, b=0.75):
+        self.weights = dict(weights or FIELD_WEIGHTS)
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._arrays = {}
+        self._docs = {}
+        self._slots = {}
+        self._free_slots = []
+        self._slot_ids = np.zeros(64, dtype=np.int64)
+        self._slot_count = 0
+        self._total_length = 0.0
+        self._avgdl = None
+        self._word_counts = {}
+        self._changed_words = set()
+        self.trie = PrefixTrie()
+
+    @classmethod
+    def build(cls, photographers):
+        index = cls()
+        index.add_many(photographers.items())
+        return index
+
+    # -- writes --------------------------------------------------------------
+
+    def add(self, photographer_id, photographer):
+        with self._lock:
+            self._add(photographer_id, photographer)
+            self._commit()
+
+    update = add
+
+    def add_many(self, items):
+        with self._lock:
+            for photographer_id, photographer in items:
+                self._add(photographer_id, photographer)
+            self._commit()
+
+    def remove(self, photographer_id):
+        with self._lock:
+            self._remove(photographer_id)
+            self._commit()
+
+    def _add(self, photographer_id, photographer):
+        # caller holds the lock
+        self._remove(photographer_id)
+        frequencies = {}
+        length = 0.0
+        surface = set()
+        for field, weight in self.weights.items():
+            field_words = words(_field_text(photographer.get(field)))
+            surface.update(word for word in field_words if len(word) > 1)
+            length += weight * len(field_words)
+            for word in field_words:
+                term = stem(word)
+                frequencies[term] = frequencies.get(term, 0.0) + weight
+        self._docs[photographer_id] = (length, frequencies, surface)
+        self._total_length += length
+        self._assign_slot(photographer_id)
+        for term, frequency in frequencies.items():
+            postings = self._postings.setdefault(term, {})
+            postings[photographer_id] = self._impact(frequency, length) if self._avgdl else 0.0
+            self._arrays.pop(term, None)
+        for word in surface:
+            self._word_counts[word] = self._word_counts.get(word, 0) + 1
+        self._changed_words.update(surface)
+
+    def _remove(self, photographer_id):
+        entry = self._docs.pop(photographer_id, None)
+        if entry is None:
+            return
+        length, frequencies, surface = entry
+        self._total_length -= length
+        for term in frequencies:
+            postings = self._postings[term]
+            del postings[photographer_id]
+            if not postings:
+                del self._postings[term]
+            self._arrays.pop(term, None)
+        self._free_slots.append(self._slots.pop(photographer_id))
+        for word in surface:
+            count = self._word_counts[word] - 1
+            if count:
+                self._word_counts[word] = count
+            else:
+                del self._word_counts[word]
+        self._changed_words.update(surface)
+
+    def _commit(self):
+        self.trie.set_many((word, self._word_counts.get(word, 0)) for word in self._changed_words)
+        self._changed_words = set()
+        self._renormalise()
+
+    def _assign_slot(self, photographer_id):
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = self._slot_count
+            self._slot_count += 1
+            if slot == len(self._slot_ids):
+                self._slot_ids = np.concatenate((self._slot_ids, np.zeros(len(self._slot_ids), np.int64)))
+        self._slots[photographer_id] = slot
+        self._slot_ids[slot] = photographer_id
+
+    def _impact(self, frequency, length):
+        k1 = self.k1
+        return frequency * (k1 + 1) / (frequency + k1 * (1 - self.b + self.b * length / self._avgdl))
+
+    def _renormalise(self):
+        if not self._docs:
+            self._avgdl = None
+            return
+        avgdl = max(self._total_length / len(self._docs), 1.0)
+        if self._avgdl is not None and abs(avgdl - self._avgdl) <= 0.1 * self._avgdl:
+            return
+        self._avgdl = avgdl
+        for term, postings in self._postings.items():
+            for photographer_id in postings:
+                length, frequencies, _ = self._docs[photographer_id]
+                postings[photographer_id] = self._impact(frequencies[term], length)
+        self._arrays.clear()
+
+    # -- queries -------------------------------------------------------------
+
+    def _arrays_for(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            postings = self._postings[term]
+            slots = np.fromiter((self._slots[pid] for pid in postings), dtype=np.int64, count=len(postings))
+            weights = np.fromiter(postings.values(), dtype=np.float64, count=len(postings))
+            arrays = self._arrays[term] = (slots, weights)
+        return arrays
+
+    def _top(self, scores, hits, count):
+        # the count best of hits (slots), by score then photographer id;
+        # every slot tied with the last one is kept until the final sort so
+        # the order does not depend on how argpartition breaks ties
+        if len(hits) > count:
+            values = scores[hits]
+            cutoff = np.partition(values, len(values) - count)[len(values) - count]
+            hits = hits[values >= cutoff]
+        order = np.lexsort((self._slot_ids[hits], -scores[hits]))
+        return hits[order][:count]
+
+    def warm(self):
+        # builds every term's arrays now rather than on the first query that
+        # needs them
+        with self._lock:
+            for term in self._postings:
+                self._arrays_for(term)
+
+    def search(self, query, candidates=None, limit=24, offset=0):
+        # -> [(photographer_id, score)] best first; candidates restricts the
+        # result to a set of ids (the catalog filters)
+        terms = list(dict.fromkeys(tokenize(query)))
+        k = offset + limit
+        with self._lock:
+            n = len(self._docs)
+            lists = []
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings:
+                    idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                    lists.append((term, idf, postings))
+            if not lists or k <= 0:
+                return []
+
+            if candidates is not None and len(candidates) <= 4 * k + 256:
+                # a narrow filter: scoring the few candidates directly beats
+                # scoring every profile that has one of the words
+                scored = []
+                for photographer_id in candidates:
+                    score = sum(idf * postings.get(photographer_id, 0.0) for _, idf, postings in lists)
+                    if score > 0:
+                        scored.append((-score, photographer_id))
+                return [(pid, -score) for score, pid in heapq.nsmallest(k, scored)][offset:]
+
+            scores = np.zeros(self._slot_count)
+            for term, idf, _ in lists:
+                slots, weights = self._arrays_for(term)
+                scores[slots] += idf * weights
+            hits = np.flatnonzero(scores)
+            if candidates is None:
+                best = self._top(scores, hits, k)
+            else:
+                # widen the window until enough of the best hits pass the filter
+                window = 4 * k
+                while True:
+                    top = self._top(scores, hits, window)
+                    best = [slot for slot in top if int(self._slot_ids[slot]) in candidates][:k]
+                    if len(best) == k or window >= len(hits):
+                        break
+                    window *= 4
+            return [(int(self._slot_ids[slot]), float(scores[slot])) for slot in best][offset:]
+
+    def suggest(self, query, limit=8):
+        # completes the last word of query from the words in the index;
+        # nothing once the query ends in a space
+        if not query or query[-1].isspace():
+            return []
+        head = TOKEN.findall(query.lower())
+        if not head:
+            return []
+        prefix = head.pop()
+        with self._lock:
+            completions = self.trie.complete(prefix, limit)
+        return [' '.join(head + [word]) for word in completions]
+
+    def __len__(self):
+        return len(self._docs)
@@ -0,0 +1,314 @@
+import os
+import secrets
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from sqlite_store import ConnectionPool
+
+
+SESSION_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sessions (
+    sid TEXT PRIMARY KEY,
+    owner TEXT,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_by_owner ON sessions(owner);
+CREATE INDEX IF NOT EXISTS sessions_by_expiry ON sessions(expires_at);
+'''
+
+
+class SessionStore(ABC):
+    # server-side session records keyed by an opaque id. owner is whatever
+    # the app uses to find every session of one account (e.g.
+    # 'customer:42'); expires_at is a time.time() timestamp
+
+    @abstractmethod
+    def load(self, sid, now):
+        """Return (data, owner, expires_at) for a live session, else None."""
+
+    @abstractmethod
+    def save(self, sid, data, owner, expires_at):
+        pass
+
+    @abstractmethod
+    def touch(self, sid, expires_at):
+        pass
+
+    @abstractmethod
+    def delete(self, sid):
+        pass
+
+    @abstractmethod
+    def delete_owner(self, owner):
+        """Drop every session of owner and return how many there were."""
+
+    @abstractmethod
+    def sweep(self, now):
+        """Drop expired sessions and return how many were removed."""
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    # per-process LRU; the least recently used session is dropped once
+    # max_entries is reached
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._by_owner = {}
+        self._lock = threading.Lock()
+
+    def _unlink(self, sid, entry):
+        owner = entry[1]
+        if owner is not None:
+            sids = self._by_owner.get(owner)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del self._by_owner[owner]
+
+    def load(self, sid, now):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            if entry[2] <= now:
+                del self._entries[sid]
+                self._unlink(sid, entry)
+                return None
+            self._entries.move_to_end(sid)
+            return dict(entry[0]), entry[1], entry[2]
+
+    def save(self, sid, data, owner, expires_at):
+        with self._lock:
+            old = self._entries.pop(sid, None)
+            if old is not None:
+                self._unlink(sid, old)
+            self._entries[sid] = (dict(data), owner, expires_at)
+            if owner is not None:
+                self._by_owner.setdefault(owner, set()).add(sid)
+            while len(self._entries) > self.max_entries:
+                evicted_sid, evicted = self._entries.popitem(last=False)
+                self._unlink(evicted_sid, evicted)
+
+    def touch(self, sid, expires_at):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is not None:
+                self._entries[sid] = (entry[0], entry[1], expires_at)
+
+    def delete(self, sid):
+        with self._lock:
+            entry = self._entries.pop(sid, None)
+            if entry is not None:
+                self._unlink(sid, entry)
+
+    def delete_owner(self, owner):
+        with self._lock:
+            sids = self._by_owner.pop(owner, set())
+            for sid in sids:
+                self._entries.pop(sid, None)
+            return len(sids)
+
+    def sweep(self, now):
+        with self._lock:
+            expired = [sid for sid, entry in self._entries.items() if entry[2] <= now]
+            for sid in expired:
+                self._unlink(sid, self._entries.pop(sid))
+            return len(expired)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteSessionStore(SessionStore):
+    # shared by every worker process using the same database file
+
+    def __init__(self, pool, serializer=None):
+        self.pool = pool
+        self.serializer = serializer or TaggedJSONSerializer()
+        self.pool.connection().executescript(SESSION_SCHEMA)
+
+    @classmethod
+    def open(cls, path):
+        return cls(ConnectionPool(path))
+
+    def load(self, sid, now):
+        row = self.pool.connection().execute(
+            'SELECT data, owner, expires_at FROM sessions WHERE sid = ? AND expires_at > ?', (sid, now)
+        ).fetchone()
+        if row is None:
+            return None
+        return self.serializer.loads(row['data']), row['owner'], row['expires_at']
+
+    def save(self, sid, data, owner, expires_at):
+        self.pool.connection().execute(
+            'INSERT INTO sessions (sid, owner, data, expires_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(sid) DO UPDATE SET owner = excluded.owner, data = excluded.data, '
+            'expires_at = excluded.expires_at',
+            (sid, owner, self.serializer.dumps(dict(data)), expires_at)
+        )
+
+    def touch(self, sid, expires_at):
+        self.pool.connection().execute('UPDATE sessions SET expires_at = ? WHERE sid = ?', (expires_at, sid))
+
+    def delete(self, sid):
+        self.pool.connection().execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def delete_owner(self, owner):
+        return self.pool.connection().execute('DELETE FROM sessions WHERE owner = ?', (owner,)).rowcount
+
+    def sweep(self, now):
+        return self.pool.connection().execute('DELETE FROM sessions WHERE expires_at <= ?', (now,)).rowcount
+
+    def __len__(self):
+        return self.pool.connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, owner=None, expires_at=None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.loaded_owner = owner
+        self.expires_at = expires_at
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+class ServerSessionInterface(SessionInterface):
+    # keeps session data on the server and puts only a random id in the
+    # cookie, so there is nothing to sign or verify per request and a
+    # session can be revoked by deleting its record. The id is replaced
+    # whenever the owner changes (login, logout, switching accounts) so a
+    # pre-login id can never be carried into an authenticated session
+
+    def __init__(self, store, ttl=86400, owner_of=None, sweep_interval=60.0, clock=time.time):
+        self.store = store
+        self.ttl = ttl
+        self.owner_of = owner_of or (lambda data: None)
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._sweeper = None
+        self._sweeper_pid = None
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.swept = 0
+
+    def _ensure_sweeper(self):
+        if self._sweeper is not None and self._sweeper_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._sweeper is None or self._sweeper_pid != os.getpid():
+                self._sweeper = threading.Thread(target=self._sweep_loop, name='session-sweeper', daemon=True)
+                self._sweeper_pid = os.getpid()
+                self._sweeper.start()
+
+    def _sweep_loop(self):
+        while not self._stopping.wait(self.sweep_interval):
+            try:
+                self.swept += self.store.sweep(self.clock())
+            except Exception as e:
+                print(f'Session sweep failed: {e}')
+
+    def open_session(self, app, request):
+        if self.sweep_interval:
+            self._ensure_sweeper()
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            record = self.store.load(sid, self.clock())
+            if record is not None:
+                data, owner, expires_at = record
+                return ServerSession(data, sid=sid, owner=owner, expires_at=expires_at)
+        return ServerSession()
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if not session:
+            if session.sid is not None and session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        now = self.clock()
+        expires_at = now + self.ttl
+        if session.modified or session.new:
+            owner = self.owner_of(session)
+            sid = session.sid
+            if sid is None or owner != session.loaded_owner:
+                if sid is not None:
+                    self.store.delete(sid)
+                sid = secrets.token_urlsafe(32)
+            self.store.save(sid, session, owner, expires_at)
+        elif session.expires_at - now < self.ttl / 2:
+            # sliding expiry without a write on every request
+            sid = session.sid
+            self.store.touch(sid, expires_at)
+        else:
+            return
+
+        response.set_cookie(
+            name, sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app)
+        )
+
+    def revoke(self, owner):
+        return self.store.delete_owner(owner)
+
+    def shutdown(self):
+        self._stopping.set()
+
+
+def create_session_interface(config, owner_of=None):
+    backend = config.get('SESSION_BACKEND', 'memory')
+    if backend == 'memory':
+        store = MemorySessionStore(config.get('SESSION_MAX_ENTRIES', 100000))
+    elif backend == 'sqlite':
+        store = SQLiteSessionStore.open(config.get('SESSION_SQLITE_PATH') or config['SQLITE_PATH'])
+    else:
+        raise ValueError(f'unknown SESSION_BACKEND {backend!r}')
+    return ServerSessionInterface(
+        store,
+        ttl=config.get('SESSION_TTL', 86400),
+        owner_of=owner_of,
+        sweep_interval=config.get('SESSION_SWEEP_INTERVAL', 60.0)
+    )
@@ -0,0 +1,686 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from types import MappingProxyType
+
+from repository import (
+    Repositories, UserRepository, PhotographerRepository, BookingRepository,
+    CredentialRepository
+)
+from scheduling import SlotConflict, parse_time
+from user_store import DuplicateUserError, normalize_email
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    email TEXT NOT NULL,
+    email_norm TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    user_type TEXT NOT NULL,
+    created_at TEXT
+);
+CREATE TABLE IF NOT EXISTS photographers (
+    id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bookings (
+    id INTEGER PRIMARY KEY,
+    user_id NOT NULL,
+    photographer_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    start_minute INTEGER NOT NULL,
+    end_minute INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bookings_by_user ON bookings (user_id, date, time, id);
+CREATE INDEX IF NOT EXISTS bookings_by_photographer ON bookings (photographer_id, date, time, id);
+CREATE INDEX IF NOT EXISTS bookings_by_slot ON bookings (photographer_id, date, start_minute);
+CREATE TABLE IF NOT EXISTS credentials (
+    realm TEXT NOT NULL,
+    username TEXT NOT NULL,
+    photographer_id INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (realm, username)
+);
+CREATE INDEX IF NOT EXISTS credentials_by_photographer ON credentials (realm, photographer_id);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT NOT NULL,
+    key NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (name, key)
+);
+CREATE TRIGGER IF NOT EXISTS users_counted_insert AFTER INSERT ON users BEGIN
+    INSERT INTO counters (name, key, value) VALUES ('users_by_type', NEW.user_type, 1)
+        ON CONFLICT (name, key) DO UPDATE SET value = value + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS users_counted_delete AFTER DELETE ON users BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = 'users_by_type' AND key = OLD.user_type;
+END;
+CREATE TRIGGER IF NOT EXISTS bookings_counted_insert AFTER INSERT ON bookings BEGIN
+    INSERT INTO counters (name, key, value) VALUES ('bookings_by_status', NEW.status, 1)
+        ON CONFLICT (name, key) DO UPDATE SET value = value + 1;
+    INSERT INTO counters (name, key, value) VALUES ('bookings_by_photographer', NEW.photographer_id, 1)
+        ON CONFLICT (name, key) DO UPDATE SET value = value + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS bookings_counted_status AFTER UPDATE OF status ON bookings
+WHEN OLD.status IS NOT NEW.status BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = 'bookings_by_status' AND key = OLD.status;
+    INSERT INTO counters (name, key, value) VALUES ('bookings_by_status', NEW.status, 1)
+        ON CONFLICT (name, key) DO UPDATE SET value = value + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS bookings_counted_delete AFTER DELETE ON bookings BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = 'bookings_by_status' AND key = OLD.status;
+    UPDATE counters SET value = value - 1 WHERE name = 'bookings_by_photographer' AND key = OLD.photographer_id;
+END;
+'''
+
+# one live booking per photographer, day and start time, enforced by the
+# database for every worker process
+UNIQUE_SLOTS = '''
+CREATE UNIQUE INDEX IF NOT EXISTS bookings_unique_slot ON bookings (photographer_id, date, start_minute)
+    WHERE status NOT IN ('Cancelled', 'Rejected')
+'''
+
+REBUILD_COUNTERS = '''
+DELETE FROM counters;
+INSERT INTO counters (name, key, value)
+    SELECT 'users_by_type', user_type, COUNT(*) FROM users GROUP BY user_type;
+INSERT INTO counters (name, key, value)
+    SELECT 'bookings_by_status', status, COUNT(*) FROM bookings GROUP BY status;
+INSERT INTO counters (name, key, value)
+    SELECT 'bookings_by_photographer', photographer_id, COUNT(*) FROM bookings GROUP BY photographer_id;
+'''
+
+# statuses that no longer hold a slot
+RELEASED_STATUSES = ('Cancelled', 'Rejected')
+
+# the change log keeps about this many of the latest writes; a process that
+# falls further behind rebuilds its indexes from the tables instead
+CHANGE_LOG_KEEP = 100000
+CHANGE_LOG_TRIM_EVERY = 1024
+
+
+class ConnectionPool:
+    # one connection per thread, opened lazily and reopened after a fork.
+    # Statements are plain constants so sqlite3's per-connection statement
+    # cache keeps them prepared across requests
+
+    def __init__(self, path, busy_timeout_ms=5000, cached_statements=256):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self.origin = _new_origin()
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self):
+        if os.getpid() != self._pid:
+            # connections must never cross a fork; drop the inherited ones
+            self._local = threading.local()
+            self._connections = []
+            self._lock = threading.Lock()
+            self._pid = os.getpid()
+            self.origin = _new_origin()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    def transaction(self):
+        return _Transaction(self.connection())
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+
+class _Transaction:
+    # BEGIN IMMEDIATE takes the write lock up front so a read-check-write
+    # sequence cannot be interleaved with another process' write
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def _new_origin():
+    # tags this process' entries in the change log; pids are reused, so a
+    # random suffix keeps a new worker from skipping a dead one's writes
+    return f'{os.getpid()}-{os.urandom(4).hex()}'
+
+
+def log_changes(pool, conn, kind, keys):
+    # records writes in the change log inside the caller's transaction, so
+    # the log and the tables never disagree
+    keys = list(keys)
+    if not keys:
+        return
+    conn.executemany(
+        'INSERT INTO changes (origin, kind, key) VALUES (?, ?, ?)',
+        [(pool.origin, kind, key) for key in keys]
+    )
+    last = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    if last // CHANGE_LOG_TRIM_EVERY != (last - len(keys)) // CHANGE_LOG_TRIM_EVERY:
+        conn.execute('DELETE FROM changes WHERE seq <= ?', (last - CHANGE_LOG_KEEP,))
+
+
+class SQLiteChangeFeed:
+    # the writes other processes made since this one last looked, read back
+    # from the change log so each worker can keep the indexes and caches it
+    # builds in memory in step with the shared tables
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.last_seq = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def pinned(self):
+        # one read transaction: whatever the caller reads from the stores
+        # on this thread matches the log position recorded here
+        conn = self.pool.connection()
+        conn.execute('BEGIN')
+        try:
+            self.last_seq = conn.execute('SELECT COALESCE(MAX(seq), 0) FROM changes').fetchone()[0]
+            yield
+        finally:
+            conn.execute('COMMIT')
+
+    @contextmanager
+    def poll(self):
+        """Yield the (kind, key) writes of other processes since the last poll.
+
+        Yields None when the log has been trimmed past this process'
+        position and everything has to be rebuilt; the caller must do so
+        inside pinned(). Polls are serialized so changes are applied once
+        and in order.
+        """
+        with self._lock:
+            rows = self.pool.connection().execute(
+                'SELECT seq, origin, kind, key FROM changes WHERE seq > ? ORDER BY seq', (self.last_seq,)
+            ).fetchall()
+            if not rows:
+                yield []
+                return
+            if rows[0]['seq'] != self.last_seq + 1 and self._trimmed():
+                yield None
+                return
+            origin = self.pool.origin
+            yield [(row['kind'], row['key']) for row in rows if row['origin'] != origin]
+            self.last_seq = rows[-1]['seq']
+
+    def _trimmed(self):
+        first = self.pool.connection().execute('SELECT MIN(seq) FROM changes').fetchone()[0]
+        return first is None or first > self.last_seq + 1
+
+
+def read_counters(pool, name):
+    rows = pool.connection().execute(
+        'SELECT key, value FROM counters WHERE name = ? AND value != 0', (name,)
+    ).fetchall()
+    return {row['key']: row['value'] for row in rows}
+
+
+def next_sequence_value(pool, name, count=1):
+    # returns the last of count freshly reserved values
+    row = pool.connection().execute(
+        'UPDATE sequences SET value = value + ? WHERE name = ? RETURNING value', (count, name)
+    ).fetchone()
+    return row[0]
+
+
+class SQLiteUserStore(UserRepository):
+    def __init__(self, pool):
+        self.pool = pool
+
+    def _row_to_user(self, row):
+        return {
+            'username': row['username'],
+            'email': row['email'],
+            'password': row['password'],
+            'user_type': row['user_type'],
+            'created_at': row['created_at']
+        }
+
+    def next_id(self):
+        return next_sequence_value(self.pool, 'users')
+
+    def add(self, user_id, user):
+        try:
+            with self.pool.transaction() as conn:
+                conn.execute(
+                    'INSERT INTO users (id, username, email, email_norm, password, user_type, created_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (user_id, user['username'], user.get('email', ''),
+                     normalize_email(user.get('email', '')) or f'#{user_id}',
+                     user['password'], user['user_type'], user.get('created_at'))
+                )
+                log_changes(self.pool, conn, 'user', [user_id])
+        except sqlite3.IntegrityError as e:
+            raise DuplicateUserError('email' if 'email' in str(e) else 'username') from e
+        return user_id
+
+    def remove(self, user_id):
+        user = self.get(user_id)
+        if user is not None:
+            with self.pool.transaction() as conn:
+                conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
+                log_changes(self.pool, conn, 'user', [user_id])
+        return user
+
+    def update_password(self, user_id, password_hash):
+        cursor = self.pool.connection().execute(
+            'UPDATE users SET password = ? WHERE id = ?', (password_hash, user_id)
+        )
+        return cursor.rowcount > 0
+
+    def username_exists(self, username):
+        return self.pool.connection().execute(
+            'SELECT 1 FROM users WHERE username = ?', (username,)
+        ).fetchone() is not None
+
+    def email_exists(self, email):
+        return self.pool.connection().execute(
+            'SELECT 1 FROM users WHERE email_norm = ?', (normalize_email(email),)
+        ).fetchone() is not None
+
+    def get_by_username(self, username):
+        row = self.pool.connection().execute(
+            'SELECT * FROM users WHERE username = ?', (username,)
+        ).fetchone()
+        if row is None:
+            return None, None
+        return row['id'], self._row_to_user(row)
+
+    def count_by_type(self):
+        return read_counters(self.pool, 'users_by_type')
+
+    def get(self, user_id, default=None):
+        row = self.pool.connection().execute(
+            'SELECT * FROM users WHERE id = ?', (user_id,)
+        ).fetchone()
+        return self._row_to_user(row) if row is not None else default
+
+    def __contains__(self, user_id):
+        return self.pool.connection().execute(
+            'SELECT 1 FROM users WHERE id = ?', (user_id,)
+        ).fetchone() is not None
+
+    def __len__(self):
+        return self.pool.connection().execute('SELECT COUNT(*) FROM users').fetchone()[0]
+
+    def items(self):
+        rows = self.pool.connection().execute('SELECT * FROM users ORDER BY id').fetchall()
+        return [(row['id'], self._row_to_user(row)) for row in rows]
+
+
+class SQLitePhotographerStore(PhotographerRepository):
+    def __init__(self, pool):
+        self.pool = pool
+
+    def next_id(self):
+        return next_sequence_value(self.pool, 'photographers')
+
+    def next_ids(self, count):
+        last = next_sequence_value(self.pool, 'photographers', count)
+        return list(range(last - count + 1, last + 1))
+
+    def get(self, photographer_id, default=None):
+        row = self.pool.connection().execute(
+            'SELECT data FROM photographers WHERE id = ?', (photographer_id,)
+        ).fetchone()
+        return json.loads(row['data']) if row is not None else default
+
+    def __setitem__(self, photographer_id, photographer):
+        with self.pool.transaction() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO photographers (id, data) VALUES (?, ?)',
+                (photographer_id, json.dumps(photographer))
+            )
+            log_changes(self.pool, conn, 'photographer', [photographer_id])
+
+    def put_many(self, items):
+        items = list(items)
+        with self.pool.transaction() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO photographers (id, data) VALUES (?, ?)',
+                ((photographer_id, json.dumps(photographer)) for photographer_id, photographer in items)
+            )
+            log_changes(self.pool, conn, 'photographer', (photographer_id for photographer_id, _ in items))
+
+    def __delitem__(self, photographer_id):
+        with self.pool.transaction() as conn:
+            cursor = conn.execute('DELETE FROM photographers WHERE id = ?', (photographer_id,))
+            if cursor.rowcount == 0:
+                raise KeyError(photographer_id)
+            log_changes(self.pool, conn, 'photographer', [photographer_id])
+
+    def __contains__(self, photographer_id):
+        return self.pool.connection().execute(
+            'SELECT 1 FROM photographers WHERE id = ?', (photographer_id,)
+        ).fetchone() is not None
+
+    def __len__(self):
+        return self.pool.connection().execute('SELECT COUNT(*) FROM photographers').fetchone()[0]
+
+    def items(self):
+        rows = self.pool.connection().execute('SELECT id, data FROM photographers ORDER BY id').fetchall()
+        return [(row['id'], json.loads(row['data'])) for row in rows]
+
+
+class SQLiteBookingStore(BookingRepository):
+    def __init__(self, pool, slot_minutes):
+        self.pool = pool
+        self.slot_minutes = slot_minutes
+
+    def next_id(self):
+        return next_sequence_value(self.pool, 'bookings')
+
+    def add(self, booking_id, booking):
+        # the in-process SlotIndex cannot see other workers' bookings, so the
+        # overlap check is repeated here under the database write lock
+        start = parse_time(booking['time'])
+        end = start + self.slot_minutes
+        with self.pool.transaction() as conn:
+            row = conn.execute(
+                'SELECT id FROM bookings WHERE photographer_id = ? AND date = ? '
+                'AND start_minute < ? AND end_minute > ? '
+                'AND status NOT IN (?, ?) LIMIT 1',
+                (booking['photographer_id'], booking['date'], end, start) + RELEASED_STATUSES
+            ).fetchone()
+            if row is not None:
+                raise SlotConflict(row['id'])
+            try:
+                conn.execute(
+                    'INSERT INTO bookings (id, user_id, photographer_id, date, time, '
+                    'start_minute, end_minute, status, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (booking_id, booking['user_id'], booking['photographer_id'], booking['date'],
+                     booking['time'], start, end, booking['status'], json.dumps(booking))
+                )
+            except sqlite3.IntegrityError as e:
+                if 'bookings.id' in str(e):
+                    raise
+                raise SlotConflict(None) from e
+            log_changes(self.pool, conn, 'booking_added', [booking_id])
+        return booking_id
+
+    def set_status(self, booking_id, status):
+        with self.pool.transaction() as conn:
+            row = conn.execute('SELECT data FROM bookings WHERE id = ?', (booking_id,)).fetchone()
+            if row is None:
+                return None
+            booking = json.loads(row['data'])
+            booking['status'] = status
+            try:
+                conn.execute(
+                    'UPDATE bookings SET status = ?, data = ? WHERE id = ?',
+                    (status, json.dumps(booking), booking_id)
+                )
+            except sqlite3.IntegrityError as e:
+                # reinstating a cancelled booking whose slot was taken since
+                raise SlotConflict(None) from e
+            log_changes(self.pool, conn, 'booking_status', [booking_id])
+        return booking
+
+    def delete(self, booking_id):
+        with self.pool.transaction() as conn:
+            row = conn.execute('SELECT data FROM bookings WHERE id = ?', (booking_id,)).fetchone()
+            if row is None:
+                return None
+            conn.execute('DELETE FROM bookings WHERE id = ?', (booking_id,))
+            log_changes(self.pool, conn, 'booking_deleted', [booking_id])
+        return json.loads(row['data'])
+
+    def _views(self, column, key, extra, after, limit):
+        sql = f'SELECT id, data FROM bookings WHERE {column} = ?'
+        params = [key]
+        if after is not None:
+            sql += ' AND (date, time, id) > (?, ?, ?)'
+            params.extend(after)
+        sql += ' ORDER BY date, time, id'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        views = []
+        for row in self.pool.connection().execute(sql, params):
+            view = json.loads(row['data'])
+            view['id'] = row['id']
+            if extra is not None:
+                view.update(extra(view))
+            views.append(MappingProxyType(view))
+        return views
+
+    def for_user(self, user_id, extra=None, after=None, limit=None):
+        return self._views('user_id', user_id, extra, after, limit)
+
+    def for_photographer(self, photographer_id, extra=None, after=None, limit=None):
+        return self._views('photographer_id', photographer_id, extra, after, limit)
+
+    def scan(self, after_id=None, batch_size=500, photographer_id=None, start_date=None, end_date=None):
+        # keyset batches on the primary key: memory stays flat however large
+        # the table is and each batch is a short read transaction
+        sql = 'SELECT id, data FROM bookings WHERE id > ?'
+        filters = []
+        if photographer_id is not None:
+            sql += ' AND photographer_id = ?'
+            filters.append(photographer_id)
+        if start_date is not None:
+            sql += ' AND date >= ?'
+            filters.append(start_date)
+        if end_date is not None:
+            sql += ' AND date <= ?'
+            filters.append(end_date)
+        sql += ' ORDER BY id LIMIT ?'
+        last = after_id if after_id is not None else 0
+        while True:
+            rows = self.pool.connection().execute(sql, [last] + filters + [batch_size]).fetchall()
+            for row in rows:
+                yield row['id'], json.loads(row['data'])
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]['id']
+
+    def taken_slots(self, photographer_id, start_date, end_date):
+        # -> {date: [(start minute, end minute, id)]} of the live bookings
+        # between the inclusive YYYY-MM-DD bounds, each list in start order
+        rows = self.pool.connection().execute(
+            'SELECT date, start_minute, end_minute, id FROM bookings '
+            'WHERE photographer_id = ? AND date BETWEEN ? AND ? AND status NOT IN (?, ?) '
+            'ORDER BY date, start_minute',
+            (photographer_id, start_date, end_date) + RELEASED_STATUSES
+        ).fetchall()
+        taken = {}
+        for row in rows:
+            taken.setdefault(row['date'], []).append((row['start_minute'], row['end_minute'], row['id']))
+        return taken
+
+    def count_by_status(self):
+        return read_counters(self.pool, 'bookings_by_status')
+
+    def count_by_photographer(self):
+        return read_counters(self.pool, 'bookings_by_photographer')
+
+    def count_for_user(self, user_id):
+        return self.pool.connection().execute(
+            'SELECT COUNT(*) FROM bookings WHERE user_id = ?', (user_id,)
+        ).fetchone()[0]
+
+    def count_for_photographer(self, photographer_id):
+        return self.pool.connection().execute(
+            'SELECT COUNT(*) FROM bookings WHERE photographer_id = ?', (photographer_id,)
+        ).fetchone()[0]
+
+    def get(self, booking_id, default=None):
+        row = self.pool.connection().execute(
+            'SELECT data FROM bookings WHERE id = ?', (booking_id,)
+        ).fetchone()
+        return json.loads(row['data']) if row is not None else default
+
+    def __contains__(self, booking_id):
+        return self.pool.connection().execute(
+            'SELECT 1 FROM bookings WHERE id = ?', (booking_id,)
+        ).fetchone() is not None
+
+    def __len__(self):
+        return self.pool.connection().execute('SELECT COUNT(*) FROM bookings').fetchone()[0]
+
+    def items(self):
+        rows = self.pool.connection().execute('SELECT id, data FROM bookings ORDER BY id').fetchall()
+        return [(row['id'], json.loads(row['data'])) for row in rows]
+
+
+class SQLiteCredentialStore(CredentialRepository):
+    def __init__(self, pool, realm):
+        self.pool = pool
+        self.realm = realm
+
+    def get(self, username, default=None):
+        row = self.pool.connection().execute(
+            'SELECT data FROM credentials WHERE realm = ? AND username = ?', (self.realm, username)
+        ).fetchone()
+        return json.loads(row['data']) if row is not None else default
+
+    def __setitem__(self, username, info):
+        self.pool.connection().execute(
+            'INSERT OR REPLACE INTO credentials (realm, username, photographer_id, data) '
+            'VALUES (?, ?, ?, ?)',
+            (self.realm, username, info.get('photographer_id'), json.dumps(info))
+        )
+
+    def put_many(self, items):
+        with self.pool.transaction() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO credentials (realm, username, photographer_id, data) '
+                'VALUES (?, ?, ?, ?)',
+                ((self.realm, username, info.get('photographer_id'), json.dumps(info))
+                 for username, info in items)
+            )
+
+    def pop(self, username, default=None):
+        with self.pool.transaction() as conn:
+            row = conn.execute(
+                'SELECT data FROM credentials WHERE realm = ? AND username = ?', (self.realm, username)
+            ).fetchone()
+            if row is None:
+                return default
+            conn.execute(
+                'DELETE FROM credentials WHERE realm = ? AND username = ?', (self.realm, username)
+            )
+        return json.loads(row['data'])
+
+    def find_by_photographer(self, photographer_id):
+        row = self.pool.connection().execute(
+            'SELECT username, data FROM credentials WHERE realm = ? AND photographer_id = ? LIMIT 1',
+            (self.realm, photographer_id)
+        ).fetchone()
+        if row is None:
+            return None, None
+        return row['username'], json.loads(row['data'])
+
+    def __contains__(self, username):
+        return self.pool.connection().execute(
+            'SELECT 1 FROM credentials WHERE realm = ? AND username = ?', (self.realm, username)
+        ).fetchone() is not None
+
+    def __len__(self):
+        return self.pool.connection().execute(
+            'SELECT COUNT(*) FROM credentials WHERE realm = ?', (self.realm,)
+        ).fetchone()[0]
+
+    def items(self):
+        rows = self.pool.connection().execute(
+            'SELECT username, data FROM credentials WHERE realm = ? ORDER BY username', (self.realm,)
+        ).fetchall()
+        return [(row['username'], json.loads(row['data'])) for row in rows]
+
+
+def _seed(pool, photographers, photographer_users, admin_users):
+    with pool.transaction() as conn:
+        conn.executemany(
+            'INSERT OR IGNORE INTO sequences (name, value) VALUES (?, 0)',
+            [('users',), ('bookings',), ('photographers',)]
+        )
+        if conn.execute('SELECT COUNT(*) FROM photographers').fetchone()[0] == 0:
+            conn.executemany(
+                'INSERT INTO photographers (id, data) VALUES (?, ?)',
+                [(pid, json.dumps(info)) for pid, info in photographers.items()]
+            )
+            conn.execute(
+                'UPDATE sequences SET value = MAX(value, ?) WHERE name = ?',
+                (max(photographers, default=0), 'photographers')
+            )
+        for realm, seed in (('photographer', photographer_users), ('admin', admin_users)):
+            if conn.execute('SELECT COUNT(*) FROM credentials WHERE realm = ?', (realm,)).fetchone()[0]:
+                continue
+            conn.executemany(
+                'INSERT INTO credentials (realm, username, photographer_id, data) VALUES (?, ?, ?, ?)',
+                [(realm, username, info.get('photographer_id'), json.dumps(info))
+                 for username, info in seed.items()]
+            )
+
+
+def open_sqlite_repositories(config, photographers, photographer_users, admin_users):
+    pool = ConnectionPool(config.get('SQLITE_PATH', 'booking.db'),
+                          busy_timeout_ms=config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    pool.connection().executescript(SCHEMA)
+    try:
+        pool.connection().execute(UNIQUE_SLOTS)
+    except sqlite3.IntegrityError:
+        # a database that already holds a double booking; the overlap
+        # check in add() still guards every new booking
+        pass
+    if pool.connection().execute('SELECT COUNT(*) FROM counters').fetchone()[0] == 0:
+        # databases created before the counters table existed
+        pool.connection().executescript('BEGIN IMMEDIATE;' + REBUILD_COUNTERS + 'COMMIT;')
+    _seed(pool, photographers, photographer_users, admin_users)
+    return Repositories(
+        users=SQLiteUserStore(pool),
+        photographers=SQLitePhotographerStore(pool),
+        bookings=SQLiteBookingStore(pool, config.get('BOOKING_SLOT_MINUTES', 120)),
+        photographer_users=SQLiteCredentialStore(pool, 'photographer'),
+        admin_users=SQLiteCredentialStore(pool, 'admin')
+    )
@@ -0,0 +1,64 @@
+import threading
+from collections import Counter
+
+
+class Counters:
+    # a thread-safe multiset of counts maintained by the stores on every
+    # write so that reports never have to scan records
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def _apply(self, key, delta):
+        value = self._counts.get(key, 0) + delta
+        if value:
+            self._counts[key] = value
+        else:
+            self._counts.pop(key, None)
+
+    def add(self, key, delta=1):
+        with self._lock:
+            self._apply(key, delta)
+
+    def move(self, old_key, new_key):
+        with self._lock:
+            self._apply(old_key, -1)
+            self._apply(new_key, 1)
+
+    def get(self, key):
+        return self._counts.get(key, 0)
+
+    def replace(self, counts):
+        # used when a store is reloaded in bulk
+        with self._lock:
+            self._counts = {key: value for key, value in counts.items() if value}
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+def _diff(name, maintained, rebuilt):
+    drift = {}
+    for key in set(maintained) | set(rebuilt):
+        if maintained.get(key, 0) != rebuilt.get(key, 0):
+            drift[str(key)] = {'counter': maintained.get(key, 0), 'actual': rebuilt.get(key, 0)}
+    return {name: drift} if drift else {}
+
+
+def check_counters(users_db, bookings_db):
+    # rebuild every counter from the raw records and report the keys whose
+    # maintained value disagrees; an empty result means no drift
+    users = Counter(user.get('user_type') for user in users_db.values())
+    statuses = Counter()
+    photographers = Counter()
+    for booking in bookings_db.values():
+        statuses[booking['status']] += 1
+        photographers[booking['photographer_id']] += 1
+
+    drift = {}
+    drift.update(_diff('users_by_type', users_db.count_by_type(), users))
+    drift.update(_diff('bookings_by_status', bookings_db.count_by_status(), statuses))
+    drift.update(_diff('bookings_by_photographer', bookings_db.count_by_photographer(), photographers))
+    return drift
@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# keep test runs away from the checkout's uploads and asset build
+os.environ.setdefault('PHOTO_UPLOAD_ROOT', tempfile.mkdtemp(prefix='test-uploads-'))
+os.environ.setdefault('ASSET_BUILD_DIR', tempfile.mkdtemp(prefix='test-assets-'))
+
+
+@pytest.fixture(scope='session')
+def booking_app():
+    # create_app() builds the module-level state once per process, so every
+    # test shares one app on the memory backend
+    import app as booking_app
+    booking_app.create_app({'STORAGE_BACKEND': 'memory', 'SESSION_BACKEND': 'memory',
+                            'PASSWORD_PBKDF2_ITERATIONS': 1000})
+    return booking_app
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from test_concurrency import customer_client, next_weekday
+
+
+def bookings_on(booking_app, photographer_id, day):
+    return [b for b in booking_app.bookings_db.values()
+            if b['photographer_id'] == photographer_id and b['date'] == day.isoformat()]
+
+
+def test_booking_that_would_cross_midnight_is_refused(booking_app):
+    photographer_id = 3
+    availability = booking_app.photographers_db[photographer_id]['availability']
+    day = next(d for d in (next_weekday(name) for name in availability)
+               if (d + timedelta(days=1)).strftime('%A') in availability)
+    client = customer_client(booking_app, 3000)
+    latest = 24 * 60 - booking_app.slot_index.slot_minutes
+
+    # 23:00 with two-hour slots would run into 00:30 the next day unseen
+    late = client.post(f'/book/{photographer_id}', data={
+        'booking_date': day.isoformat(), 'booking_time': '23:00', 'location': 'Studio'})
+    assert late.status_code == 200
+    assert b'must end by midnight' in late.data
+    assert bookings_on(booking_app, photographer_id, day) == []
+
+    early = client.post(f'/book/{photographer_id}', data={
+        'booking_date': (day + timedelta(days=1)).isoformat(), 'booking_time': '00:30', 'location': 'Studio'})
+    assert early.status_code == 302
+
+    last = client.post(f'/book/{photographer_id}', data={
+        'booking_date': day.isoformat(), 'booking_time': f'{latest // 60:02d}:{latest % 60:02d}',
+        'location': 'Studio'})
+    assert last.status_code == 302
+    assert len(bookings_on(booking_app, photographer_id, day)) == 1
+
+
+def test_fits_in_day():
+    from scheduling import SlotIndex
+
+    index = SlotIndex(120)
+    assert index.fits_in_day(22 * 60)
+    assert not index.fits_in_day(22 * 60 + 1)
+    assert not index.fits_in_day(23 * 60)
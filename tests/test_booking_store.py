@@ -0,0 +1,51 @@
+from booking_store import BookingStore
+
+
+class CountingDict(dict):
+    # records every key looked up with get(), as scan() does
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.touched = []
+
+    def get(self, key, default=None):
+        self.touched.append(key)
+        return super().get(key, default)
+
+
+def booking(photographer_id, day):
+    return {'user_id': 1, 'photographer_id': photographer_id, 'date': day, 'time': '10:00',
+            'location': 'Pune', 'notes': '', 'status': 'Pending'}
+
+
+def filled_store():
+    store = BookingStore()
+    for n in range(60):
+        booking_id = store.next_id()
+        store.add(booking_id, booking(1 if n % 3 == 0 else 2, f'2026-03-{n % 28 + 1:02d}'))
+    store._records = CountingDict(store._records)
+    return store
+
+
+def test_photographer_scan_touches_only_their_bookings():
+    store = filled_store()
+    mine = [i for i in range(1, 61) if (i - 1) % 3 == 0]
+    scanned = [booking_id for booking_id, _ in store.scan(photographer_id=1, batch_size=7)]
+    assert scanned == mine
+    assert sorted(store._records.touched) == mine
+
+
+def test_photographer_scan_applies_date_bounds_and_cursor():
+    store = filled_store()
+    scanned = [(booking_id, b['date']) for booking_id, b in store.scan(
+        photographer_id=1, start_date='2026-03-05', end_date='2026-03-20', after_id=10)]
+    assert scanned == sorted(scanned)
+    assert all(booking_id > 10 and '2026-03-05' <= day <= '2026-03-20' for booking_id, day in scanned)
+    assert len(store._records.touched) == len(scanned)
+
+
+def test_full_scan_walks_ids_in_order_and_resumes():
+    store = filled_store()
+    store.delete(5)
+    scanned = [booking_id for booking_id, _ in store.scan(batch_size=7)]
+    assert scanned == [i for i in range(1, 61) if i != 5]
+    assert [booking_id for booking_id, _ in store.scan(after_id=50, batch_size=4)] == list(range(51, 61))
@@ -0,0 +1,137 @@
+import sys
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+THREADS = 16
+
+
+@pytest.fixture(autouse=True)
+def frequent_switches():
+    # switch threads as often as possible so the races actually interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def race(count, target):
+    # runs target(index) on count threads released together; -> results
+    barrier = threading.Barrier(count)
+    results = [None] * count
+    errors = []
+
+    def worker(index):
+        barrier.wait()
+        try:
+            results[index] = target(index)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    return results
+
+
+def next_weekday(name, after=date(2031, 1, 1)):
+    day = after
+    while day.strftime('%A') != name:
+        day += timedelta(days=1)
+    return day
+
+
+def customer_client(booking_app, user_id):
+    client = booking_app.app.test_client()
+    with client.session_transaction() as s:
+        s.update({'user_id': user_id, 'username': f'racer-{user_id}', 'user_type': 'customer'})
+    return client
+
+
+def register(client, username, email):
+    return client.post('/register', data={'username': username, 'email': email,
+                                          'password': 'secret-password', 'confirm_password': 'secret-password'})
+
+
+def test_register_same_username_has_one_winner(booking_app):
+    clients = [booking_app.app.test_client() for _ in range(THREADS)]
+    statuses = race(THREADS, lambda i: register(clients[i], 'contested-register', f'contested-{i}@example.com').status_code)
+
+    assert statuses.count(302) == 1
+    assert [user['username'] for user in booking_app.users_db.values()].count('contested-register') == 1
+
+
+def test_register_same_email_has_one_winner(booking_app):
+    clients = [booking_app.app.test_client() for _ in range(THREADS)]
+    statuses = race(THREADS, lambda i: register(clients[i], f'email-racer-{i}', 'Same@Example.com ').status_code)
+
+    assert statuses.count(302) == 1
+    assert booking_app.users_db.email_exists('same@example.com')
+
+
+def test_register_distinct_users_all_stored_with_unique_ids(booking_app):
+    before = len(booking_app.users_db)
+    clients = [booking_app.app.test_client() for _ in range(THREADS)]
+    statuses = race(THREADS, lambda i: register(clients[i], f'distinct-{i}', f'distinct-{i}@example.com').status_code)
+
+    assert statuses == [302] * THREADS
+    assert len(booking_app.users_db) == before + THREADS
+    assert len(set(booking_app.users_db.keys())) == len(booking_app.users_db)
+
+
+def test_book_same_slot_has_one_winner(booking_app):
+    photographer_id = 1
+    day = next_weekday(booking_app.photographers_db[photographer_id]['availability'][0])
+    clients = [customer_client(booking_app, 1000 + i) for i in range(THREADS)]
+
+    def book(i):
+        # the same slot spelled several ways
+        booking_date = day.isoformat() if i % 2 else f'{day.year}-{day.month}-{day.day}'
+        booking_time = '10:00' if i % 3 else '10:00:00'
+        return clients[i].post(f'/book/{photographer_id}', data={
+            'booking_date': booking_date, 'booking_time': booking_time, 'location': 'Studio'}).status_code
+
+    statuses = race(THREADS, book)
+
+    assert statuses.count(302) == 1
+    booked = [b for b in booking_app.bookings_db.values()
+              if b['photographer_id'] == photographer_id and b['date'] == day.isoformat()]
+    assert len(booked) == 1
+    assert booked[0]['time'] == '10:00'
+
+
+def test_book_overlapping_slots_never_overlap(booking_app):
+    photographer_id = 2
+    day = next_weekday(booking_app.photographers_db[photographer_id]['availability'][0], date(2031, 3, 1))
+    slot_minutes = booking_app.slot_index.slot_minutes
+    clients = [customer_client(booking_app, 2000 + i) for i in range(THREADS)]
+    starts = [8 * 60 + 30 * i for i in range(THREADS)]
+
+    race(THREADS, lambda i: clients[i].post(f'/book/{photographer_id}', data={
+        'booking_date': day.isoformat(), 'booking_time': f'{starts[i] // 60:02d}:{starts[i] % 60:02d}',
+        'location': 'Studio'}).status_code)
+
+    booked = sorted(int(b['time'][:2]) * 60 + int(b['time'][3:])
+                    for b in booking_app.bookings_db.values()
+                    if b['photographer_id'] == photographer_id and b['date'] == day.isoformat())
+    assert booked
+    assert all(later - earlier >= slot_minutes for earlier, later in zip(booked, booked[1:]))
+
+
+def test_slot_reserve_race_has_one_winner(booking_app):
+    from scheduling import SlotConflict, SlotIndex
+
+    index = SlotIndex(120)
+
+    def reserve(i):
+        try:
+            index.reserve(7, '2031-06-02', 600 + i, i)
+            return True
+        except SlotConflict:
+            return False
+
+    assert race(THREADS, reserve).count(True) == 1
@@ -0,0 +1,84 @@
+import threading
+
+from dynamo_batch import BATCH_GET_LIMIT, batch_get_items
+
+TABLE = 'Photographers'
+
+
+class FakeDynamoDB:
+    # batch_get_item that answers at most per_call keys of each request and
+    # hands the rest back as UnprocessedKeys, like a throttled table
+    def __init__(self, items, per_call):
+        self.items = items
+        self.per_call = per_call
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def batch_get_item(self, RequestItems):
+        keys = RequestItems[TABLE]['Keys']
+        with self._lock:
+            self.requests.append([key['id'] for key in keys])
+        assert len(keys) <= BATCH_GET_LIMIT
+        served, rest = keys[:self.per_call], keys[self.per_call:]
+        response = {'Responses': {TABLE: [self.items[key['id']] for key in served if key['id'] in self.items]}}
+        if rest:
+            response['UnprocessedKeys'] = {TABLE: {'Keys': rest}}
+        return response
+
+
+def items_for(ids):
+    return {i: {'id': i, 'name': f'photographer {i}'} for i in ids}
+
+
+def test_fetches_every_key_through_unprocessed_retries():
+    dynamodb = FakeDynamoDB(items_for(range(250)), per_call=30)
+    sleeps = []
+    wanted = list(range(249, -1, -1))
+
+    result = batch_get_items(dynamodb, TABLE, 'id', wanted, sleep=sleeps.append, max_attempts=10)
+
+    assert [item['id'] for item in result] == wanted
+    # chunks of 100, 100 and 50 keys take 4, 4 and 2 calls at 30 keys a call
+    assert sorted(len(request) for request in dynamodb.requests if len(request) > 30) == [40, 40, 50, 70, 70, 100, 100]
+    assert len(dynamodb.requests) == 10
+    # every call but each chunk's last one is followed by a backoff
+    assert len(sleeps) == 7
+
+
+def test_duplicates_and_missing_keys():
+    dynamodb = FakeDynamoDB(items_for([1, 2, 3]), per_call=100)
+
+    result = batch_get_items(dynamodb, TABLE, 'id', [3, 1, 3, 42, 2], sleep=lambda s: None)
+
+    assert [item['id'] for item in result] == [3, 1, 3, 2]
+    assert dynamodb.requests == [[3, 1, 42, 2]]
+
+
+def test_gives_up_after_max_attempts_with_backoff(capsys):
+    dynamodb = FakeDynamoDB(items_for(range(10)), per_call=0)
+    sleeps = []
+
+    result = batch_get_items(dynamodb, TABLE, 'id', list(range(10)), max_attempts=4, base_delay=0.1,
+                             sleep=sleeps.append)
+
+    assert result == []
+    assert len(dynamodb.requests) == 4
+    # a backoff between attempts, none after the last one
+    assert len(sleeps) == 3
+    # full jitter under a doubling cap
+    assert all(0 <= delay <= 0.1 * 2 ** attempt for attempt, delay in enumerate(sleeps))
+    assert '10 keys still unprocessed' in capsys.readouterr().out
+
+
+def test_partial_results_survive_giving_up():
+    dynamodb = FakeDynamoDB(items_for(range(10)), per_call=3)
+
+    result = batch_get_items(dynamodb, TABLE, 'id', list(range(10)), max_attempts=2, sleep=lambda s: None)
+
+    assert [item['id'] for item in result] == list(range(6))
+
+
+def test_empty_input_makes_no_calls():
+    dynamodb = FakeDynamoDB({}, per_call=100)
+    assert batch_get_items(dynamodb, TABLE, 'id', []) == []
+    assert dynamodb.requests == []
@@ -0,0 +1,60 @@
+import os
+import threading
+import time
+
+from notifications import NotificationDispatcher
+
+
+class FakeSNS:
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.entries = []
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        if self.gate is not None:
+            self.gate.wait()
+        self.entries.extend(PublishBatchRequestEntries)
+        return {'Successful': [{'Id': entry['Id']} for entry in PublishBatchRequestEntries]}
+
+
+def dispatcher(client, tmp_path):
+    return NotificationDispatcher(lambda: client, 'arn:topic', linger=0,
+                                  dead_letter_path=str(tmp_path / 'dead.jsonl'))
+
+
+def test_flush_returns_true_once_drained(tmp_path):
+    client = FakeSNS()
+    notifier = dispatcher(client, tmp_path)
+    for n in range(25):
+        notifier.submit('booking', f'message {n}')
+
+    assert notifier.flush(timeout=5.0)
+    assert len(client.entries) == 25
+    notifier.shutdown()
+
+
+def test_flush_gives_up_at_the_deadline(tmp_path):
+    gate = threading.Event()
+    notifier = dispatcher(FakeSNS(gate), tmp_path)
+    notifier.submit('booking', 'stuck')
+
+    started = time.monotonic()
+    assert not notifier.flush(timeout=0.2)
+    assert time.monotonic() - started < 2.0
+    gate.set()
+    assert notifier.flush(timeout=5.0)
+    notifier.shutdown()
+
+
+def test_flush_does_not_wait_for_a_dead_worker(tmp_path):
+    notifier = dispatcher(FakeSNS(), tmp_path)
+    # a worker that exited without draining what was queued
+    notifier._thread = threading.Thread(target=lambda: None)
+    notifier._thread.start()
+    notifier._thread.join()
+    notifier._pid = os.getpid()
+    notifier._queue.put_nowait({'Subject': 'late', 'Message': 'x'})
+
+    started = time.monotonic()
+    assert not notifier.flush(timeout=5.0)
+    assert time.monotonic() - started < 1.0
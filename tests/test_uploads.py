@@ -0,0 +1,112 @@
+import hashlib
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from uploads import LocalPhotoStorage, PhotoPipeline, UploadError, VARIANTS, stream_to_temp
+
+
+def png_bytes(size=(64, 48), color=(200, 40, 40)):
+    out = io.BytesIO()
+    Image.new('RGB', size, color).save(out, 'PNG')
+    return out.getvalue()
+
+
+class CountingStream(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super().read(size)
+
+
+def leftovers(directory):
+    return sorted(os.listdir(directory))
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    temp_dir = tmp_path / 'tmp'
+    pipeline = PhotoPipeline(LocalPhotoStorage(str(tmp_path / 'photos'), '/static/uploads'),
+                             temp_dir=str(temp_dir), max_bytes=64 * 1024, workers=1, timeout=30)
+    yield pipeline
+    pipeline.shutdown()
+
+
+def test_stream_to_temp_copies_in_chunks_and_hashes(tmp_path):
+    data = png_bytes()
+    stream = CountingStream(data)
+
+    temp_path, digest, extension, content_type = stream_to_temp(stream, str(tmp_path), max_bytes=len(data),
+                                                                chunk_size=7)
+    try:
+        with open(temp_path, 'rb') as f:
+            assert f.read() == data
+        assert digest == hashlib.sha256(data).hexdigest()
+        # the 16-byte signature spans several 7-byte chunks
+        assert (extension, content_type) == ('png', 'image/png')
+        assert set(stream.reads) == {7}
+    finally:
+        os.unlink(temp_path)
+
+
+def test_stream_to_temp_enforces_the_size_cap_and_cleans_up(tmp_path):
+    data = png_bytes()
+
+    with pytest.raises(UploadError, match='smaller than'):
+        stream_to_temp(io.BytesIO(data), str(tmp_path), max_bytes=len(data) - 1, chunk_size=16)
+    assert leftovers(tmp_path) == []
+
+
+@pytest.mark.parametrize('data, message', [
+    (b'', 'No image data'),
+    (b'GIF89a' + b'\0' * 64, 'Only JPEG, PNG and WebP'),
+    (b'RIFF\0\0\0\0WAVEfmt ' + b'\0' * 32, 'Only JPEG, PNG and WebP'),
+])
+def test_stream_to_temp_rejects_non_images(tmp_path, data, message):
+    with pytest.raises(UploadError, match=message):
+        stream_to_temp(io.BytesIO(data), str(tmp_path), max_bytes=1024)
+    assert leftovers(tmp_path) == []
+
+
+def test_ingest_stores_original_and_variants_under_content_hash(pipeline, tmp_path):
+    data = png_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+
+    photo = pipeline.ingest(io.BytesIO(data))
+
+    assert photo['hash'] == digest
+    assert photo['original'] == f'/static/uploads/originals/{digest[:2]}/{digest}.png'
+    for name, size in VARIANTS.items():
+        key = f'variants/{digest[:2]}/{digest}-{name}.jpg'
+        assert photo[name] == f'/static/uploads/{key}'
+        with Image.open(pipeline.storage.path(key)) as variant:
+            assert variant.size == size
+    assert leftovers(tmp_path / 'tmp') == []
+
+
+def test_ingest_over_photo_max_bytes_leaves_nothing(pipeline, tmp_path):
+    data = png_bytes(size=(600, 600))
+    data += os.urandom(pipeline.max_bytes)
+
+    with pytest.raises(UploadError, match='smaller than'):
+        pipeline.ingest(io.BytesIO(data))
+    assert leftovers(tmp_path / 'tmp') == []
+    assert not os.path.exists(tmp_path / 'photos' / 'originals')
+
+
+def test_failed_resize_cleans_up_temp_files(pipeline, tmp_path):
+    # a PNG signature followed by garbage passes the sniff but not Pillow
+    data = b'\x89PNG\r\n\x1a\n' + b'not really a png' * 64
+    digest = hashlib.sha256(data).hexdigest()
+
+    with pytest.raises(UploadError, match='could not be processed'):
+        pipeline.ingest(io.BytesIO(data))
+
+    assert leftovers(tmp_path / 'tmp') == []
+    for name in VARIANTS:
+        assert not pipeline.storage.exists(f'variants/{digest[:2]}/{digest}-{name}.jpg')
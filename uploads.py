@@ -0,0 +1,179 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+
+
+CHUNK_SIZE = 64 * 1024
+
+# name -> (width, height) of the resized copies served by catalog pages
+VARIANTS = {
+    'thumb': (160, 160),
+    'card': (400, 400),
+}
+
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png', 'image/png'),
+    (b'RIFF', 'webp', 'image/webp'),
+)
+
+
+class UploadError(ValueError):
+    pass
+
+
+def sniff_image(head):
+    for signature, extension, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            if extension == 'webp' and head[8:12] != b'WEBP':
+                continue
+            return extension, content_type
+    raise UploadError('Only JPEG, PNG and WebP images can be uploaded')
+
+
+def stream_to_temp(stream, temp_dir, max_bytes, chunk_size=CHUNK_SIZE):
+    # copy the body to disk one chunk at a time, hashing as we go, so the
+    # whole file is never held in memory
+    digest = hashlib.sha256()
+    size = 0
+    head = b''
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir, prefix='upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadError(f'Images must be smaller than {max_bytes // (1024 * 1024)} MB')
+                if len(head) < 16:
+                    head += chunk[:16 - len(head)]
+                digest.update(chunk)
+                out.write(chunk)
+        if size == 0:
+            raise UploadError('No image data received')
+        extension, content_type = sniff_image(head)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path, digest.hexdigest(), extension, content_type
+
+
+def make_variant(source_path, target_path, size):
+    # runs in a worker process
+    from PIL import Image, ImageOps
+    with Image.open(source_path) as image:
+        image = ImageOps.exif_transpose(image)
+        image = ImageOps.fit(image.convert('RGB'), size, Image.LANCZOS)
+        image.save(target_path, 'JPEG', quality=82, optimize=True, progressive=True)
+    return target_path
+
+
+class PhotoStorage(ABC):
+    # where originals and variants live. Keys are content-addressed paths
+    # such as 'originals/ab/ab12...ef.jpg'; a backend only has to store a
+    # local file under a key and tell whether a key exists
+
+    @abstractmethod
+    def exists(self, key):
+        pass
+
+    @abstractmethod
+    def put_file(self, local_path, key, content_type):
+        pass
+
+    @abstractmethod
+    def url(self, key):
+        pass
+
+
+class LocalPhotoStorage(PhotoStorage):
+    def __init__(self, root, url_prefix):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip('/')
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def put_file(self, local_path, key, content_type):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # write under a temporary name and rename so readers never see half a file
+        partial = f'{target}.{os.getpid()}.{threading.get_ident()}.part'
+        shutil.copyfile(local_path, partial)
+        os.replace(partial, target)
+
+    def url(self, key):
+        return f'{self.url_prefix}/{key}'
+
+
+class PhotoPipeline:
+    def __init__(self, storage, temp_dir=None, max_bytes=10 * 1024 * 1024, workers=2, timeout=30):
+        self.storage = storage
+        self.temp_dir = temp_dir
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.timeout = timeout
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        if temp_dir:
+            os.makedirs(temp_dir, exist_ok=True)
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def _variant_keys(self, digest):
+        return {name: f'variants/{digest[:2]}/{digest}-{name}.jpg' for name in VARIANTS}
+
+    def ingest(self, stream):
+        temp_path, digest, extension, content_type = stream_to_temp(
+            stream, self.temp_dir, self.max_bytes
+        )
+        work_dir = tempfile.mkdtemp(dir=self.temp_dir, prefix='variants-')
+        try:
+            original_key = f'originals/{digest[:2]}/{digest}.{extension}'
+            if not self.storage.exists(original_key):
+                self.storage.put_file(temp_path, original_key, content_type)
+
+            variant_keys = self._variant_keys(digest)
+            missing = {name: key for name, key in variant_keys.items() if not self.storage.exists(key)}
+            if missing:
+                futures = {
+                    name: self._pool().submit(make_variant, temp_path,
+                                              os.path.join(work_dir, f'{name}.jpg'), VARIANTS[name])
+                    for name in missing
+                }
+                for name, future in futures.items():
+                    try:
+                        built = future.result(timeout=self.timeout)
+                    except Exception as e:
+                        raise UploadError('The image could not be processed') from e
+                    self.storage.put_file(built, missing[name], 'image/jpeg')
+
+            photo = {'hash': digest, 'original': self.storage.url(original_key)}
+            for name, key in variant_keys.items():
+                photo[name] = self.storage.url(key)
+            return photo
+        finally:
+            os.unlink(temp_path)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._executor_pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
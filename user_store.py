@@ -0,0 +1,134 @@
+from concurrency import IdAllocator, StripedLock
+from repository import UserRepository
+from stats import Counters
+
+
+class DuplicateUserError(ValueError):
+    def __init__(self, field):
+        super().__init__(f'{field} already exists')
+        self.field = field
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+class UserStore(UserRepository):
+    # id-keyed user records with unique username and email indexes so that
+    # existence checks and login are dictionary lookups instead of scans
+
+    def __init__(self):
+        self._records = {}
+        self._by_username = {}
+        self._by_email = {}
+        self._locks = StripedLock()
+        self._ids = IdAllocator()
+        self._type_counts = Counters()
+
+    def next_id(self):
+        return self._ids.next()
+
+    def add(self, user_id, user):
+        username = user['username']
+        email = normalize_email(user.get('email', ''))
+        with self._locks.for_keys(('username', username), ('email', email)):
+            if username in self._by_username:
+                raise DuplicateUserError('username')
+            if email and email in self._by_email:
+                raise DuplicateUserError('email')
+            self._records[user_id] = user
+            self._by_username[username] = user_id
+            if email:
+                self._by_email[email] = user_id
+        self._type_counts.add(user.get('user_type'))
+        return user_id
+
+    def remove(self, user_id):
+        user = self._records.get(user_id)
+        if user is None:
+            return None
+        email = normalize_email(user.get('email', ''))
+        with self._locks.for_keys(('username', user['username']), ('email', email)):
+            if self._records.pop(user_id, None) is None:
+                return None
+            self._by_username.pop(user['username'], None)
+            if email and self._by_email.get(email) == user_id:
+                del self._by_email[email]
+        self._type_counts.add(user.get('user_type'), -1)
+        return user
+
+    def update_password(self, user_id, password_hash):
+        user = self._records.get(user_id)
+        if user is None:
+            return False
+        with self._locks.for_key(('username', user['username'])):
+            user['password'] = password_hash
+        return True
+
+    def restart_ids(self):
+        # continue numbering after the highest stored id
+        self._ids = IdAllocator.after(self._records)
+
+    def dump(self):
+        return list(self._records.items())
+
+    def load(self, items):
+        # replaces the contents with a dump()
+        records = dict(items)
+        by_username = {}
+        by_email = {}
+        type_counts = {}
+        for user_id, user in records.items():
+            by_username[user['username']] = user_id
+            email = normalize_email(user.get('email', ''))
+            if email:
+                by_email[email] = user_id
+            user_type = user.get('user_type')
+            type_counts[user_type] = type_counts.get(user_type, 0) + 1
+        self._records, self._by_username, self._by_email = records, by_username, by_email
+        self._type_counts.replace(type_counts)
+        self.restart_ids()
+
+    def username_exists(self, username):
+        return username in self._by_username
+
+    def email_exists(self, email):
+        return normalize_email(email) in self._by_email
+
+    def id_for_username(self, username):
+        return self._by_username.get(username)
+
+    def get_by_username(self, username):
+        user_id = self._by_username.get(username)
+        if user_id is None:
+            return None, None
+        return user_id, self._records.get(user_id)
+
+    def count_by_type(self):
+        return self._type_counts.snapshot()
+
+    # read-only mapping interface used by the admin views
+
+    def get(self, user_id, default=None):
+        return self._records.get(user_id, default)
+
+    def __getitem__(self, user_id):
+        return self._records[user_id]
+
+    def __contains__(self, user_id):
+        return user_id in self._records
+
+    def __len__(self):
+        return len(self._records)
+
+    def __iter__(self):
+        return iter(list(self._records))
+
+    def keys(self):
+        return list(self._records.keys())
+
+    def values(self):
+        return list(self._records.values())
+
+    def items(self):
+        return list(self._records.items())
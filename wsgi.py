@@ -0,0 +1,16 @@
+# Production entry point:
+#
+#   python assets.py
+#   gunicorn -c gunicorn.conf.py wsgi:application
+#
+# assets.py builds the fingerprinted static files the templates link to; a
+# server started without a build links to the plain /static files instead.
+#
+# With preload_app (gunicorn.conf.py) this module is imported once, in the
+# master: the stores, catalog and search indexes, analytics columns and
+# compiled templates are built and warmed here, and every worker forked
+# afterwards shares them copy-on-write instead of building its own.
+from app import create_app, warm_up
+
+application = create_app()
+warm_up()